@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+亮度 / 对比度 / 饱和度合并调整
+语义与 ImageEnhance 依次执行 Brightness → Contrast → Color 相同（逐级截断到 0-255 并取整），
+但合并为一次遍历：
+  - 亮度与对比度都是逐通道映射，合并为一张 256 项查找表（含中间截断）
+  - 饱和度 s != 1 时再与定点亮度 L 混合：out = L + s·(y - L)
+全部为 1.0 时直接跳过；可写连续数组原地修改，按行块处理以限制临时内存
+"""
+from typing import Optional
+
+import numpy as np
+
+_CHUNK_PIXELS = 1 << 20
+
+
+def _blend(base, img, factor: float):
+    """Image.blend 的逐元素语义：base + factor·(img - base)，截断到 0-255 后取整（向零）"""
+    out = np.float32(factor) * (img - base)
+    out += base
+    np.clip(out, 0, 255, out=out)
+    return out.astype(np.uint8)
+
+
+def _luma(rgb: np.ndarray, levels: Optional[np.ndarray] = None) -> np.ndarray:
+    """与 PIL convert("L") 相同的定点亮度；levels 为先施加的逐通道查找表"""
+    if levels is not None:
+        rgb = levels[rgb]
+    l = rgb[..., 0] * np.uint32(19595)
+    l += rgb[..., 1] * np.uint32(38470)
+    l += rgb[..., 2] * np.uint32(7471)
+    l += np.uint32(0x8000)
+    l >>= 16
+    return l
+
+
+class ColorAdjust:
+    def __init__(self, brightness: float = 1.0, contrast: float = 1.0, saturation: float = 1.0):
+        self.brightness = brightness
+        self.contrast = contrast
+        self.saturation = saturation
+        self.mean: Optional[int] = None  # 对比度参考灰度，由 fit 得到
+
+    @property
+    def identity(self) -> bool:
+        return (self.brightness, self.contrast, self.saturation) == (1.0, 1.0, 1.0)
+
+    @property
+    def needs_mean(self) -> bool:
+        return self.contrast != 1.0
+
+    def _brightness_levels(self) -> np.ndarray:
+        return _blend(np.float32(0), np.arange(256, dtype=np.float32), self.brightness)
+
+    def histogram(self, rgb: np.ndarray) -> np.ndarray:
+        """亮度调整后图像的灰度直方图（256 项）；可逐块累加后交给 fit"""
+        return np.bincount(_luma(rgb, self._brightness_levels()).ravel(), minlength=256)
+
+    def fit(self, hist: np.ndarray) -> "ColorAdjust":
+        """由直方图求 ImageEnhance.Contrast 使用的平均灰度"""
+        total = hist.sum()
+        self.mean = int(float(np.dot(hist, np.arange(256))) / total + 0.5) if total else 128
+        return self
+
+    def levels(self) -> np.ndarray:
+        """亮度 + 对比度合并后的 256 项查找表"""
+        lut = self._brightness_levels()
+        if self.contrast != 1.0:
+            mean = self.mean if self.mean is not None else 128
+            lut = _blend(np.float32(mean), lut.astype(np.float32), self.contrast)
+        return lut
+
+    def apply(self, img: np.ndarray) -> np.ndarray:
+        """调整 uint8 RGB 图像；可写且连续时原地修改，否则在副本上修改"""
+        if self.identity:
+            return img
+        if not (img.flags.writeable and img.flags.c_contiguous):
+            img = np.array(img)
+        lut = self.levels()
+        flat = img.reshape(-1, 3)
+        for i in range(0, len(flat), _CHUNK_PIXELS):
+            chunk = flat[i:i + _CHUNK_PIXELS]
+            np.take(lut, chunk, out=chunk)
+            if self.saturation != 1.0:
+                gray = _luma(chunk).astype(np.float32)
+                for ch in range(3):  # 逐通道一维视图，避免长度为 3 的内层广播
+                    chunk[:, ch] = _blend(gray, chunk[:, ch].astype(np.float32), self.saturation)
+        return img
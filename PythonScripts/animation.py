@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+动画 / 短视频帧序列像素化（--input 为 GIF / APNG / 帧目录）
+逐帧从头运行管线既慢又闪烁（每帧重新播种 SLIC、重新拟合调色板、重新产生抖动噪点），这里跨帧保留状态：
+  - 帧差分：每个像素格的颜色与该格上次采用的参考色比较，变化不超过 change_threshold 的格子沿用上一帧输出
+  - 全局调色板：首帧拟合，之后只用变化格子的颜色增量更新（MiniBatchKMeans.partial_fit），索引含义跨帧不变
+  - SLIC（非栅格对齐）：每帧从上一帧的中心与标签图热启动（slic.slic_segment），最多 WARM_ROUNDS 轮
+  - 抖动：格子空间的有序（Bayer 4×4）抖动，偏移只与位置有关，静止区域没有噪点闪烁
+帧由 frameio 逐帧读入、逐帧写出，常驻内存只有当前帧与上一帧的状态
+"""
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+from sklearn.cluster import MiniBatchKMeans
+
+from core import PixelArtConfig, bayer_offsets, rgb_to_lab
+from adjust import ColorAdjust
+from blocks import REDUCERS, block_mean, expand_cells
+from cartoon import cartoon
+from frameio import DEFAULT_DURATION_MS, FrameReader, open_frame_writer
+from metrics import NULL_METRICS
+from slic import slic_segment
+
+_KMEANS_BATCH = 4096
+
+
+def _cell_means(img: np.ndarray, step: int) -> np.ndarray:
+    """与栅格对齐模式一致：零填充后整格求均值"""
+    return block_mean(img, step, zero_pad=True)
+
+
+# ---------- 全局调色板 ----------
+class IncrementalPalette:
+    """
+    跨帧共享的调色板：第一批样本拟合，之后增量更新；中心的顺序不变，已有索引的含义保持稳定。
+    输出颜色只在中心偏离超过 REFRESH_TOL 时才跟进，小幅漂移不会让静止区域的颜色逐帧变化
+    """
+    REFRESH_TOL = 6
+
+    def __init__(self, n_colors: int):
+        self.n_colors = n_colors
+        self.model: Optional[MiniBatchKMeans] = None
+        self.colors = np.zeros((0, 3), dtype=np.uint8)
+
+    def update(self, samples: np.ndarray):
+        x = samples.reshape(-1, 3).astype(np.float64)
+        if not len(x):
+            return
+        if self.model is None:
+            self.model = MiniBatchKMeans(n_clusters=min(self.n_colors, len(x)), batch_size=_KMEANS_BATCH,
+                                         random_state=42)
+        self.model.partial_fit(x)
+        centers = np.clip(np.round(self.model.cluster_centers_), 0, 255).astype(np.uint8)
+        if len(self.colors) != len(centers):
+            self.colors = centers
+            return
+        drift = np.abs(centers.astype(np.int16) - self.colors).max(axis=1) > self.REFRESH_TOL
+        if drift.any():
+            self.colors = self.colors.copy()  # 已返回给调用方的调色板不被改写
+            self.colors[drift] = centers[drift]
+
+    def map(self, samples: np.ndarray) -> np.ndarray:
+        """最近的调色板颜色索引（按实际输出的 uint8 颜色计算）"""
+        x = samples.reshape(-1, 3).astype(np.float32)
+        pal = self.colors.astype(np.float32)
+        d = np.zeros((len(x), len(pal)), dtype=np.float32)
+        for c in range(3):  # 逐通道累加，避免 N×K×3 的中间数组
+            diff = x[:, c, None] - pal[None, :, c]
+            d += diff * diff
+        return d.argmin(axis=1).astype(np.uint8)
+
+
+# ---------- 帧序列 ----------
+class AnimationPixelator:
+    """
+    逐帧处理：process(rgb) 返回 (h×w 调色板索引, 调色板)；run() 从文件读入并写出整个序列。
+    cfg.align_grid 为 False 时走热启动 SLIC，否则为格子均值（average / median 风格为块统计）
+    """
+    # 热启动帧：移动的中心占比不超过 WARM_TOL 即结束，且最多 WARM_ROUNDS 轮；
+    # 静止内容的分割跨帧继续收敛，未变化的格子本来就沿用上一帧输出
+    WARM_TOL = 0.05
+    WARM_ROUNDS = 3
+
+    def __init__(self, cfg: PixelArtConfig, style: str = "basic", adjust: Optional[ColorAdjust] = None,
+                 change_threshold: int = 3, metrics=None,
+                 progress: Optional[Callable[[str, int, int], None]] = None):
+        self.cfg = cfg
+        self.segment = not cfg.align_grid
+        if self.segment and cfg.cartoon_edge_weight is not None:
+            raise ValueError("SLIC 动画模式暂不支持卡通效果")
+        self.reduce = {"average": REDUCERS["mean"], "median": REDUCERS["median"]}.get(style, _cell_means)
+        self.adjust = adjust
+        self.change_threshold = change_threshold
+        self.palette = IncrementalPalette(cfg.color_count)
+        self.metrics = metrics or NULL_METRICS
+        self.progress = progress or (lambda stage, done, total: None)
+        self.frames = 0
+        self.cells_total = 0
+        self.cells_reused = 0
+        self.slic_rounds = 0
+        self._ref: Optional[np.ndarray] = None       # 各格上次采用的颜色（int16）
+        self._cell_idx: Optional[np.ndarray] = None  # 栅格模式：各格的调色板索引
+        self._idx: Optional[np.ndarray] = None       # 上一帧输出
+        self._slic = None                            # SLIC 模式：上一帧的迭代状态
+
+    def _adjusting(self, rgb: np.ndarray) -> bool:
+        """对比度参考灰度只在首帧统计，之后各帧沿用，避免亮度随内容起伏"""
+        adjust = self.adjust
+        if adjust is None or adjust.identity:
+            return False
+        if adjust.needs_mean and adjust.mean is None:
+            adjust.fit(adjust.histogram(rgb))
+        return True
+
+    def _changed(self, cells: np.ndarray) -> np.ndarray:
+        cur = cells.astype(np.int16)
+        if self._ref is None or self._ref.shape != cur.shape:
+            self._ref = cur
+            return np.ones(cur.shape[:2], dtype=bool)
+        diff = np.abs(cur - self._ref).max(axis=2)
+        changed = diff > self.change_threshold
+        self._ref[changed] = cur[changed]
+        return changed
+
+    def _dither_offsets(self, shape: Tuple[int, int]) -> np.ndarray:
+        return bayer_offsets(shape, len(self.palette.colors), self.cfg.dithering_strength)
+
+    def process(self, rgb: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        h, w = rgb.shape[:2]
+        step = self.cfg.pixel_size
+        m = self.metrics
+        adjusting = self._adjusting(rgb)
+        with m.stage("frame_cells", pixels=h * w):
+            cells = self.reduce(rgb, step)
+            if adjusting:
+                cells = self.adjust.apply(cells)
+            if self.cfg.cartoon_edge_weight is not None:
+                cells = cartoon(cells, self.cfg.cartoon_edge_weight, self.cfg.cartoon_levels)
+            changed = self._changed(cells)
+        n_changed = int(np.count_nonzero(changed))
+        self.frames += 1
+        self.cells_total += changed.size
+        self.cells_reused += changed.size - n_changed
+        if n_changed == 0 and self._idx is not None:
+            return self._idx, self.palette.colors
+
+        with m.stage("palette_fit", pixels=n_changed):
+            self.palette.update(cells[changed])
+        if self.segment:
+            idx = self._segment_frame(self.adjust.apply(rgb) if adjusting else rgb, changed)
+        else:
+            with m.stage("palette_map", pixels=n_changed):
+                if self._cell_idx is None or self._cell_idx.shape != changed.shape:
+                    self._cell_idx = np.zeros(changed.shape, dtype=np.uint8)
+                samples = cells[changed].astype(np.float32)
+                if self.cfg.dithering_method:
+                    samples += self._dither_offsets(changed.shape)[changed][:, None]
+                self._cell_idx[changed] = self.palette.map(samples)
+            with m.stage("expand", pixels=h * w):
+                idx = expand_cells(self._cell_idx, step, h, w)
+        self._idx = idx
+        return idx, self.palette.colors
+
+    def _segment_frame(self, rgb: np.ndarray, changed: np.ndarray) -> np.ndarray:
+        h, w = rgb.shape[:2]
+        step = self.cfg.pixel_size
+        m = self.metrics
+        with m.stage("lab", pixels=h * w):
+            lab = rgb_to_lab(rgb)
+        warm = self._slic is not None
+        with m.stage("slic_warm" if warm else "slic", pixels=h * w):
+            # 与 SLICPixelArtCore 相同的距离权衡：颜色与空间距离都除以 step
+            rounds = min(self.cfg.slic_iters, self.WARM_ROUNDS) if warm else self.cfg.slic_iters
+            self._slic = slic_segment(lab, step, rounds, float(step), self._slic, self.WARM_TOL)
+        self.slic_rounds += self._slic.rounds
+        m.count("slic_iterations", self._slic.rounds)
+        with m.stage("slic_render", pixels=h * w):
+            labels = np.maximum(self._slic.labels, 0)  # 未被任何窗口覆盖的像素（极少）归入 0 号
+            n = len(self._slic.cx)
+            flat = labels.ravel()
+            counts = np.maximum(np.bincount(flat, minlength=n), 1)
+            means = np.stack([np.bincount(flat, weights=rgb[..., c].ravel(), minlength=n) / counts
+                              for c in range(3)], axis=1)
+            idx = self.palette.map(means)[labels]
+            if self._idx is not None and self._idx.shape == idx.shape:
+                # 未变化的格子沿用上一帧输出，抑制分割边界的来回跳动
+                keep = expand_cells(~changed, step, h, w)
+                idx = np.where(keep, self._idx, idx)
+        return idx
+
+    def run(self, input_path: str, output_path: str, frame_duration_ms: int = DEFAULT_DURATION_MS,
+            compress_level: int = 6) -> dict:
+        reader = FrameReader(input_path, frame_duration_ms)
+        width, height = reader.size
+        with open_frame_writer(output_path, width, height, reader.loop, compress_level) as writer:
+            for i, (rgb, duration) in enumerate(reader):
+                idx, palette = self.process(rgb)
+                with self.metrics.stage("frame_write", pixels=width * height):
+                    writer.write(idx, palette, duration)
+                self.progress("frames", i + 1, reader.n_frames)
+        return {"width": width, "height": height, "frames": self.frames, "written_frames": writer.frames,
+                "cells_reused": round(self.cells_reused / max(1, self.cells_total), 4),
+                "slic_rounds": self.slic_rounds}
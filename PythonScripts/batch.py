@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+目录批处理（--input-dir / --output-dir / --workers）
+  - 进程池只启动一次：每个工作进程在初始化时导入依赖并试跑一张小图预热，之后连续处理多个文件
+  - 清单（manifest，JSON lines，只由主进程追加）记录每个已完成文件的输入签名、参数键与输出签名；
+    重新运行时记录仍匹配的文件直接跳过，中断后续跑不会重做已完成的文件
+  - 按像素数从大到小派发，避免大图排在最后拖长总时间
+  - 每个文件完成即向 stdout 输出一行 JSON 结果
+目录模式下工作进程自己解码与编码，进程间只传路径；调用方已持有解码后的数组时用 render_many，
+输入与输出像素经 multiprocessing.shared_memory 环形缓冲交接，工作进程只收到块名、形状与类型
+"""
+import hashlib
+import json
+import os
+import sys
+import time
+from argparse import Namespace
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+import numpy as np
+from PIL import Image
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".bmp", ".gif", ".webp", ".tif", ".tiff"}
+MANIFEST_NAME = ".pixelate_manifest.jsonl"
+
+_worker_args: Optional[Namespace] = None
+_attached: Dict[Tuple[int, str], SharedMemory] = {}  # 工作进程：(槽位, 方向) -> 已映射的共享内存块
+
+
+# ---------- 任务 ----------
+def _signature(path: Path) -> Optional[List[int]]:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _pixels(path: Path) -> int:
+    """只读文件头取像素数，读不出时按文件大小估计"""
+    try:
+        with Image.open(path) as img:
+            return img.size[0] * img.size[1]
+    except (OSError, ValueError):
+        try:
+            return path.stat().st_size
+        except OSError:
+            return 0  # 文件已消失：排到最后，由 _run_job 报告错误
+
+
+def options_key(options: dict) -> str:
+    return hashlib.sha1(json.dumps(options, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def discover(input_dir: str, output_dir: str) -> List[dict]:
+    """
+    递归列出输入图片，输出为 output_dir 下相同相对路径的 .png；
+    同目录同名不同扩展名的输入（x.png 与 x.jpg）保留源扩展名（x.jpg.png），避免互相覆盖，
+    改名后仍重复的输出标为错误任务
+    """
+    root, out_root = Path(input_dir), Path(output_dir)
+    rels = []
+    for path in sorted(root.rglob("*")):
+        if path.suffix.lower() not in IMAGE_EXTENSIONS or not path.is_file():
+            continue
+        if out_root.resolve() in path.resolve().parents:
+            continue  # 输出目录在输入目录内时不处理已生成的结果
+        rels.append((path, path.relative_to(root)))
+    stems = Counter(rel.with_suffix("").as_posix() for _, rel in rels)
+    jobs, outputs = [], Counter()
+    for path, rel in rels:
+        out = rel.with_suffix(".png")
+        if stems[rel.with_suffix("").as_posix()] > 1 and rel.suffix != ".png":
+            out = rel.with_name(rel.name + ".png")
+        outputs[out.as_posix()] += 1
+        jobs.append({"input": rel.as_posix(), "output": out.as_posix(), "src": str(path), "dst": str(out_root / out)})
+    for job in jobs:
+        if outputs[job["output"]] > 1:
+            job["error"] = f"输出文件重名: {job['output']}"
+    return jobs
+
+
+# ---------- 清单 ----------
+class Manifest:
+    """追加式 JSON lines；同一输入的后写记录覆盖先写记录"""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.records: Dict[str, dict] = {}
+        if self.path.exists():
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        continue  # 中断时写了一半的行
+                    self.records[rec["input"]] = rec
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._f = open(self.path, "a", encoding="utf-8")
+
+    def up_to_date(self, job: dict, key: str) -> bool:
+        """输入未变、参数相同且输出仍是当时写出的文件"""
+        rec = self.records.get(job["input"])
+        return (rec is not None and rec.get("status") == "ok" and rec.get("options") == key
+                and rec.get("input_sig") == _signature(Path(job["src"]))
+                and rec.get("output_sig") == _signature(Path(job["dst"])))
+
+    def add(self, rec: dict):
+        self.records[rec["input"]] = rec
+        self._f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        self._f.flush()
+
+    def close(self):
+        self._f.close()
+
+
+# ---------- 工作进程 ----------
+def _init_worker(args_dict: dict, single_thread: bool):
+    """进程池初始化：导入依赖、限制内部线程数（多进程时避免超订），并试跑一张小图预热"""
+    global _worker_args
+    _worker_args = Namespace(**args_dict)
+    if single_thread:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(1)
+    import pixelate
+    from metrics import NULL_METRICS
+    from progress import ProgressReporter
+    warm = np.zeros((2 * _worker_args.pixel_size, 2 * _worker_args.pixel_size, 3), dtype=np.uint8)
+    warm[::2] = 255
+    pixelate.render(warm, _worker_args, ProgressReporter(), NULL_METRICS)
+
+
+def process_file(src: str, dst: str) -> dict:
+    """处理单个文件（在工作进程中执行）；先写临时文件再改名，中断不会留下看似完整的输出"""
+    import pixelate
+    from metrics import NULL_METRICS
+    from progress import ProgressReporter
+    args = _worker_args
+    t0 = time.perf_counter()
+    img = pixelate.load_image(src)
+    img.load()
+    result = pixelate.render(img, args, ProgressReporter(), NULL_METRICS)
+    Path(dst).parent.mkdir(parents=True, exist_ok=True)
+    tmp = f"{dst}.{os.getpid()}.tmp"
+    pixelate.save_image(result, tmp, args.png_compression)
+    os.replace(tmp, dst)
+    return {"width": result.shape[1], "height": result.shape[0],
+            "ms": round((time.perf_counter() - t0) * 1000, 1), "worker": os.getpid()}
+
+
+def _run_job(job: dict) -> dict:
+    try:
+        return dict(job, status="ok", **process_file(job["src"], job["dst"]))
+    except Exception as e:  # 单个文件失败不影响其余文件
+        return dict(job, status="error", error=str(e))
+
+
+# ---------- 主进程 ----------
+def run_batch(args: Namespace, options: dict, out: TextIO = sys.stdout,
+              progress: Optional[Callable[[str, int, int], None]] = None) -> dict:
+    """
+    处理 args.input_dir 下的全部图片；options 为影响输出的参数（决定清单中的参数键）。
+    返回 {"total", "ok", "skipped", "failed", "workers"}
+    """
+    progress = progress or (lambda stage, done, total: None)
+    key = options_key(options)
+    manifest = Manifest(args.manifest or os.path.join(args.output_dir, MANIFEST_NAME))
+    jobs = discover(args.input_dir, args.output_dir)
+    counts = {"total": len(jobs), "ok": 0, "skipped": 0, "failed": 0}
+
+    def emit(rec: dict):
+        line = {k: v for k, v in rec.items() if k not in ("src", "dst", "input_sig", "output_sig", "options")}
+        out.write(json.dumps(line, ensure_ascii=False) + "\n")
+        out.flush()
+        done = counts["ok"] + counts["skipped"] + counts["failed"]
+        progress("batch", done, counts["total"])
+
+    pending = []
+    for job in jobs:
+        if "error" in job:
+            counts["failed"] += 1
+            emit(dict(job, status="error"))
+        elif manifest.up_to_date(job, key):
+            counts["skipped"] += 1
+            emit(dict(job, status="skipped"))
+        else:
+            pending.append(job)
+    pending.sort(key=lambda j: _pixels(Path(j["src"])), reverse=True)  # 大图优先
+
+    def finish(rec: dict):
+        if rec["status"] == "ok":
+            counts["ok"] += 1
+            rec["options"] = key
+            rec["input_sig"] = _signature(Path(rec["src"]))
+            rec["output_sig"] = _signature(Path(rec["dst"]))
+            rec["time"] = time.time()
+            manifest.add(rec)
+        else:
+            counts["failed"] += 1
+        emit(rec)
+
+    workers = max(1, min(args.workers or os.cpu_count() or 1, len(pending) or 1))
+    args_dict = vars(args)
+    try:
+        if workers == 1:
+            _init_worker(args_dict, False)
+            for job in pending:
+                finish(_run_job(job))
+        elif pending:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(args_dict, True)) as pool:
+                futures = [pool.submit(_run_job, job) for job in pending]
+                for fut in as_completed(futures):
+                    finish(fut.result())
+    finally:
+        manifest.close()
+    counts["workers"] = workers
+    return counts
+
+
+# ---------- 共享内存交接 ----------
+def _release(shm: SharedMemory, unlink: bool = True):
+    try:
+        shm.close()
+    except BufferError:
+        pass  # 调用方仍持有视图：映射随视图释放，名字照常删除
+    if unlink:
+        shm.unlink()
+
+
+class SharedRing:
+    """
+    n 个槽位，每个槽位一对输入 / 输出共享内存块；块按需增大（换新名字），否则一直复用，
+    稳态下不再分配。主进程创建并负责 unlink
+    """
+
+    def __init__(self, n: int):
+        self.blocks: List[Dict[str, SharedMemory]] = [{} for _ in range(n)]
+
+    def __len__(self):
+        return len(self.blocks)
+
+    def _block(self, slot: int, role: str, nbytes: int) -> SharedMemory:
+        shm = self.blocks[slot].get(role)
+        if shm is None or shm.size < nbytes:
+            if shm is not None:
+                _release(shm)
+            shm = SharedMemory(create=True, size=max(nbytes, 1))
+            self.blocks[slot][role] = shm
+        return shm
+
+    def put(self, slot: int, arr: np.ndarray) -> dict:
+        """把输入复制进槽位（唯一一次复制），返回发给工作进程的描述"""
+        arr = np.asarray(arr)
+        inp = self._block(slot, "in", arr.nbytes)
+        np.copyto(np.ndarray(arr.shape, arr.dtype, buffer=inp.buf), arr)
+        out = self._block(slot, "out", arr.shape[0] * arr.shape[1] * 3)
+        return {"slot": slot, "in": inp.name, "out": out.name, "out_size": out.size,
+                "shape": arr.shape, "dtype": arr.dtype.str}
+
+    def output(self, slot: int, shape: Tuple[int, ...]) -> np.ndarray:
+        return np.ndarray(shape, np.uint8, buffer=self.blocks[slot]["out"].buf)
+
+    def close(self):
+        for pair in self.blocks:
+            for shm in pair.values():
+                _release(shm)
+            pair.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _attach(slot: int, role: str, name: str) -> SharedMemory:
+    """按槽位缓存映射；主进程换了新块时关闭旧映射"""
+    shm = _attached.get((slot, role))
+    if shm is None or shm.name != name:
+        if shm is not None:
+            _release(shm, unlink=False)
+        shm = SharedMemory(name=name)
+        _attached[(slot, role)] = shm
+    return shm
+
+
+def _render_shared(desc: dict) -> Tuple[int, Tuple[int, ...], float]:
+    """工作进程：从输入块读、结果写入输出块，只返回槽位、输出形状与耗时"""
+    import pixelate
+    from metrics import NULL_METRICS
+    from progress import ProgressReporter
+    t0 = time.perf_counter()
+    inp = _attach(desc["slot"], "in", desc["in"])
+    rgb = np.ndarray(desc["shape"], np.dtype(desc["dtype"]), buffer=inp.buf)
+    result = np.asarray(pixelate.render(rgb, _worker_args, ProgressReporter(), NULL_METRICS), dtype=np.uint8)
+    del rgb
+    if result.nbytes > desc["out_size"]:
+        raise ValueError(f"输出尺寸超出共享缓冲: {result.shape}")
+    out = _attach(desc["slot"], "out", desc["out"])
+    np.copyto(np.ndarray(result.shape, np.uint8, buffer=out.buf), result)
+    return desc["slot"], result.shape, (time.perf_counter() - t0) * 1000
+
+
+def render_many(arrays: Iterable[np.ndarray], args: Namespace,
+                workers: Optional[int] = None) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    用预热的进程池渲染一串 RGB 数组，按完成顺序产出 (序号, 结果)。
+    结果是共享输出块上的视图，只在取下一个结果之前有效，需要保留时请自行 copy()
+    """
+    workers = max(1, workers or os.cpu_count() or 1)
+    if workers == 1:
+        _init_worker(vars(args), False)
+        import pixelate
+        from metrics import NULL_METRICS
+        from progress import ProgressReporter
+        for i, arr in enumerate(arrays):
+            yield i, pixelate.render(arr, args, ProgressReporter(), NULL_METRICS)
+        return
+
+    source = enumerate(arrays)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(vars(args), True)) as pool, SharedRing(2 * workers) as ring:
+        free = deque(range(len(ring)))  # 每个工作进程一个槽位在算、一个已备好
+        inflight = {}
+
+        def refill():
+            while free:
+                item = next(source, None)
+                if item is None:
+                    return
+                slot = free.popleft()
+                inflight[pool.submit(_render_shared, ring.put(slot, item[1]))] = item[0]
+
+        refill()
+        while inflight:
+            done, _ = wait(inflight, return_when=FIRST_COMPLETED)
+            for fut in done:
+                index = inflight.pop(fut)
+                slot, shape, _ = fut.result()
+                yield index, ring.output(slot, shape)
+                free.append(slot)
+            refill()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基准测试公共部分：确定性合成图像、计时统计、结果 JSON 与基线比较
+供 bench_kernels.py / bench_e2e.py 使用
+"""
+import json
+import os
+import platform
+import statistics
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+SIZES_MP = (0.25, 1, 4, 16, 64)
+IMAGE_KINDS = ("gradient", "noise", "photo")
+
+
+def image_shape(mp: float) -> tuple:
+    """按 4:3 比例换算百万像素为 (h, w)"""
+    w = int(round((mp * 1e6 * 4 / 3) ** 0.5))
+    return int(round(w * 3 / 4)), w
+
+
+def synthetic_image(kind: str, mp: float, seed: int = 0) -> np.ndarray:
+    h, w = image_shape(mp)
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:h, 0:w].astype(np.float32)
+    if kind == "gradient":
+        img = np.stack([xx / w * 255, yy / h * 255, (xx + yy) / (w + h) * 255], axis=-1)
+    elif kind == "noise":
+        return rng.integers(0, 256, (h, w, 3), dtype=np.uint8)
+    elif kind == "photo":
+        # 低频正弦叠加 + 若干硬边色块 + 少量噪声，近似照片的统计特征
+        img = np.zeros((h, w, 3), dtype=np.float32)
+        for c in range(3):
+            for _ in range(4):
+                fx, fy = rng.uniform(0.5, 6, 2) * 2 * np.pi
+                ph = rng.uniform(0, 2 * np.pi)
+                img[..., c] += np.sin(xx / w * fx + yy / h * fy + ph)
+        img = (img - img.min()) / (np.ptp(img) + 1e-6) * 255
+        for _ in range(12):
+            y0, x0 = rng.integers(0, h), rng.integers(0, w)
+            r = int(rng.integers(max(2, min(h, w) // 20), max(3, min(h, w) // 5)))
+            mask = (yy - y0) ** 2 + (xx - x0) ** 2 < r * r
+            img[mask] = rng.integers(0, 256, 3)
+        img += rng.normal(0, 6, img.shape).astype(np.float32)
+    else:
+        raise ValueError(f"未知的合成图像类型: {kind}")
+    return np.clip(img, 0, 255).astype(np.uint8)
+
+
+def time_call(fn: Callable[[], Optional[float]], repeat: int = 5, warmup: int = 1) -> Dict[str, float]:
+    """fn 可返回自行测得的秒数（float，如从 Metrics 中取出的阶段耗时），否则用墙钟时间"""
+    for _ in range(warmup):
+        fn()
+    samples: List[float] = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        own = fn()
+        dt = time.perf_counter() - t0
+        samples.append(own if isinstance(own, float) else dt)
+    return summarize(samples)
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+
+    def pct(p: float) -> float:
+        k = (len(ordered) - 1) * p
+        lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+        return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+    return {
+        "n": len(samples),
+        "min_s": ordered[0],
+        "median_s": statistics.median(ordered),
+        "mean_s": statistics.fmean(ordered),
+        "stdev_s": statistics.stdev(ordered) if len(ordered) > 1 else 0.0,
+        "p50_s": pct(0.50),
+        "p95_s": pct(0.95),
+        "p99_s": pct(0.99),
+        "max_s": ordered[-1],
+    }
+
+
+def environment() -> dict:
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": time.time(),
+    }
+
+
+def write_report(path: str, results: List[dict], extra: Optional[dict] = None):
+    report = {"environment": environment(), "results": results}
+    if extra:
+        report.update(extra)
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+def compare_to_baseline(results: List[dict], baseline_path: str, key_fields: tuple,
+                        metric: str = "median_s", tolerance: float = 0.15) -> List[dict]:
+    """返回超出容差的回归项；基线中没有的条目忽略"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+    index = {tuple(r.get(k) for k in key_fields): r for r in baseline}
+    regressions = []
+    for r in results:
+        base = index.get(tuple(r.get(k) for k in key_fields))
+        if base is None or metric not in base or metric not in r:
+            continue
+        if r[metric] > base[metric] * (1 + tolerance):
+            regressions.append({**{k: r.get(k) for k in key_fields}, "baseline": base[metric],
+                                "current": r[metric], "ratio": r[metric] / base[metric]})
+    return regressions
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+端到端吞吐 / 延迟基准
+按 PythonPixelArtService 的调用方式驱动三条路径：
+  - cli_file：pixelate.py --input/--output（临时文件）
+  - cli_pipe：pixelate.py --pipe-mode，PNG 经 stdin/stdout 传输
+  - processors：进程内调用 processors.process_image_internal
+冷启动与热启动分开统计：
+  - CLI 冷启动每次使用全新的 PYTHONPYCACHEPREFIX（含字节码编译），热启动复用已填充的前缀
+  - processors 冷启动为新解释器中 import + 首次调用，热启动为同一进程内预热后的重复调用
+CLI 热启动样本同时收集 --metrics 阶段耗时，并给出进程启动 + import 的开销（墙钟 - 脚本内计时）
+
+用法：
+  python bench_e2e.py --sizes 0.25,1 --output bench_e2e.json
+  python bench_e2e.py --baseline baseline.json --tolerance 0.15   # 有回归时退出码为 1
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from io import BytesIO
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from PIL import Image
+
+from bench_common import IMAGE_KINDS, synthetic_image, summarize, write_report, compare_to_baseline
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+PIXELATE = str(SCRIPT_DIR / "pixelate.py")
+MODES = ("cli_file", "cli_pipe", "processors")
+DEFAULT_SIZES = (0.25, 1, 4)
+
+# 新解释器中 import processors 并处理一次（processors 冷启动），在子进程内计时
+_COLD_PROCESSORS = """
+import sys, time
+t0 = time.perf_counter()
+sys.path.insert(0, {script_dir!r})
+from processors import process_image_internal
+process_image_internal(open({path!r}, "rb").read(), {options!r})
+print(time.perf_counter() - t0)
+"""
+
+
+def cli_args(args: argparse.Namespace) -> List[str]:
+    """与 BuildCommandArguments / BuildPipeCommandArguments 一致的参数集"""
+    out = ["--pixel-size", str(args.pixel_size), "--color-count", str(args.color_count),
+           "--palette", "default", "--algorithm", args.algorithm,
+           "--edge-smoothing", "0.50", "--contrast", "1.00", "--brightness", "1.00", "--saturation", "1.00"]
+    if args.dithering:
+        out.append("--dithering")
+    return out
+
+
+def processor_options(args: argparse.Namespace) -> dict:
+    return {"block_size": args.pixel_size, "max_colors": args.color_count,
+            "enable_dither": args.dithering, "algorithm": args.algorithm}
+
+
+def encode_input(img) -> bytes:
+    buf = BytesIO()
+    Image.fromarray(img).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def _env(pycache: str) -> dict:
+    env = dict(os.environ)
+    env["PYTHONPYCACHEPREFIX"] = pycache
+    # 否则热启动前缀永远不会被填充，每次都退化为冷启动
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    return env
+
+
+def run_cli(mode: str, png: bytes, extra: List[str], workdir: str, pycache: str,
+            metrics_path: Optional[str] = None) -> dict:
+    """运行一次 CLI，返回墙钟时间、脚本自报时间与（可选）阶段耗时"""
+    cmd = [sys.executable, PIXELATE] + extra
+    if metrics_path:
+        cmd += ["--metrics", metrics_path]
+    if mode == "cli_pipe":
+        cmd.append("--pipe-mode")
+        stdin = png
+    else:
+        in_path = os.path.join(workdir, "in.png")
+        Path(in_path).write_bytes(png)
+        cmd += ["--input", in_path, "--output", os.path.join(workdir, "out.png")]
+        stdin = None
+    t0 = time.perf_counter()
+    proc = subprocess.run(cmd, input=stdin, capture_output=True, cwd=str(SCRIPT_DIR), env=_env(pycache))
+    wall = time.perf_counter() - t0
+    if proc.returncode != 0:
+        raise RuntimeError(f"{mode} 失败: {proc.stderr.decode('utf-8', 'replace').strip()}")
+    # 管道模式下状态行跟在图像字节之后
+    tail = proc.stdout[-256:].decode("utf-8", "replace")
+    script_s = next((float(line[5:]) for line in tail.splitlines() if line.startswith("TIME:")), None)
+    rec = {"wall_s": wall, "script_s": script_s}
+    if metrics_path:
+        with open(metrics_path, encoding="utf-8") as f:
+            rec["stages"] = {k: v["wall_s"] for k, v in json.load(f)["stages"].items()}
+    return rec
+
+
+def bench_cli(mode: str, png: bytes, args: argparse.Namespace, workdir: str) -> Dict[str, dict]:
+    extra = cli_args(args)
+    cold = []
+    for i in range(args.cold_repeat):
+        cold.append(run_cli(mode, png, extra, workdir, os.path.join(workdir, f"pycache_cold_{mode}_{i}"))["wall_s"])
+
+    warm_cache = os.path.join(workdir, "pycache_warm")
+    for _ in range(args.warmup):
+        run_cli(mode, png, extra, workdir, warm_cache)
+    runs = [run_cli(mode, png, extra, workdir, warm_cache, os.path.join(workdir, "metrics.json"))
+            for _ in range(args.repeat)]
+    walls = [r["wall_s"] for r in runs]
+    # 进程启动 + import + 管道/文件传输，即墙钟中脚本自身未计入的部分
+    overhead = [r["wall_s"] - r["script_s"] for r in runs if r["script_s"] is not None]
+    stages: Dict[str, List[float]] = {}
+    for r in runs:
+        for name, v in r.get("stages", {}).items():
+            stages.setdefault(name, []).append(v)
+    warm = summarize(walls)
+    warm["overhead_median_s"] = summarize(overhead)["median_s"] if overhead else None
+    warm["stages_median_s"] = {k: summarize(v)["median_s"] for k, v in sorted(stages.items())}
+    return {"cold": summarize(cold), "warm": warm}
+
+
+def bench_processors(png: bytes, args: argparse.Namespace, workdir: str) -> Dict[str, dict]:
+    options = processor_options(args)
+    in_path = os.path.join(workdir, "in.png")
+    Path(in_path).write_bytes(png)
+    code = _COLD_PROCESSORS.format(script_dir=str(SCRIPT_DIR), path=in_path, options=options)
+    cold = []
+    for i in range(args.cold_repeat):
+        proc = subprocess.run([sys.executable, "-c", code], capture_output=True, cwd=str(SCRIPT_DIR),
+                              env=_env(os.path.join(workdir, f"pycache_cold_proc_{i}")))
+        if proc.returncode != 0:
+            raise RuntimeError(f"processors 失败: {proc.stderr.decode('utf-8', 'replace').strip()}")
+        cold.append(float(proc.stdout.decode().strip().splitlines()[-1]))
+
+    from processors import process_image_internal
+    for _ in range(args.warmup):
+        process_image_internal(png, options)
+    warm = []
+    for _ in range(args.repeat):
+        t0 = time.perf_counter()
+        process_image_internal(png, options)
+        warm.append(time.perf_counter() - t0)
+    return {"cold": summarize(cold), "warm": summarize(warm)}
+
+
+def run_suite(modes: List[str], sizes: List[float], kinds: List[str], args: argparse.Namespace,
+              log: Optional[Callable[[str], None]] = print) -> List[dict]:
+    results = []
+    with tempfile.TemporaryDirectory(prefix="bench_e2e_") as workdir:
+        for mp in sizes:
+            for kind in kinds:
+                img = synthetic_image(kind, mp)
+                png = encode_input(img)
+                n_px = img.shape[0] * img.shape[1]
+                for mode in modes:
+                    if mode == "processors":
+                        phases = bench_processors(png, args, workdir)
+                    else:
+                        phases = bench_cli(mode, png, args, workdir)
+                    for phase, stats in phases.items():
+                        rec = {"mode": mode, "phase": phase, "image": kind, "mp": mp,
+                               "pixel_size": args.pixel_size, "algorithm": args.algorithm,
+                               "pixels": n_px, "input_bytes": len(png), **stats,
+                               "images_per_s": 1.0 / stats["mean_s"],
+                               "mpx_per_s": n_px / stats["median_s"] / 1e6}
+                        results.append(rec)
+                        if log:
+                            log(f"{mode:10s} {phase:4s} {kind:8s} {mp:6.2f}MP  "
+                                f"p50={stats['p50_s'] * 1000:8.1f}ms  p95={stats['p95_s'] * 1000:8.1f}ms  "
+                                f"p99={stats['p99_s'] * 1000:8.1f}ms  {rec['images_per_s']:6.2f} img/s")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端吞吐 / 延迟基准")
+    parser.add_argument("--modes", default=",".join(MODES), help="逗号分隔：cli_file,cli_pipe,processors")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES), help="图像尺寸 (MP)，逗号分隔")
+    parser.add_argument("--kinds", default="photo", help=f"合成图像类型：{','.join(IMAGE_KINDS)}")
+    parser.add_argument("--pixel-size", type=int, default=8, help="像素块大小")
+    parser.add_argument("--color-count", type=int, default=32, help="颜色数量")
+    parser.add_argument("--algorithm", default="basic", help="像素化算法")
+    parser.add_argument("--dithering", action="store_true", help="启用抖动")
+    parser.add_argument("--repeat", type=int, default=10, help="热启动重复次数")
+    parser.add_argument("--cold-repeat", type=int, default=3, help="冷启动重复次数")
+    parser.add_argument("--warmup", type=int, default=1, help="热启动预热次数")
+    parser.add_argument("--output", default="bench_e2e.json", help="结果 JSON 路径")
+    parser.add_argument("--baseline", help="与之比较的基线 JSON")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="允许的相对变慢比例")
+    args = parser.parse_args()
+
+    modes = [m for m in args.modes.split(",") if m]
+    unknown = [m for m in modes if m not in MODES]
+    if unknown:
+        parser.error(f"未知模式: {', '.join(unknown)}（可选 {', '.join(MODES)}）")
+    if args.repeat < 1 or args.cold_repeat < 1:
+        parser.error("--repeat 与 --cold-repeat 至少为 1")
+    sizes = [float(s) for s in args.sizes.split(",") if s]
+    kinds = [k for k in args.kinds.split(",") if k]
+
+    results = run_suite(modes, sizes, kinds, args)
+    write_report(args.output, results, {"suite": "e2e", "options": cli_args(args)})
+    print(f"结果已写入 {args.output}")
+
+    if args.baseline:
+        regressions = compare_to_baseline(results, args.baseline,
+                                          ("mode", "phase", "image", "mp", "pixel_size", "algorithm"),
+                                          metric="p50_s", tolerance=args.tolerance)
+        for r in regressions:
+            print(f"REGRESSION {r['mode']} {r['phase']} {r['image']} {r['mp']}MP: "
+                  f"{r['baseline'] * 1000:.1f}ms -> {r['current'] * 1000:.1f}ms (x{r['ratio']:.2f})")
+        if regressions:
+            sys.exit(1)
+        print(f"与基线相比无超过 {args.tolerance:.0%} 的回归")
+
+
+if __name__ == "__main__":
+    main()
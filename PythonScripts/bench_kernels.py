@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+核心算法内核微基准（取代 profile_core.py）
+逐个内核计时：Lab 转换、种子初始化、SLIC 迭代、块均值 / 块中值、k-means、调色板映射、
+各抖动模式、描边、网格线；确定性合成图像，带预热与重复，结果写 JSON 并可与基线比较
+
+用法：
+  python bench_kernels.py --sizes 0.25,1 --output bench_kernels.json
+  python bench_kernels.py --baseline baseline.json --tolerance 0.15   # 有回归时退出码为 1
+"""
+import argparse
+import sys
+from typing import Callable, Dict, List, Optional
+
+from bench_common import (SIZES_MP, IMAGE_KINDS, synthetic_image, time_call, write_report,
+                          compare_to_baseline)
+from core import PixelArtConfig, PixelArtGenerator, SLICPixelArtCore, Dithering, rgb_to_lab
+from metrics import Metrics
+from blocks import block_median
+from overlays import grid_overlay
+from pixelate import add_edge_outline
+
+
+# ---------- 内核定义 ----------
+# setup(img, pixel_size) 在计时外执行，返回被计时的无参函数；
+# 被计时函数可返回自测秒数（SLIC 迭代从 Metrics 中取单次迭代耗时）
+def _lab(img, ps):
+    return lambda: rgb_to_lab(img)
+
+
+def _seed(img, ps):
+    core = SLICPixelArtCore(PixelArtConfig(pixel_size=ps))
+    lab = rgb_to_lab(img)
+    return lambda: core.initialize_centers(lab)
+
+
+def _slic_iter(img, ps):
+    def run():
+        m = Metrics()
+        SLICPixelArtCore(PixelArtConfig(pixel_size=ps), metrics=m).slic_superpixel(img)
+        rec = m.stages["slic_iter"]
+        return rec["wall_s"] / rec["calls"]
+    return run
+
+
+def _block_mean(img, ps):
+    core = SLICPixelArtCore(PixelArtConfig(pixel_size=ps, align_grid=True))
+    return lambda: core.render_indexed(img)
+
+
+def _block_median(img, ps):
+    return lambda: block_median(img, ps)
+
+
+def _cells(img, ps):
+    """栅格对齐结果（索引色图像），与生成器量化 / 调色板映射的输入一致"""
+    return SLICPixelArtCore(PixelArtConfig(pixel_size=ps, align_grid=True)).render_indexed(img)
+
+
+def _generator(ps):
+    return PixelArtGenerator(PixelArtConfig(pixel_size=ps, color_count=16, align_grid=True))
+
+
+def _kmeans(img, ps):
+    # 生成器在调色板上按像素数加权聚类（见 PixelArtGenerator._quantize）
+    gen, base = _generator(ps), _cells(img, ps)
+    return lambda: gen._quantize(base)
+
+
+def _palette_map(img, ps):
+    gen, base = _generator(ps), _cells(img, ps)
+    pal = gen.mapper.create_retro_palette("c64")
+    return lambda: gen._map_palette(base, pal)
+
+
+def _dither(method):
+    def setup(img, ps):
+        quant = _generator(ps)._quantize(_cells(img, ps)).to_rgb()
+        return lambda: Dithering().apply_dithering(quant, method, 1)
+    return setup
+
+
+def _outline(img, ps):
+    base = _cells(img, ps).to_rgb()
+    return lambda: add_edge_outline(base, thickness=3, cell=ps)
+
+
+def _grid_overlay(img, ps):
+    base = _cells(img, ps).to_rgb()
+    return lambda: grid_overlay(base, ps, alpha=0.5)
+
+
+# 名称 -> (setup, 默认最大尺寸 MP)；纯 Python 逐像素内核默认只跑小图，--full 取消限制
+KERNELS: Dict[str, tuple] = {
+    "lab": (_lab, 64),
+    "seed": (_seed, 16),
+    "slic_iter": (_slic_iter, 16),
+    "block_mean": (_block_mean, 64),
+    "block_median": (_block_median, 64),
+    "kmeans": (_kmeans, 64),
+    "palette_map": (_palette_map, 64),
+    "dither_floyd_steinberg": (_dither("floyd_steinberg"), 0.25),
+    "dither_atkinson": (_dither("atkinson"), 0.25),
+    "outline": (_outline, 64),
+    "grid_overlay": (_grid_overlay, 16),
+}
+
+
+def run_suite(kernels: List[str], sizes: List[float], kinds: List[str], pixel_size: int,
+              repeat: int, warmup: int, full: bool = False,
+              log: Optional[Callable[[str], None]] = print) -> List[dict]:
+    results = []
+    for mp in sizes:
+        for kind in kinds:
+            img = synthetic_image(kind, mp)
+            for name in kernels:
+                setup, max_mp = KERNELS[name]
+                if mp > max_mp and not full:
+                    continue
+                stats = time_call(setup(img, pixel_size), repeat=repeat, warmup=warmup)
+                n_px = img.shape[0] * img.shape[1]
+                rec = {"kernel": name, "image": kind, "mp": mp, "pixel_size": pixel_size,
+                       "pixels": n_px, **stats, "mpx_per_s": n_px / stats["median_s"] / 1e6}
+                results.append(rec)
+                if log:
+                    log(f"{name:24s} {kind:8s} {mp:6.2f}MP  median={stats['median_s'] * 1000:9.2f}ms  "
+                        f"{rec['mpx_per_s']:8.2f} Mpx/s")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="核心内核微基准")
+    parser.add_argument("--kernels", default=",".join(KERNELS), help="逗号分隔的内核名")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in SIZES_MP), help="图像尺寸 (MP)，逗号分隔")
+    parser.add_argument("--kinds", default=",".join(IMAGE_KINDS), help="合成图像类型：gradient,noise,photo")
+    parser.add_argument("--pixel-size", type=int, default=8, help="像素块大小")
+    parser.add_argument("--repeat", type=int, default=5, help="每项重复次数")
+    parser.add_argument("--warmup", type=int, default=1, help="每项预热次数")
+    parser.add_argument("--full", action="store_true", help="忽略各内核默认的最大尺寸")
+    parser.add_argument("--output", default="bench_kernels.json", help="结果 JSON 路径")
+    parser.add_argument("--baseline", help="与之比较的基线 JSON")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="允许的相对变慢比例")
+    args = parser.parse_args()
+
+    kernels = [k for k in args.kernels.split(",") if k]
+    unknown = [k for k in kernels if k not in KERNELS]
+    if unknown:
+        parser.error(f"未知内核: {', '.join(unknown)}（可选 {', '.join(KERNELS)}）")
+    sizes = [float(s) for s in args.sizes.split(",") if s]
+    kinds = [k for k in args.kinds.split(",") if k]
+
+    results = run_suite(kernels, sizes, kinds, args.pixel_size, args.repeat, args.warmup, args.full)
+    write_report(args.output, results, {"suite": "kernels"})
+    print(f"结果已写入 {args.output}")
+
+    if args.baseline:
+        regressions = compare_to_baseline(results, args.baseline, ("kernel", "image", "mp", "pixel_size"),
+                                          tolerance=args.tolerance)
+        for r in regressions:
+            print(f"REGRESSION {r['kernel']} {r['image']} {r['mp']}MP: "
+                  f"{r['baseline'] * 1000:.2f}ms -> {r['current'] * 1000:.2f}ms (x{r['ratio']:.2f})")
+        if regressions:
+            sys.exit(1)
+        print(f"与基线相比无超过 {args.tolerance:.0%} 的回归")
+
+
+if __name__ == "__main__":
+    main()
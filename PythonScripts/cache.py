@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+渲染结果磁盘缓存
+键 = 输入内容哈希 + 规范化配置，值 = 编码后的输出字节
+多进程安全：写入走临时文件 + os.replace，淘汰按 mtime 做 LRU
+"""
+import hashlib
+import json
+import os
+import tempfile
+from dataclasses import asdict
+from pathlib import Path
+from typing import Optional
+
+from core import PixelArtConfig
+
+# 算法输出发生变化时递增，使旧缓存自然失效
+CACHE_VERSION = 1
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+_SUFFIX = ".bin"
+
+
+def canonical_config(cfg: PixelArtConfig, options: Optional[dict] = None) -> str:
+    """配置 + 选项的规范化序列化（键排序、无多余空白）"""
+    payload = {"version": CACHE_VERSION, "config": asdict(cfg), "options": options or {}}
+    return json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+class ResultCache:
+    def __init__(self, cache_dir: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = Path(cache_dir)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def make_key(self, data: bytes, cfg: PixelArtConfig, options: Optional[dict] = None) -> str:
+        h = hashlib.sha256()
+        h.update(hashlib.sha256(data).digest())
+        h.update(canonical_config(cfg, options).encode("utf-8"))
+        return h.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / (key + _SUFFIX)
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+        except OSError:
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)  # 刷新 mtime，作为 LRU 时间戳
+        except OSError:
+            pass
+        self.hits += 1
+        return data
+
+    def put(self, key: str, data: bytes):
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-", suffix=_SUFFIX)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)  # 原子替换，并发读者只会看到完整文件
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+        self.evict()
+
+    def evict(self):
+        """超出容量时按 mtime 从旧到新删除；其他进程并发删除的文件直接跳过"""
+        entries, total = [], 0
+        for sub in self.root.iterdir():
+            if not sub.is_dir():
+                continue
+            for entry in os.scandir(sub):
+                if not entry.name.endswith(_SUFFIX) or entry.name.startswith(".tmp-"):
+                    continue
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, entry.path))
+                total += st.st_size
+        if total <= self.max_bytes:
+            return
+        entries.sort()
+        for _, size, p in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(p)
+            except OSError:
+                continue
+            total -= size
+
+    def stats_line(self) -> str:
+        return f"CACHE:hits={self.hits},misses={self.misses}"
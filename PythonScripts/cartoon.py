@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+卡通效果（--cartoon-effect / processors.cartoon_effect）
+亮度的可分离 Scharr 梯度作为边缘强度，逐通道色阶分离（posterize），一次融合计算：
+  out = posterize(rgb) · (1 - edge_weight · edge)
+栅格对齐 / 块算法直接作用于格子颜色（每格一个样本，不增加整帧遍历）；
+整帧输入按行块处理（每块上下各带 1 行邻域），大图时各行块在线程池中并行（NumPy 运算释放 GIL）
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import numpy as np
+
+_TILE_ROWS = 256
+_PARALLEL_PIXELS = 1 << 22  # 达到该像素数才并行，小图线程开销不划算
+# 边缘强度：归一化梯度幅值在 [_EDGE_LOW, _EDGE_HIGH] 间线性过渡到 0-1，弱纹理不出线
+_EDGE_LOW, _EDGE_HIGH = 0.05, 0.25
+_SCHARR_NORM = 1.0 / (16 * 255)  # 0→255 阶跃边缘的 Scharr 响应为 16·255
+
+
+def posterize_lut(levels: int) -> np.ndarray:
+    """每通道 levels 级色阶的 256 项查找表（就近取级）"""
+    step = 255.0 / (max(2, levels) - 1)
+    return (np.round(np.round(np.arange(256) / step) * step)).astype(np.uint8)
+
+
+def _luma(rgb: np.ndarray) -> np.ndarray:
+    l = rgb[..., 0] * np.float32(0.299)
+    l += rgb[..., 1] * np.float32(0.587)
+    l += rgb[..., 2] * np.float32(0.114)
+    return l
+
+
+def _edges(luma_p: np.ndarray) -> np.ndarray:
+    """luma_p 为四周各填充 1 的亮度，返回原尺寸的 0-1 边缘强度"""
+    # 可分离 Scharr：水平差分 [-1, 0, 1] × 垂直平滑 [3, 10, 3]，垂直方向同理
+    dx = luma_p[:, 2:] - luma_p[:, :-2]
+    gx = 3 * (dx[:-2] + dx[2:]) + 10 * dx[1:-1]
+    sy = 3 * (luma_p[:, :-2] + luma_p[:, 2:]) + 10 * luma_p[:, 1:-1]
+    gy = sy[2:] - sy[:-2]
+    mag = np.hypot(gx, gy)
+    mag *= np.float32(_SCHARR_NORM / (_EDGE_HIGH - _EDGE_LOW))
+    mag -= np.float32(_EDGE_LOW / (_EDGE_HIGH - _EDGE_LOW))
+    return np.clip(mag, 0, 1, out=mag)
+
+
+def _cartoon_rows(rgb: np.ndarray, out: np.ndarray, y0: int, y1: int, edge_weight: float, lut: np.ndarray):
+    """计算输出的 [y0, y1) 行；边缘需要上下各 1 行邻域，图像边界处复制边缘行"""
+    h = rgb.shape[0]
+    if edge_weight > 0:
+        a, b = max(0, y0 - 1), min(h, y1 + 1)
+        luma = np.pad(_luma(rgb[a:b]), ((1 - (y0 - a), 1 - (b - y1)), (1, 1)), mode="edge")
+        scale = _edges(luma)
+        scale *= np.float32(-edge_weight)
+        scale += np.float32(1)
+    for c in range(3):  # 逐通道二维运算，避免长度为 3 的内层广播
+        poster = lut[rgb[y0:y1, :, c]]
+        out[y0:y1, :, c] = poster if edge_weight <= 0 else poster * scale
+
+
+def cartoon(rgb: np.ndarray, edge_weight: float = 0.3, levels: int = 8,
+            workers: Optional[int] = None) -> np.ndarray:
+    """
+    对 uint8 RGB 图像（或 hg×wg×3 的格子颜色）施加卡通效果，返回新数组
+    edge_weight: 边缘压暗强度 (0-1)，0 时只做色阶分离
+    levels: 每通道色阶数
+    workers: 并行行块的线程数，默认按 CPU 数（小图始终单线程）
+    """
+    h, w = rgb.shape[:2]
+    lut = posterize_lut(levels)
+    out = np.empty_like(rgb)
+    tiles = [(y0, min(h, y0 + _TILE_ROWS)) for y0 in range(0, h, _TILE_ROWS)]
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(tiles) > 1 and h * w >= _PARALLEL_PIXELS:
+        with ThreadPoolExecutor(max_workers=min(workers, len(tiles))) as pool:
+            list(pool.map(lambda t: _cartoon_rows(rgb, out, t[0], t[1], edge_weight, lut), tiles))
+    else:
+        for y0, y1 in tiles:
+            _cartoon_rows(rgb, out, y0, y1, edge_weight, lut)
+    return out
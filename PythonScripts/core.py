@@ -3,10 +3,21 @@ Numba 加速版 SLIC + 颜色量化 + 抖动
 无 OpenCV，纯 NumPy + PIL + Numba
 """
 from PIL import Image
+import copy
 import numpy as np
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 from sklearn.cluster import MiniBatchKMeans
+from threadpoolctl import threadpool_limits
+from metrics import NULL_METRICS
+from blocks import REDUCERS, block_mean, expand_cells
+from cartoon import cartoon
+from encoder import encode_png, replace_palette
+from indexed import IndexedImage, index_dtype
+from palettes import palette_colors
+import planner
 
 @dataclass
 class PixelArtConfig:
@@ -19,6 +30,11 @@ class PixelArtConfig:
     edge_harden: float = 0.0           # 边缘硬化强度
     align_grid: bool = False           # 栅格对齐
     quantize_space: str = "RGB"        # 颜色空间
+    cartoon_edge_weight: Optional[float] = None  # 卡通效果边缘强度，None 为关闭
+    cartoon_levels: int = 8            # 卡通效果每通道色阶数
+    slic_iters: int = 10               # SLIC 迭代上限
+    slic_tol: float = 0.5              # SLIC 残差阈值（中心平均位移，像素）
+    time_budget_ms: Optional[float] = None  # 时间预算，设置后由 planner 选择算法与参数
 
 
 # ---------- 颜色空间 ----------
@@ -75,6 +91,11 @@ def _rgb_to_lab_numpy(img: np.ndarray) -> np.ndarray:
     return lab
 
 
+def rgb_to_lab(img: np.ndarray) -> np.ndarray:
+    """有 numba 时用编译版本，否则用 NumPy 版本"""
+    return rgb_to_lab_numba(img) if hasattr(rgb_to_lab_numba, '__compiled__') else _rgb_to_lab_numpy(img)
+
+
 # 定义njit和prange的替代实现
 try:
     from numba import njit, prange
@@ -95,11 +116,21 @@ except ImportError:
         return range(*args)
 
 # ---------- Numba 加速 SLIC ----------
+# 进度回调：(阶段名, 已完成, 总数)
+ProgressCallback = Callable[[str, int, int], None]
+
+
 class SLICPixelArtCore:
-    def __init__(self, cfg: PixelArtConfig):
+    def __init__(self, cfg: PixelArtConfig, progress: Optional[ProgressCallback] = None, metrics=None):
         self.cfg = cfg
         self.labels = None
         self.centers = []
+        self.iterations = 0      # 最近一次分割实际执行的轮数
+        self.residual = np.inf   # 最近一次分割末轮的残差
+        self.progress = progress
+        self.metrics = metrics or NULL_METRICS
+        # 栅格对齐模式下作用于格子颜色（H_grid×W_grid×3, uint8）的变换，如颜色调整、卡通效果
+        self.cell_transform: Optional[Callable[[np.ndarray], np.ndarray]] = None
 
     def initialize_centers(self, lab: np.ndarray) -> np.ndarray:
         h, w = lab.shape[:2]
@@ -120,120 +151,201 @@ class SLICPixelArtCore:
                 centers.append([float(ci), float(cj), lab[ci, cj, 0], lab[ci, cj, 1], lab[ci, cj, 2]])
         return np.array(centers)
 
-    def slic_superpixel(self, img: np.ndarray) -> np.ndarray:
-        h, w = img.shape[:2]
-        # Use the numpy version when numba is not available
-        lab = rgb_to_lab_numba(img) if hasattr(rgb_to_lab_numba, '__compiled__') else _rgb_to_lab_numpy(img)
-        step = self.cfg.pixel_size
-        centers = self.initialize_centers(lab)
+    @staticmethod
+    def _centers_of(labels_flat: np.ndarray, rows: np.ndarray, cols: np.ndarray, lab_flat: np.ndarray,
+                    n_cent: int) -> np.ndarray:
+        """各标签的中心 [x(行), y(列), l, a, b]（像素坐标与 Lab 的均值），空标签为 0"""
+        cent = np.zeros((n_cent, 5))
+        counts = np.bincount(labels_flat, minlength=n_cent)
+        cent[:, 0] = np.bincount(labels_flat, weights=rows, minlength=n_cent)
+        cent[:, 1] = np.bincount(labels_flat, weights=cols, minlength=n_cent)
+        for c in range(3):
+            cent[:, 2 + c] = np.bincount(labels_flat, weights=lab_flat[:, c], minlength=n_cent)
+        cent /= np.maximum(counts, 1).reshape(-1, 1)
+        return cent
+
+    def slic_superpixel(self, img: np.ndarray, init_centers: Optional[np.ndarray] = None,
+                        init_labels: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        SLIC 分割并渲染超像素均值图；结果标签与中心存入 self.labels / self.centers。
+        热启动（相邻图块、上一帧、相近像素大小的旧结果等）：
+          init_centers: n×5 的 [x, y, l, a, b]，或 n×2 只给坐标（颜色取本图该位置）
+          init_labels:  与 img 同尺寸的标签图；中心由它在本图上的均值得到，
+                        像素初始归属沿用该图（距离按所属中心重建），小幅修改后通常 1-2 轮即收敛
+        两者都不给时按梯度播种。残差（中心坐标平均 L1 位移，像素）不超过 cfg.slic_tol 即停止，
+        cfg.slic_iters 为上限；实际轮数与末轮残差记在 self.iterations / self.residual
+        """
+        labels, centers, self.iterations, self.residual = self.segment(img, init_centers, init_labels)
+        self.labels, self.centers = labels, centers
         n_cent = len(centers)
-        labels = np.full((h, w), 0, dtype=np.int32)  # ← 非 -1，防止全黑
-        dists = np.full((h, w), np.inf, dtype=np.float32)
+        h, w = img.shape[:2]
+        # 向量化像素画（无逐 mask 循环）
+        with self.metrics.stage("slic_render", pixels=h * w):
+            out = np.zeros_like(img)
+            counts = np.bincount(labels.ravel(), minlength=n_cent)
+            for c in range(3):
+                channel_mean = np.bincount(labels.ravel(), weights=img[..., c].ravel(), minlength=n_cent)
+                channel_mean /= np.maximum(counts, 1)
+                out[..., c] = channel_mean[labels].astype(np.uint8)
+        return out
 
+    def segment(self, img: np.ndarray, init_centers: Optional[np.ndarray] = None,
+                init_labels: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray, int, float]:
+        """
+        slic_superpixel 的分割部分，返回 (labels, centers, 实际轮数, 末轮残差)；
+        只读 cfg / progress / metrics，不写实例状态，可被多个线程同时调用
+        """
+        h, w = img.shape[:2]
+        m = self.metrics
+        with m.stage("lab", pixels=h * w):
+            lab = rgb_to_lab(img)
+        step = self.cfg.pixel_size
         yy, xx = np.mgrid[0:h, 0:w]
         lab_flat = lab.reshape(-1, 3)
         yy_flat = yy.ravel()
         xx_flat = xx.ravel()
+        dists = np.full((h, w), np.inf, dtype=np.float32)
+
+        with m.stage("slic_seed", pixels=h * w):
+            if init_labels is not None:
+                if init_labels.shape != (h, w):
+                    raise ValueError(f"标签图尺寸 {init_labels.shape} 与图像 {(h, w)} 不一致")
+                labels = np.ascontiguousarray(init_labels, dtype=np.int32).copy()
+                labels[labels < 0] = 0
+                present = np.bincount(labels.ravel()) > 0
+                if not present.all():  # 裁剪等导致的空标签压缩掉，避免零中心
+                    labels = (np.cumsum(present) - 1).astype(np.int32)[labels]
+                n_cent = int(labels.max()) + 1
+                centers = self._centers_of(labels.ravel(), yy_flat, xx_flat, lab_flat, n_cent)
+                # 像素到所属中心的距离，与分配步同一公式（逐分量累加，避免 h×w×5 的中间数组）
+                d = (yy - centers[labels, 0]) ** 2 + (xx - centers[labels, 1]) ** 2
+                for c in range(3):
+                    d += (lab[..., c] - centers[labels, 2 + c]) ** 2
+                dists[...] = d / (step ** 2)
+            else:
+                if init_centers is not None:
+                    centers = np.array(init_centers, dtype=np.float64)
+                    if centers.ndim != 2 or centers.shape[1] not in (2, 5):
+                        raise ValueError("init_centers 应为 n×2 或 n×5 数组")
+                    centers[:, 0] = np.clip(centers[:, 0], 0, h - 1)
+                    centers[:, 1] = np.clip(centers[:, 1], 0, w - 1)
+                    if centers.shape[1] == 2:
+                        pos = centers.astype(int)
+                        centers = np.hstack([centers, lab[pos[:, 0], pos[:, 1]]])
+                else:
+                    centers = self.initialize_centers(lab)
+                labels = np.full((h, w), 0, dtype=np.int32)  # ← 非 -1，防止全黑
+        n_cent = len(centers)
         labels_flat = labels.ravel()
         dists_flat = dists.ravel()
 
-        for itr in range(10):
-            for k in range(n_cent):
-                cx, cy = int(centers[k, 0]), int(centers[k, 1])
-                x0, x1 = max(0, cx - step), min(h, cx + step)
-                y0, y1 = max(0, cy - step), min(w, cy + step)
-                h_sub, w_sub = x1 - x0, y1 - y0
-
-                sub_idx = np.arange(x0, x1)[:, None] * w + np.arange(y0, y1)[None, :]
-                sub_idx = sub_idx.ravel()
-
-                sub_lab = lab[x0:x1, y0:y1]
-                sub_xx = xx[x0:x1, y0:y1]
-                sub_yy = yy[x0:x1, y0:y1]
-
-                dc = np.sum((sub_lab - centers[k, 2:5]) ** 2, axis=2)
-                ds = (sub_xx - cx) ** 2 + (sub_yy - cy) ** 2
-                d_flat = (dc / (step ** 2) + ds / (step ** 2)).ravel()
-
-                sub_d_flat = dists_flat[sub_idx]
-                mask_flat = d_flat < sub_d_flat
-                sub_d_flat[mask_flat] = d_flat[mask_flat]
-                dists_flat[sub_idx] = sub_d_flat
-                labels_flat[sub_idx[mask_flat]] = k
-
-            # 一次性向量化中心更新
-            new_cent = np.zeros((n_cent, 5))
-            counts = np.bincount(labels_flat, minlength=n_cent)
-            new_cent[:, 0] = np.bincount(labels_flat, weights=xx_flat, minlength=n_cent)
-            new_cent[:, 1] = np.bincount(labels_flat, weights=yy_flat, minlength=n_cent)
-            new_cent[:, 2] = np.bincount(labels_flat, weights=lab_flat[:, 0], minlength=n_cent)
-            new_cent[:, 3] = np.bincount(labels_flat, weights=lab_flat[:, 1], minlength=n_cent)
-            new_cent[:, 4] = np.bincount(labels_flat, weights=lab_flat[:, 2], minlength=n_cent)
-            counts = np.maximum(counts, 1)
-            new_cent /= counts.reshape(-1, 1)
-            centers = new_cent
-
-            # Early-Stop（可选）
-            if np.max(np.abs(new_cent - centers)) < 0.5:
-                break
-
-        self.labels, self.centers = labels, centers
-        # 向量化像素画（无逐 mask 循环）
-        out = np.zeros_like(img)
-        counts = np.bincount(labels.ravel(), minlength=n_cent)
-        for c in range(3):
-            channel_mean = np.bincount(labels.ravel(), weights=img[..., c].ravel(), minlength=n_cent)
-            channel_mean /= np.maximum(counts, 1)
-            out[..., c] = channel_mean[labels].astype(np.uint8)
-        return out
+        n_iters = self.cfg.slic_iters
+        iterations, residual = 0, np.inf
+        for itr in range(n_iters):
+            m.count("slic_iterations")
+            with m.stage("slic_iter", pixels=h * w):
+                for k in range(n_cent):
+                    cx, cy = int(centers[k, 0]), int(centers[k, 1])
+                    x0, x1 = max(0, cx - step), min(h, cx + step)
+                    y0, y1 = max(0, cy - step), min(w, cy + step)
+                    if x0 >= x1 or y0 >= y1:
+                        continue
+
+                    sub_idx = np.arange(x0, x1)[:, None] * w + np.arange(y0, y1)[None, :]
+                    sub_idx = sub_idx.ravel()
+
+                    sub_lab = lab[x0:x1, y0:y1]
+                    sub_xx = xx[x0:x1, y0:y1]
+                    sub_yy = yy[x0:x1, y0:y1]
+
+                    dc = np.sum((sub_lab - centers[k, 2:5]) ** 2, axis=2)
+                    ds = (sub_yy - cx) ** 2 + (sub_xx - cy) ** 2  # cx 为行、cy 为列
+                    d_flat = (dc / (step ** 2) + ds / (step ** 2)).ravel()
+
+                    sub_d_flat = dists_flat[sub_idx]
+                    mask_flat = d_flat < sub_d_flat
+                    sub_d_flat[mask_flat] = d_flat[mask_flat]
+                    dists_flat[sub_idx] = sub_d_flat
+                    labels_flat[sub_idx[mask_flat]] = k
+
+                # 一次性向量化中心更新
+                new_cent = self._centers_of(labels_flat, yy_flat, xx_flat, lab_flat, n_cent)
+                # 残差：中心坐标的平均 L1 位移（须在替换 centers 之前计算）
+                residual = float(np.abs(new_cent[:, :2] - centers[:, :2]).sum(axis=1).mean())
+                centers = new_cent
+                iterations = itr + 1
+                if self.progress is not None:
+                    self.progress("slic", itr + 1, n_iters)
+
+                if residual <= self.cfg.slic_tol:
+                    break
+
+        return labels, centers, iterations, residual
 
     def generate_pixel_art(self, img: np.ndarray) -> np.ndarray:
-        # ① 先跑分割（若未跑）
-        if self.labels is None:
+        # ① 先跑分割（若未跑）；栅格对齐模式只用格子均值，不需要分割结果
+        if self.labels is None and not self.cfg.align_grid:
             self.slic_superpixel(img)
+        return self._finish_cells(img, self.labels, self.cell_transform).to_rgb()
+
+    def render(self, img: np.ndarray, cell_transform: Optional[Callable[[np.ndarray], np.ndarray]] = None
+               ) -> np.ndarray:
+        """generate_pixel_art 的无状态版本：每次调用重新分割，标签与格子变换只在本次调用内有效"""
+        return self.render_indexed(img, cell_transform).to_rgb()
 
+    def render_indexed(self, img: np.ndarray,
+                       cell_transform: Optional[Callable[[np.ndarray], np.ndarray]] = None) -> IndexedImage:
+        """同 render，结果为索引色图像：栅格对齐时为格子颜色 + 索引图，否则为标签图 + 各段均值色"""
+        labels = None if self.cfg.align_grid else self.segment(img)[0]
+        return self._finish_cells(img, labels, cell_transform)
+
+    def _finish_cells(self, img: np.ndarray, labels: Optional[np.ndarray],
+                      cell_transform: Optional[Callable[[np.ndarray], np.ndarray]]) -> IndexedImage:
+        h, w = img.shape[:2]
+        with self.metrics.stage("grid", pixels=h * w):
+            out = self._render_cells(img, labels, cell_transform)
+        if self.progress is not None:
+            self.progress("grid", 1, 1)
+        return out
+
+    def _render_cells(self, img: np.ndarray, labels: Optional[np.ndarray],
+                      cell_transform: Optional[Callable[[np.ndarray], np.ndarray]]) -> IndexedImage:
         h, w = img.shape[:2]
-        labels = self.labels
-        n_cent = len(self.centers)
 
         # ② 强制 16×16 栅格对齐（零填充到可被 step 整除）
         if self.cfg.align_grid:
             step = self.cfg.pixel_size
-            # 零填充到可被 step 整除
-            h_pad = (step - h % step) % step
-            w_pad = (step - w % step) % step
-            img_pad = np.pad(img, ((0, h_pad), (0, w_pad), (0, 0)), mode='constant', constant_values=0)
-            h_pad, w_pad = img_pad.shape[0], img_pad.shape[1]
-
-            h_grid, w_grid = h_pad // step, w_pad // step
-            grid_rgb = img_pad.reshape(h_grid, step, w_grid, step, 3).mean(axis=(1, 3))  # H_grid×W_grid×3
-            grid_rgb = grid_rgb.reshape(-1, 3)  # H_grid*W_grid×3
-
-            # 回填到原图（零填充部分也保存）
-            out = np.zeros_like(img)  # 原图大小
-            for g in range(h_grid * w_grid):
-                y0, x0 = (g // w_grid) * step, (g % w_grid) * step
-                out[y0:y0 + step, x0:x0 + step] = grid_rgb[g]
-            return out.astype(np.uint8)
+            # 零填充到可被 step 整除后的整格均值
+            grid_rgb = block_mean(img, step, zero_pad=True)  # H_grid×W_grid×3
+            h_grid, w_grid = grid_rgb.shape[:2]
+            if cell_transform is not None:
+                grid_rgb = cell_transform(grid_rgb)
+
+            # 格子上建调色板，只把索引回填到原图大小（见 blocks.expand_cells）
+            return IndexedImage.from_cells(grid_rgb, step, h, w)
 
         # ③ 非对齐模式（原向量化）
+        n_cent = int(labels.max()) + 1
         counts = np.bincount(labels.ravel(), minlength=n_cent)
         lab_flat = img.reshape(-1, 3)
         mean_rgb = np.zeros((n_cent, 3), dtype=np.float32)
         for c in range(3):
             mean_rgb[:, c] = np.bincount(labels.ravel(), weights=lab_flat[:, c], minlength=n_cent)
         mean_rgb /= np.maximum(counts, 1)[:, None]
-        out = mean_rgb[labels].astype(np.uint8)
-        return out
+        return IndexedImage.from_labels(labels, mean_rgb.astype(np.uint8))
 
 
 # ---------- 颜色量化 ----------
 class ColorQuantization:
-    def quantize_kmeans(self, img: np.ndarray, n: int) -> np.ndarray:
-        pts = img.reshape(-1, 3)
+    def fit(self, pts: np.ndarray, n: int, weights: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """k-means 聚成 n 色，返回 (各点所属类别, n×3 uint8 中心)；weights 为各点权重（如调色板项的像素数）"""
         model = MiniBatchKMeans(n_clusters=n, batch_size=4096, random_state=42)
-        labels = model.fit_predict(pts)
-        return model.cluster_centers_[labels].reshape(img.shape).astype(np.uint8)
+        labels = model.fit_predict(pts, sample_weight=weights)
+        return labels, model.cluster_centers_.astype(np.uint8)
+
+    def quantize_kmeans(self, img: np.ndarray, n: int) -> np.ndarray:
+        labels, centers = self.fit(img.reshape(-1, 3), n)
+        return centers[labels].reshape(img.shape)
 
 
 # ---------- 抖动 ----------
@@ -274,6 +386,19 @@ class Dithering:
         return np.clip(ch, 0, 255).astype(np.uint8)
 
 
+# 4×4 Bayer 阈值矩阵，中心化到 (-0.5, 0.5)
+BAYER4 = (np.array([[0, 8, 2, 10], [12, 4, 14, 6], [3, 11, 1, 9], [15, 7, 13, 5]],
+                   dtype=np.float32) + 0.5) / 16 - 0.5
+
+
+def bayer_offsets(shape: Tuple[int, int], n_colors: int, strength: float) -> np.ndarray:
+    """格子空间的有序抖动偏移（只与位置有关）：幅度按调色板每通道的大致色阶间距缩放"""
+    hg, wg = shape
+    tile = np.tile(BAYER4, (-(-hg // 4), -(-wg // 4)))[:hg, :wg]
+    spread = 255.0 / max(1.0, np.cbrt(n_colors))
+    return tile * np.float32(spread * strength)
+
+
 # ---------- 调色板 ----------
 class ColorMapping:
     _palettes = {
@@ -288,57 +413,272 @@ class ColorMapping:
     def create_retro_palette(self, name: str = "gameboy") -> np.ndarray:
         return self._palettes.get(name, self._palettes["gameboy"])
 
+    def nearest(self, colors: np.ndarray, palette: np.ndarray) -> np.ndarray:
+        """各颜色在 palette 中最近项的索引（整数运算，逐通道累加）"""
+        pts = colors.reshape(-1, 3).astype(np.int32)
+        pal = palette.astype(np.int32)
+        d = np.zeros((len(pts), len(pal)), dtype=np.int32)
+        for c in range(3):
+            diff = pts[:, c, None] - pal[None, :, c]
+            d += diff * diff
+        return d.argmin(axis=1)
+
     def apply_palette(self, img: np.ndarray, palette: np.ndarray) -> np.ndarray:
-        pts = img.reshape(-1, 3)
-        diff = ((pts[:, None, :] - palette[None, :, :]) ** 2).sum(axis=2)
-        idx = diff.argmin(axis=1)
-        return palette[idx].reshape(img.shape)
+        return palette[self.nearest(img, palette)].reshape(img.shape)
+
+
+# ---------- 换调色板 ----------
+class RenderHandle:
+    """
+    一次渲染的索引结果（见 PixelArtGenerator.render），供 repalette 反复换调色板：
+    swap 为换调色板所用的不超过 256 色的索引图（base 颜色更多时为其量化结果，否则即 base），
+    cell 为结果按像素格均匀时的格子大小（可在格子空间重做抖动），否则为 None；
+    各调色板的映射表与 swap 的 PNG 编码按需缓存
+    """
+
+    def __init__(self, base: IndexedImage, cell: Optional[int] = None, swap: Optional[IndexedImage] = None):
+        self.base = base
+        self.swap = base if swap is None else swap
+        self.cell = cell
+        self.luts: Dict[str, np.ndarray] = {}
+        self.encoded: Dict[str, bytes] = {}
+
+    def cells(self) -> np.ndarray:
+        """各像素格的 base 调色板索引（取每格左上角像素）"""
+        return self.base.index[::self.cell, ::self.cell]
+
+    def encode(self, img: IndexedImage, compression: str = "default") -> bytes:
+        """img 与 swap 共用索引图（只换了调色板）时复用 swap 的压缩数据，只替换 PLTE 块"""
+        if img.index is self.swap.index and self.swap.n_colors <= 256:
+            if compression not in self.encoded:
+                self.encoded[compression] = encode_png(self.swap, compression)
+            return replace_palette(self.encoded[compression], img.palette)
+        return encode_png(img, compression)
 
 
 # ---------- 生成器 ----------
 class PixelArtGenerator:
-    def __init__(self, cfg: PixelArtConfig):
+    """
+    配置、调色板与开销模型等只读共享；每次 generate 的中间状态（分割结果、对比度参考灰度、
+    格子变换）都留在调用栈上，同一实例可被多个线程同时使用（见 generate_many）
+    """
+
+    def __init__(self, cfg: PixelArtConfig, progress: Optional[ProgressCallback] = None, metrics=None,
+                 adjust=None, calibration_file: Optional[str] = None):
         self.cfg = cfg
-        self.slic = SLICPixelArtCore(cfg)
+        self.calibration_file = calibration_file  # 时间预算开销模型的缓存文件，None 为默认位置
+        self.last_plan: Optional[planner.Plan] = None
+        self.progress = progress
+        self.metrics = metrics or NULL_METRICS
+        self.adjust = adjust  # 亮度/对比度/饱和度调整（adjust.ColorAdjust），None 表示不调整
+        self.slic = SLICPixelArtCore(cfg, progress, self.metrics)
         self.quant = ColorQuantization()
         self.dith = Dithering()
         self.mapper = ColorMapping()
 
     def generate(self, img: np.ndarray, style: str = "basic") -> np.ndarray:
+        if self.cfg.time_budget_ms is not None and planner.plannable(style):
+            return self._budgeted(img, style)
+        if style == "dithered":
+            return self._dithered(img)
+        return self.generate_indexed(img, style).to_rgb()
+
+    def generate_indexed(self, img: np.ndarray, style: str = "basic") -> IndexedImage:
+        """
+        同 generate，结果保持为索引色图像（量化、调色板映射都只作用于调色板）；
+        抖动与时间预算方案是逐像素输出，按唯一颜色转回索引图
+        """
+        if style == "dithered" or (self.cfg.time_budget_ms is not None and planner.plannable(style)):
+            return IndexedImage.from_rgb(self.generate(img, style))
         handlers = {
             "basic": self._basic,
             "quantized": self._quantized,
-            "dithered": self._dithered,
             "retro": self._retro,
             "monochrome": self._mono,
+            "average": lambda im: self._block(im, "mean"),
+            "median": lambda im: self._block(im, "median"),
         }
         return handlers.get(style, handlers["basic"])(img)
 
-    def _basic(self, img: np.ndarray) -> np.ndarray:
-        return self.slic.generate_pixel_art(img)
+    def render(self, img: np.ndarray, style: str = "basic") -> RenderHandle:
+        """
+        生成并保留索引结果，之后用 repalette 换调色板，不必重跑整个管线；
+        结果超过 256 色时（如未量化的 basic）另存一份量化到 color_count（至多 256）色的 swap
+        """
+        base = self.generate_indexed(img, style).compact()
+        swap = self._quantize(base, min(self.cfg.color_count, 256)) if base.n_colors > 256 else None
+        # 栅格对齐、块统计风格的结果每格一色；逐像素抖动与时间预算方案（可能缩放）不是
+        per_cell = ((self.cfg.align_grid or style in ("average", "median")) and style != "dithered"
+                    and not (self.cfg.time_budget_ms is not None and planner.plannable(style)))
+        return RenderHandle(base, self.cfg.pixel_size if per_cell else None, swap)
+
+    def repalette(self, handle: RenderHandle, palette_name: str, dither: bool = False) -> IndexedImage:
+        """
+        把缓存的渲染结果映射到 palettes 中的预设调色板（"original" 为原色）：
+          不抖动时只在 swap 调色板上查最近色（映射表按调色板缓存），索引图原样共享、只换调色板项，
+          与像素数无关（base 超过 256 色时结果为先量化再映射的近似）；
+          dither=True 时用 base 颜色在格子空间重做有序抖动，索引图是新的，需要完整编码
+        """
+        if palette_name == "original":
+            return handle.base
+        pal = np.array(palette_colors(palette_name, self.cfg.color_count), dtype=np.uint8)
+        base = handle.base
+        with self.metrics.stage("repalette", pixels=handle.swap.n_colors):
+            if dither:
+                if handle.cell is None:
+                    raise ValueError("只有按像素格渲染的结果支持换调色板时抖动")
+                h, w = base.index.shape
+                cells = base.palette[handle.cells()].astype(np.float32)
+                cells += bayer_offsets(cells.shape[:2], len(pal), self.cfg.dithering_strength)[..., None]
+                idx = self.mapper.nearest(cells, pal).reshape(cells.shape[:2]).astype(np.uint8)
+                return IndexedImage(expand_cells(idx, handle.cell, h, w), pal)
+            lut = handle.luts.get(palette_name)
+            if lut is None:
+                lut = handle.luts[palette_name] = self.mapper.nearest(handle.swap.palette, pal)
+            return handle.swap.with_palette(pal[lut])
+
+    def generate_many(self, images: Iterable[np.ndarray], style: str = "basic",
+                      max_workers: Optional[int] = None) -> List[np.ndarray]:
+        """
+        线程池并发生成多张图，结果顺序与输入一致。大数组的 NumPy 运算会释放 GIL，多核上
+        在一个进程内并行；期间 BLAS / OpenMP 限制为单线程，避免与线程池争抢核心
+        """
+        images = list(images)
+        if max_workers == 1 or len(images) <= 1:
+            return [self.generate(im, style) for im in images]
+        with threadpool_limits(1), ThreadPoolExecutor(max_workers=max_workers) as pool:
+            return list(pool.map(lambda im: self.generate(im, style), images))
+
+    def _budgeted(self, img: np.ndarray, style: str) -> np.ndarray:
+        """
+        按时间预算选方案（见 planner）后用对应配置生成；
+        pyramid 方案在缩小的工作分辨率上分割，再最近邻放大回原尺寸
+        """
+        h, w = img.shape[:2]
+        with self.metrics.stage("plan"):
+            model = planner.load_model(self.calibration_file)
+            plan = planner.plan((h, w), self.cfg, style, self.cfg.time_budget_ms, model)
+        t0 = time.perf_counter()
+        sub = PixelArtGenerator(planner.plan_config(self.cfg, plan), self.progress, self.metrics, self.adjust)
+        if plan.scale > 1:
+            with self.metrics.stage("resize", pixels=h * w):
+                work = np.asarray(Image.fromarray(img).resize(
+                    (max(1, w // plan.scale), max(1, h // plan.scale)), Image.Resampling.BOX))
+            out = sub.generate(work, style)
+            with self.metrics.stage("resize", pixels=h * w):
+                out = np.asarray(Image.fromarray(out).resize((w, h), Image.Resampling.NEAREST))
+        else:
+            out = sub.generate(img, style)
+        plan.actual_s = time.perf_counter() - t0
+        self.last_plan = plan
+        self.metrics.set("plan", plan.to_dict())
+        return out
 
-    def _quantized(self, img: np.ndarray) -> np.ndarray:
+    def _fit_adjust(self, img: np.ndarray):
+        """
+        本次请求使用的颜色调整，不需要调整时为 None；对比度所需的灰度均值未预先给定时
+        在副本上按本图统计，共享的 self.adjust 不被修改
+        """
+        adjust = self.adjust
+        if adjust is None or adjust.identity:
+            return None
+        if adjust.needs_mean and adjust.mean is None:
+            adjust = copy.copy(adjust)
+            with self.metrics.stage("adjust_stats", pixels=img.shape[0] * img.shape[1]):
+                adjust.fit(adjust.histogram(img))
+        return adjust
+
+    def _cartoon(self, rgb: np.ndarray) -> np.ndarray:
+        with self.metrics.stage("cartoon", pixels=rgb.shape[0] * rgb.shape[1]):
+            return cartoon(rgb, self.cfg.cartoon_edge_weight, self.cfg.cartoon_levels)
+
+    def _cell_colors(self, cells: np.ndarray, adjust) -> np.ndarray:
+        """格子颜色上的逐格变换：颜色调整 → 卡通效果"""
+        if adjust is not None:
+            with self.metrics.stage("adjust", pixels=cells.shape[0] * cells.shape[1]):
+                cells = adjust.apply(cells)
+        if self.cfg.cartoon_edge_weight is not None:
+            cells = self._cartoon(cells)
+        return cells
+
+    def _basic(self, img: np.ndarray) -> IndexedImage:
+        adjust = self._fit_adjust(img)
+        if self.cfg.align_grid:
+            # 栅格对齐时输出只取决于格子均值，调整与卡通效果放到格子空间，每格只算一次
+            transform = adjust is not None or self.cfg.cartoon_edge_weight is not None
+            return self.slic.render_indexed(img, (lambda cells: self._cell_colors(cells, adjust)) if transform else None)
+        if adjust is not None:
+            with self.metrics.stage("adjust", pixels=img.shape[0] * img.shape[1]):
+                img = adjust.apply(np.array(img))
+        out = self.slic.render_indexed(img)
+        if self.cfg.cartoon_edge_weight is None:
+            return out
+        return IndexedImage.from_rgb(self._cartoon(out.to_rgb()))  # 边缘检测需要完整像素
+
+    def _block(self, img: np.ndarray, reducer: str) -> IndexedImage:
+        """
+        average / median：不分割，按像素格直接取块均值 / 中值，
+        颜色调整、卡通效果与 k-means 量化都在格子空间进行（每格一个样本），最后回填
+        """
+        h, w = img.shape[:2]
+        step = self.cfg.pixel_size
+        with self.metrics.stage(f"block_{reducer}", pixels=h * w):
+            cells = REDUCERS[reducer](img, step)
+        n_cells = cells.shape[0] * cells.shape[1]
+        cells = self._cell_colors(cells, self._fit_adjust(img))
+        self._report("grid")
+        with self.metrics.stage("kmeans", pixels=n_cells):
+            labels, centers = self.quant.fit(cells.reshape(-1, 3), min(self.cfg.color_count, n_cells))
+        self._report("quantize")
+        with self.metrics.stage("expand", pixels=h * w):
+            cell_idx = labels.reshape(cells.shape[:2]).astype(index_dtype(len(centers)))
+            return IndexedImage(expand_cells(cell_idx, step, h, w), centers)
+
+    def _report(self, stage: str):
+        if self.progress is not None:
+            self.progress(stage, 1, 1)
+
+    def _quantize(self, base: IndexedImage, n_colors: Optional[int] = None) -> IndexedImage:
+        """在调色板上按像素数加权聚类，索引图只查一次表；颜色数已不超过上限（缺省 color_count）时不变"""
+        n_colors = self.cfg.color_count if n_colors is None else n_colors
+        with self.metrics.stage("kmeans", pixels=base.n_colors):
+            base = base.compact()
+            if base.n_colors > n_colors:
+                lut, centers = self.quant.fit(base.palette.astype(np.float64), n_colors,
+                                              weights=base.counts())
+                base = base.remap(lut, centers)
+        self._report("quantize")
+        return base
+
+    def _map_palette(self, base: IndexedImage, pal: np.ndarray) -> IndexedImage:
+        with self.metrics.stage("palette_map", pixels=base.n_colors):
+            return base.remap(self.mapper.nearest(base.palette, pal), pal)
+
+    def _quantized(self, img: np.ndarray) -> IndexedImage:
         base = self._basic(img)
-        return self.quant.quantize_kmeans(base, self.cfg.color_count)
+        return self._quantize(base)
 
     def _dithered(self, img: np.ndarray) -> np.ndarray:
         base = self._basic(img)
-        quant = self.quant.quantize_kmeans(base, self.cfg.color_count)
+        quant = self._quantize(base).to_rgb()
         if not self.cfg.dithering_method:
             return quant
-        dith = self.dith.apply_dithering(quant, self.cfg.dithering_method, 1)
-        return np.clip(quant * (1 - self.cfg.dithering_strength) + dith * self.cfg.dithering_strength, 0, 255).astype(
-            np.uint8)
+        with self.metrics.stage("dither", pixels=quant.shape[0] * quant.shape[1]):
+            dith = self.dith.apply_dithering(quant, self.cfg.dithering_method, 1)
+            out = np.clip(quant * (1 - self.cfg.dithering_strength) + dith * self.cfg.dithering_strength,
+                          0, 255).astype(np.uint8)
+        self._report("dither")
+        return out
 
-    def _retro(self, img: np.ndarray) -> np.ndarray:
+    def _retro(self, img: np.ndarray) -> IndexedImage:
         base = self._basic(img)
         pal = self.mapper.create_retro_palette("gameboy")
-        return self.mapper.apply_palette(base, pal)
+        return self._map_palette(base, pal)
 
-    def _mono(self, img: np.ndarray) -> np.ndarray:
+    def _mono(self, img: np.ndarray) -> IndexedImage:
         base = self._basic(img)
         pal = self.mapper.create_retro_palette("mono")[::256 // self.cfg.color_count]
-        return self.mapper.apply_palette(base, pal)
+        return self._map_palette(base, pal)
 
     def create_comparison(self, img: np.ndarray) -> np.ndarray:
         styles = ["basic", "quantized", "dithered", "retro", "monochrome"]
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PNG 输出编码
+不超过 256 色时直接写调色板（"P"）PNG，压缩级别/策略可调；
+输入为 IndexedImage 时直接用其索引图与调色板，不经过 RGB
+"""
+import struct
+import zlib
+from io import BytesIO
+from pathlib import Path
+from typing import Optional, Tuple, Union
+
+import numpy as np
+from PIL import Image
+
+from indexed import IndexedImage
+
+# 预设：fast 供交互式使用，best 等同旧版 optimize=True
+PNG_PRESETS = {
+    "fast": {"compress_level": 1},
+    "default": {"compress_level": 6},
+    "best": {"compress_level": 9, "optimize": True},
+}
+PNG_STRATEGIES = {
+    "default": zlib.Z_DEFAULT_STRATEGY,
+    "filtered": zlib.Z_FILTERED,
+    "huffman": zlib.Z_HUFFMAN_ONLY,
+    "rle": zlib.Z_RLE,
+    "fixed": zlib.Z_FIXED,
+}
+
+
+def png_save_params(spec: str = "default") -> dict:
+    """解析压缩参数：预设名（fast/default/best）或 "级别[:策略]"，如 "3:rle" """
+    if spec in PNG_PRESETS:
+        return dict(PNG_PRESETS[spec])
+    level_str, _, strategy = spec.partition(":")
+    try:
+        level = int(level_str)
+    except ValueError:
+        raise ValueError(f"无法识别的PNG压缩参数: {spec}")
+    if not 0 <= level <= 9:
+        raise ValueError("PNG压缩级别必须在0-9之间")
+    params = {"compress_level": level}
+    if strategy:
+        if strategy not in PNG_STRATEGIES:
+            raise ValueError(f"未知的PNG压缩策略: {strategy}（可选 {', '.join(PNG_STRATEGIES)}）")
+        params["compress_type"] = PNG_STRATEGIES[strategy]
+    return params
+
+
+def to_indexed(rgb: np.ndarray, max_colors: int = 256) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """RGB → (uint8 索引图, N×3 调色板)；颜色数超过 max_colors 时返回 None
+    用 2^24 查找表做两遍 O(N) 散列，避免对全部像素排序"""
+    rgb = np.asarray(rgb)
+    packed = rgb[..., 0].astype(np.uint32) << 16
+    packed |= rgb[..., 1].astype(np.uint32) << 8
+    packed |= rgb[..., 2]
+    present = np.zeros(1 << 24, dtype=bool)
+    present[packed] = True
+    colors = np.flatnonzero(present)
+    if len(colors) > max_colors:
+        return None
+    lut = np.zeros(1 << 24, dtype=np.uint8)
+    lut[colors] = np.arange(len(colors), dtype=np.uint8)
+    palette = np.stack([(colors >> 16) & 255, (colors >> 8) & 255, colors & 255], axis=1).astype(np.uint8)
+    return lut[packed], palette
+
+
+def indexed_to_pil(index_map: np.ndarray, palette: np.ndarray) -> Image.Image:
+    img = Image.fromarray(np.ascontiguousarray(index_map, dtype=np.uint8), "P")
+    img.putpalette(np.ascontiguousarray(palette, dtype=np.uint8).tobytes())
+    return img
+
+
+def to_pil(rgb: Union[np.ndarray, IndexedImage]) -> Image.Image:
+    """尽量转为调色板图像，否则为 RGB"""
+    if isinstance(rgb, IndexedImage):
+        img = rgb if rgb.n_colors <= 256 else rgb.compact()  # 不超过 256 项时按原顺序写出，不扫描像素
+        if img.n_colors <= 256:
+            return indexed_to_pil(img.index, img.palette)
+        rgb = img.to_rgb()
+    indexed = to_indexed(rgb)
+    if indexed is None:
+        return Image.fromarray(np.ascontiguousarray(rgb, dtype=np.uint8), "RGB")
+    return indexed_to_pil(*indexed)
+
+
+def encode_png(rgb: Union[np.ndarray, IndexedImage], compression: str = "default") -> bytes:
+    buf = BytesIO()
+    to_pil(rgb).save(buf, format="PNG", **png_save_params(compression))
+    return buf.getvalue()
+
+
+def save_png(rgb: Union[np.ndarray, IndexedImage], path: str, compression: str = "default"):
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    to_pil(rgb).save(path, format="PNG", **png_save_params(compression))
+
+
+def replace_palette(png: bytes, palette: np.ndarray) -> bytes:
+    """
+    替换调色板 PNG 的 PLTE 块，像素数据（IDAT）原样保留；palette 与原调色板逐项对应，
+    项数不超过原 PLTE（原块按位深补齐的尾部保持不变）
+    """
+    pos = 8
+    while pos < len(png):
+        length, tag = struct.unpack(">I4s", png[pos:pos + 8])
+        if tag == b"PLTE":
+            data = np.ascontiguousarray(palette, dtype=np.uint8).tobytes()
+            if len(data) > length:
+                raise ValueError(f"调色板项数超过原 PNG: {len(data) // 3} > {length // 3}")
+            data += png[pos + 8 + len(data):pos + 8 + length]
+            crc = struct.pack(">I", zlib.crc32(data, zlib.crc32(tag)))
+            return png[:pos + 8] + data + crc + png[pos + 12 + length:]
+        if tag == b"IDAT":
+            break
+        pos += 12 + length
+    raise ValueError("PNG 中没有调色板（PLTE）块")
+
+
+def _png_chunk(tag: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(data, zlib.crc32(tag)))
+
+
+# ---------- 流式 PNG 写出 ----------
+class PNGStreamWriter:
+    """逐带写出 PNG：行经 Up 滤波后增量 zlib 压缩，内存只与带大小有关"""
+    _IDAT_CHUNK = 1 << 16
+
+    def __init__(self, path: str, width: int, height: int, palette: Optional[np.ndarray] = None,
+                 compress_level: int = 6):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.width, self.height = width, height
+        self.channels = 1 if palette is not None else 3
+        self.rows_written = 0
+        self._prev = np.zeros(width * self.channels, dtype=np.uint8)
+        self._z = zlib.compressobj(compress_level)
+        self._pending = bytearray()
+        self._f = open(path, "wb")
+        self._f.write(b"\x89PNG\r\n\x1a\n")
+        color_type = 3 if palette is not None else 2
+        self._chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, color_type, 0, 0, 0))
+        if palette is not None:
+            self._chunk(b"PLTE", np.ascontiguousarray(palette, dtype=np.uint8).tobytes())
+
+    def _chunk(self, tag: bytes, data: bytes):
+        self._f.write(_png_chunk(tag, data))
+
+    def _emit(self, data: bytes, force: bool = False):
+        self._pending += data
+        if len(self._pending) >= self._IDAT_CHUNK or (force and self._pending):
+            self._chunk(b"IDAT", bytes(self._pending))
+            self._pending.clear()
+
+    def write_rows(self, rows: np.ndarray):
+        """rows: n×w×3 RGB 或 n×w 调色板索引"""
+        n = rows.shape[0]
+        flat = np.ascontiguousarray(rows, dtype=np.uint8).reshape(n, -1)
+        filtered = np.empty((n, flat.shape[1] + 1), dtype=np.uint8)
+        filtered[:, 0] = 2  # Up 滤波：像素画中同一格内的重复行压缩为全零
+        filtered[0, 1:] = flat[0] - self._prev
+        filtered[1:, 1:] = flat[1:] - flat[:-1]
+        self._prev = flat[-1].copy()
+        self.rows_written += n
+        self._emit(self._z.compress(filtered.tobytes()))
+
+    def close(self):
+        if self._f.closed:
+            return
+        if self.rows_written != self.height:
+            self._f.close()
+            raise ValueError(f"PNG 行数不符: {self.rows_written}/{self.height}")
+        self._emit(self._z.flush(), force=True)
+        self._chunk(b"IEND", b"")
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._f.close()
+
+
+# ---------- 流式 PNG 读入 ----------
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+_PNG_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}  # 颜色类型 -> 每像素字节数（8 位）
+
+
+class PNGStreamReader:
+    """
+    逐带读入 PNG（与 PNGStreamWriter 对应）：IDAT 增量解压，每次只解出一带滤波后的行。
+    反滤波交给 PIL：带前接上一行的原始字节（滤波类型 None）拼成小 PNG 解码，
+    内存只与带高 × 图宽有关。只支持 8 位非隔行 PNG，其余抛 ValueError
+    """
+
+    def __init__(self, path: str):
+        self._f = open(path, "rb")
+        try:
+            self._read_header()
+        except Exception:
+            self._f.close()
+            raise
+        self.rows_read = 0
+        self._z = zlib.decompressobj()
+        self._prev: Optional[bytes] = None  # 上一行未滤波的原始字节
+
+    def _read_header(self):
+        if self._f.read(8) != _PNG_SIGNATURE:
+            raise ValueError("不是 PNG 文件")
+        self._keep = []  # 解码需要的 PLTE / tRNS 块
+        ihdr = None
+        while True:
+            head = self._f.read(8)
+            if len(head) < 8:
+                raise ValueError("PNG 中没有图像数据（IDAT）块")
+            length, tag = struct.unpack(">I4s", head)
+            data = self._f.read(length)
+            self._f.read(4)
+            if tag == b"IHDR":
+                ihdr = struct.unpack(">IIBBBBB", data)
+            elif tag in (b"PLTE", b"tRNS"):
+                self._keep.append((tag, data))
+            elif tag == b"IDAT":
+                self._idat = data
+                break
+        if ihdr is None:
+            raise ValueError("PNG 缺少 IHDR 块")
+        self.width, self.height, depth, self.color_type, _, _, interlace = ihdr
+        if depth != 8 or interlace or self.color_type not in _PNG_CHANNELS:
+            raise ValueError(f"只支持流式读取 8 位非隔行 PNG（位深 {depth}，颜色类型 {self.color_type}，"
+                             f"隔行 {interlace}）")
+        self._stride = self.width * _PNG_CHANNELS[self.color_type] + 1
+
+    def _next_idat(self) -> bytes:
+        """下一个 IDAT 块的数据；读完时返回 b"""""
+        if self._idat:
+            data, self._idat = self._idat, b""
+            return data
+        while True:
+            head = self._f.read(8)
+            if len(head) < 8:
+                return b""
+            length, tag = struct.unpack(">I4s", head)
+            data = self._f.read(length)
+            self._f.read(4)
+            if tag == b"IDAT":
+                return data
+            if tag == b"IEND":
+                return b""
+
+    def _inflate(self, n: int) -> bytes:
+        """解压出 n 字节滤波后的行数据（max_length 限制单次输出，高压缩比时也不会一次解出整图）"""
+        out = bytearray()
+        while len(out) < n:
+            data = self._z.unconsumed_tail or self._next_idat()
+            if not data:
+                break
+            out += self._z.decompress(data, n - len(out))
+        if len(out) < n:
+            raise ValueError(f"PNG 数据不完整: 第 {self.rows_read} 行之后缺少数据")
+        return bytes(out)
+
+    def read_rows(self, n: int) -> Image.Image:
+        """读出接下来的至多 n 行，返回 PIL 图像（模式同整体解码：L / LA / RGB / RGBA / P）"""
+        n = min(n, self.height - self.rows_read)
+        if n <= 0:
+            raise ValueError("PNG 已读完")
+        raw = self._inflate(n * self._stride)
+        prefix = b"" if self._prev is None else b"\x00" + self._prev
+        rows = n + (self._prev is not None)
+        png = _PNG_SIGNATURE + _png_chunk(b"IHDR", struct.pack(">IIBBBBB", self.width, rows, 8,
+                                                                 self.color_type, 0, 0, 0))
+        png += b"".join(_png_chunk(tag, data) for tag, data in self._keep)
+        png += _png_chunk(b"IDAT", zlib.compress(prefix + raw, 0)) + _png_chunk(b"IEND", b"")
+        with Image.open(BytesIO(png)) as img:
+            img.load()
+            band = img.crop((0, rows - n, self.width, rows))
+        # 8 位时 PIL 的行字节即 PNG 的原始行字节
+        self._prev = band.crop((0, n - 1, self.width, n)).tobytes()
+        self.rows_read += n
+        return band
+
+    def close(self):
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
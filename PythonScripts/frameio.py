@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+帧序列输入输出（动画模式）
+输入：GIF / APNG（逐帧 seek 解码）或帧图片目录（按文件名排序逐个读取）
+输出：GIF（每帧局部调色板）、APNG（RGB）或帧目录（调色板 PNG）
+读写都逐帧进行，常驻内存只有当前帧与上一帧；GIF / APNG 的后续帧只写出与上一帧不同的包围盒区域
+"""
+import struct
+import zlib
+from io import BytesIO
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from encoder import indexed_to_pil
+
+FRAME_EXTENSIONS = {".png", ".jpg", ".jpeg", ".bmp", ".gif", ".webp", ".tif", ".tiff"}
+DEFAULT_DURATION_MS = 100
+
+
+# ---------- 输入 ----------
+def _to_rgb(img: Image.Image) -> np.ndarray:
+    if img.mode == "RGBA" or (img.mode == "P" and "transparency" in img.info):
+        img = img.convert("RGBA")
+        bg = Image.new("RGB", img.size, (255, 255, 255))
+        bg.paste(img, mask=img.split()[3])
+        return np.asarray(bg)
+    return np.asarray(img.convert("RGB"))
+
+
+def _frame_files(path: Path) -> List[Path]:
+    return sorted(p for p in path.iterdir() if p.suffix.lower() in FRAME_EXTENSIONS and p.is_file())
+
+
+def is_animation(path: str) -> bool:
+    """帧目录，或多于一帧的 GIF / APNG 等"""
+    p = Path(path)
+    if p.is_dir():
+        return True
+    try:
+        with Image.open(p) as img:
+            return getattr(img, "n_frames", 1) > 1
+    except (OSError, ValueError):
+        return False
+
+
+class FrameReader:
+    """逐帧读取，产出 (RGB 帧, 显示时长 ms)；各帧尺寸必须一致"""
+
+    def __init__(self, path: str, frame_duration_ms: int = DEFAULT_DURATION_MS):
+        self.path = Path(path)
+        self.frame_duration_ms = frame_duration_ms
+        self.loop = 0
+        if self.path.is_dir():
+            self._files = _frame_files(self.path)
+            if not self._files:
+                raise ValueError(f"帧目录中没有图片: {path}")
+            self.n_frames = len(self._files)
+            with Image.open(self._files[0]) as img:
+                self.size = img.size
+        else:
+            self._files = None
+            with Image.open(self.path) as img:
+                self.n_frames = getattr(img, "n_frames", 1)
+                self.size = img.size
+                self.loop = img.info.get("loop", 0)
+
+    def _check(self, rgb: np.ndarray, name) -> np.ndarray:
+        if (rgb.shape[1], rgb.shape[0]) != self.size:
+            raise ValueError(f"帧尺寸不一致: {name} 为 {rgb.shape[1]}x{rgb.shape[0]}，应为 {self.size[0]}x{self.size[1]}")
+        return rgb
+
+    def __iter__(self) -> Iterator[Tuple[np.ndarray, int]]:
+        if self._files is not None:
+            for f in self._files:
+                with Image.open(f) as img:
+                    yield self._check(_to_rgb(img), f.name), self.frame_duration_ms
+            return
+        with Image.open(self.path) as img:
+            for i in range(self.n_frames):
+                img.seek(i)  # GIF / APNG 解码器按帧合成到整幅画布
+                duration = int(img.info.get("duration") or self.frame_duration_ms)
+                yield self._check(_to_rgb(img), i), duration
+
+
+# ---------- 输出 ----------
+def _changed_box(prev: Optional[np.ndarray], cur: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
+    """与上一帧不同的包围盒 (y0, y1, x0, x1)；首帧为整幅，完全相同时返回 None"""
+    if prev is None:
+        return 0, cur.shape[0], 0, cur.shape[1]
+    diff = prev != cur
+    if diff.ndim == 3:
+        diff = diff.any(axis=2)
+    rows = np.flatnonzero(diff.any(axis=1))
+    if len(rows) == 0:
+        return None
+    cols = np.flatnonzero(diff[rows[0]:rows[-1] + 1].any(axis=0))
+    return rows[0], rows[-1] + 1, cols[0], cols[-1] + 1
+
+
+def _gif_blocks(data: bytes, pos: int) -> int:
+    """跳过一串数据子块（以长度 0 结束），返回其后的位置"""
+    while data[pos]:
+        pos += data[pos] + 1
+    return pos + 1
+
+
+class GifStreamWriter:
+    """
+    逐帧写出 GIF：每帧单独交给 PIL 编码（LZW），取出其调色板与图像数据改写为带局部调色板的一帧；
+    调色板随帧变化也不需要预先知道全局调色板
+    """
+
+    def __init__(self, path: str, width: int, height: int, loop: int = 0):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.width, self.height = width, height
+        self.frames = 0
+        self._prev: Optional[np.ndarray] = None
+        self._pending: Optional[Tuple[bytes, bytes, Tuple[int, int, int, int]]] = None
+        self._pending_ms = 0
+        self._f = open(path, "wb")
+        self._f.write(b"GIF89a" + struct.pack("<HHBBB", width, height, 0, 0, 0))
+        # NETSCAPE2.0 循环扩展
+        self._f.write(b"!\xff\x0bNETSCAPE2.0\x03\x01" + struct.pack("<H", loop) + b"\x00")
+
+    @staticmethod
+    def _encode(indices: np.ndarray, palette: np.ndarray) -> Tuple[bytes, bytes]:
+        """返回 (调色板字节（已补到 2 的幂）, LZW 最小码长 + 数据子块)"""
+        buf = BytesIO()
+        indexed_to_pil(indices, palette).save(buf, format="GIF", optimize=False, interlace=False)
+        data = buf.getvalue()
+        packed = data[10]
+        pos = 13
+        table = b""
+        if packed & 0x80:
+            size = 3 << ((packed & 7) + 1)
+            table, pos = data[pos:pos + size], pos + size
+        while data[pos] == 0x21:  # 跳过扩展块
+            pos = _gif_blocks(data, pos + 2)
+        if data[pos] != 0x2C:
+            raise ValueError("GIF 编码结果无法解析")
+        local = data[pos + 9]
+        pos += 10
+        if local & 0x80:
+            size = 3 << ((local & 7) + 1)
+            table, pos = data[pos:pos + size], pos + size
+        end = _gif_blocks(data, pos + 1)
+        return table, data[pos:end]
+
+    def _flush(self):
+        """帧在下一帧到来时才写出：完全相同的帧并入上一帧的显示时长"""
+        if self._pending is None:
+            return
+        table, image, (y0, y1, x0, x1) = self._pending
+        delay = max(2, round(self._pending_ms / 10))
+        # 图形控制扩展：disposal=1（保留），未改变的区域沿用上一帧
+        self._f.write(b"!\xf9\x04" + struct.pack("<BHB", 1 << 2, min(delay, 0xFFFF), 0) + b"\x00")
+        bits = max(1, (len(table) // 3).bit_length() - 1)
+        self._f.write(b"," + struct.pack("<HHHHB", x0, y0, x1 - x0, y1 - y0, 0x80 | (bits - 1)))
+        self._f.write(table)
+        self._f.write(image)
+        self._pending = None
+        self.frames += 1
+
+    def write(self, indices: np.ndarray, palette: np.ndarray, duration_ms: int = DEFAULT_DURATION_MS):
+        # 按颜色而不是索引比较：调色板变化时沿用的区域也必须重写
+        rgb = palette[indices]
+        box = _changed_box(self._prev, rgb)
+        if box is None:
+            self._pending_ms += duration_ms
+            return
+        self._flush()
+        y0, y1, x0, x1 = box
+        table, image = self._encode(indices[y0:y1, x0:x1], palette)
+        self._pending, self._pending_ms = (table, image, box), duration_ms
+        self._prev = rgb
+
+    def close(self):
+        if self._f.closed:
+            return
+        self._flush()
+        self._f.write(b";")
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._f.close()
+
+
+class APNGStreamWriter:
+    """
+    逐帧写出 APNG（RGB）：每帧 Up 滤波 + zlib 压缩后立即写出；
+    总帧数在结束时回填到 acTL，因此输出必须是可定位的文件
+    """
+
+    def __init__(self, path: str, width: int, height: int, loop: int = 0, compress_level: int = 6):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.width, self.height = width, height
+        self.compress_level = compress_level
+        self.loop = loop
+        self.frames = 0
+        self._seq = 0
+        self._prev: Optional[np.ndarray] = None
+        self._pending: Optional[Tuple[np.ndarray, Tuple[int, int, int, int]]] = None
+        self._pending_ms = 0
+        self._f = open(path, "wb")
+        self._f.write(b"\x89PNG\r\n\x1a\n")
+        self._chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        self._actl_pos = self._f.tell()
+        self._chunk(b"acTL", struct.pack(">II", 0, loop))  # 帧数在 close 时回填
+
+    def _chunk(self, tag: bytes, data: bytes):
+        self._f.write(struct.pack(">I", len(data)))
+        self._f.write(tag)
+        self._f.write(data)
+        self._f.write(struct.pack(">I", zlib.crc32(data, zlib.crc32(tag))))
+
+    def _compress(self, rgb: np.ndarray) -> bytes:
+        flat = np.ascontiguousarray(rgb, dtype=np.uint8).reshape(rgb.shape[0], -1)
+        filtered = np.empty((flat.shape[0], flat.shape[1] + 1), dtype=np.uint8)
+        filtered[:, 0] = 2  # Up 滤波
+        filtered[0, 1:] = flat[0]
+        filtered[1:, 1:] = flat[1:] - flat[:-1]
+        return zlib.compress(filtered.tobytes(), self.compress_level)
+
+    def _flush(self):
+        if self._pending is None:
+            return
+        rgb, (y0, y1, x0, x1) = self._pending
+        delay = min(self._pending_ms, 0xFFFF)
+        self._chunk(b"fcTL", struct.pack(">IIIIIHHBB", self._seq, x1 - x0, y1 - y0, x0, y0, delay, 1000, 0, 0))
+        self._seq += 1
+        data = self._compress(rgb)
+        if self.frames == 0:
+            self._chunk(b"IDAT", data)
+        else:
+            self._chunk(b"fdAT", struct.pack(">I", self._seq) + data)
+            self._seq += 1
+        self._pending = None
+        self.frames += 1
+
+    def write(self, indices: np.ndarray, palette: np.ndarray, duration_ms: int = DEFAULT_DURATION_MS):
+        rgb = palette[indices]
+        box = _changed_box(self._prev, rgb)
+        if box is None:
+            self._pending_ms += duration_ms
+            return
+        self._flush()
+        y0, y1, x0, x1 = box
+        self._pending, self._pending_ms = (rgb[y0:y1, x0:x1], box), duration_ms
+        self._prev = rgb
+
+    def close(self):
+        if self._f.closed:
+            return
+        self._flush()
+        self._chunk(b"IEND", b"")
+        end = self._f.tell()
+        self._f.seek(self._actl_pos)
+        self._chunk(b"acTL", struct.pack(">II", self.frames, self.loop))
+        self._f.seek(end)
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._f.close()
+
+
+class FrameDirWriter:
+    """逐帧写出调色板 PNG：frame_00000.png, frame_00001.png, ..."""
+
+    def __init__(self, path: str, compress_level: int = 6):
+        self.dir = Path(path)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.compress_level = compress_level
+        self.frames = 0
+
+    def write(self, indices: np.ndarray, palette: np.ndarray, duration_ms: int = DEFAULT_DURATION_MS):
+        indexed_to_pil(indices, palette).save(self.dir / f"frame_{self.frames:05d}.png", format="PNG",
+                                              compress_level=self.compress_level)
+        self.frames += 1
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+def open_frame_writer(path: str, width: int, height: int, loop: int = 0, compress_level: int = 6):
+    """按输出路径选择写出方式：.gif → GIF，.png / .apng → APNG，其余（目录）→ 帧目录"""
+    suffix = Path(path).suffix.lower()
+    if suffix == ".gif":
+        return GifStreamWriter(path, width, height, loop)
+    if suffix in (".png", ".apng"):
+        return APNGStreamWriter(path, width, height, loop, compress_level)
+    return FrameDirWriter(path, compress_level)
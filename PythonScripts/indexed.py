@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+索引色图像：h×w 索引图（uint8 / uint16）+ 小调色板（n×3 uint8），或 SLIC 标签图 + 各段颜色
+像素画的颜色数远小于像素数，量化、换调色板等颜色运算只作用于调色板（O(调色板)），
+索引图只做一次查表；调用方需要像素时才 to_rgb()。uint8 索引图的工作集约为 RGB 帧的 1/3
+"""
+from typing import Callable, Optional
+
+import numpy as np
+
+from blocks import expand_cells
+
+
+def index_dtype(n: int) -> np.dtype:
+    """能容纳 n 个颜色的最小索引类型"""
+    if n <= 256:
+        return np.dtype(np.uint8)
+    return np.dtype(np.uint16) if n <= 65536 else np.dtype(np.int32)
+
+
+def _pack(rgb: np.ndarray) -> np.ndarray:
+    packed = rgb[..., 0].astype(np.uint32) << 16
+    packed |= rgb[..., 1].astype(np.uint32) << 8
+    packed |= rgb[..., 2]
+    return packed
+
+
+def _unpack(packed: np.ndarray) -> np.ndarray:
+    return np.stack([(packed >> 16) & 255, (packed >> 8) & 255, packed & 255], axis=1).astype(np.uint8)
+
+
+class IndexedImage:
+    def __init__(self, index: np.ndarray, palette: np.ndarray):
+        if index.ndim != 2:
+            raise ValueError(f"索引图应为二维: {index.shape}")
+        self.index = index
+        self.palette = np.asarray(palette, dtype=np.uint8).reshape(-1, 3)
+
+    @property
+    def shape(self):
+        return self.index.shape + (3,)
+
+    @property
+    def n_colors(self) -> int:
+        return len(self.palette)
+
+    # ---------- 构造 ----------
+    @classmethod
+    def from_rgb(cls, rgb: np.ndarray) -> "IndexedImage":
+        """任意 RGB 图（像素级运算之后）：按唯一颜色建调色板"""
+        colors, inverse = np.unique(_pack(rgb).ravel(), return_inverse=True)
+        return cls(inverse.reshape(rgb.shape[:2]).astype(index_dtype(len(colors))), _unpack(colors))
+
+    @classmethod
+    def from_cells(cls, cells: np.ndarray, cell: int, h: int, w: int) -> "IndexedImage":
+        """hg×wg×3 格子颜色：在格子上取唯一颜色，再把格子索引回填为 h×w 索引图"""
+        colors, inverse = np.unique(_pack(cells).ravel(), return_inverse=True)
+        cell_idx = inverse.reshape(cells.shape[:2]).astype(index_dtype(len(colors)))
+        return cls(expand_cells(cell_idx, cell, h, w), _unpack(colors))
+
+    @classmethod
+    def from_labels(cls, labels: np.ndarray, colors: np.ndarray) -> "IndexedImage":
+        """SLIC 标签图 + 各段颜色（段颜色可重复，需要时 compact）"""
+        return cls(labels.astype(index_dtype(len(colors)), copy=False), colors)
+
+    # ---------- 颜色运算（O(调色板)） ----------
+    def counts(self) -> np.ndarray:
+        """各调色板项的像素数"""
+        return np.bincount(self.index.ravel(), minlength=self.n_colors)
+
+    def with_palette(self, palette: np.ndarray) -> "IndexedImage":
+        """替换调色板（逐项对应），索引图共享"""
+        return IndexedImage(self.index, palette)
+
+    def map_colors(self, fn: Callable[[np.ndarray], np.ndarray]) -> "IndexedImage":
+        """对调色板逐项做颜色变换，fn: n×3 uint8 → n×3"""
+        return self.with_palette(fn(self.palette))
+
+    def remap(self, lut: np.ndarray, palette: np.ndarray) -> "IndexedImage":
+        """索引经查找表 lut（旧索引 → 新索引）映射到新调色板"""
+        lut = np.asarray(lut).astype(index_dtype(len(palette)))
+        return IndexedImage(lut[self.index], palette)
+
+    def compact(self, counts: Optional[np.ndarray] = None) -> "IndexedImage":
+        """合并重复颜色、去掉未使用的调色板项（标签图转为 uint8 / uint16 索引图）"""
+        counts = self.counts() if counts is None else counts
+        packed = _pack(self.palette)
+        packed = np.where(counts > 0, packed, np.uint32(1 << 24))  # 未使用项排到最后并丢弃
+        colors, lut = np.unique(packed, return_inverse=True)
+        if len(colors) and colors[-1] == 1 << 24:
+            colors = colors[:-1]
+        if len(colors) == self.n_colors and self.index.dtype == index_dtype(len(colors)):
+            return self
+        return self.remap(lut, _unpack(colors))
+
+    # ---------- 输出 ----------
+    def to_rgb(self) -> np.ndarray:
+        return self.palette[self.index]
+
+    def __array__(self, dtype=None, copy=None):
+        rgb = self.to_rgb()
+        return rgb if dtype is None else rgb.astype(dtype)
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+阶段计时与计数器（--metrics）
+记录每个阶段的墙钟时间、CPU 时间、处理像素数和峰值内存：
+默认取进程峰值 RSS（开销可忽略），trace_memory=True 时用 tracemalloc
+统计阶段内峰值分配（会明显拖慢纯 Python 循环，计时仅供参考）；
+未启用时使用 NULL_METRICS，每次调用只是一次空方法调用；
+多线程共用时计数与阶段累计加锁（trace_memory 的峰值栈只对单线程有意义）
+"""
+import json
+import sys
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Dict, List
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def _peak_rss_bytes() -> int:
+    if resource is None:
+        return 0
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+class _Stage:
+    __slots__ = ("metrics", "name", "pixels", "t0", "c0")
+
+    def __init__(self, metrics: "Metrics", name: str, pixels: int):
+        self.metrics, self.name, self.pixels = metrics, name, pixels
+
+    def __enter__(self):
+        self.metrics._enter()
+        self.t0 = time.perf_counter()
+        self.c0 = time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self.t0
+        cpu = time.process_time() - self.c0
+        self.metrics._exit(self.name, wall, cpu, self.pixels)
+        return False
+
+
+class Metrics:
+    enabled = True
+
+    def __init__(self, trace_memory: bool = False):
+        self.stages: Dict[str, dict] = {}
+        self.counters: Dict[str, float] = {}
+        self.trace_memory = trace_memory
+        self._peaks: List[int] = []  # 嵌套阶段的峰值栈
+        self._lock = threading.Lock()
+        self._t0 = time.perf_counter()
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def stage(self, name: str, pixels: int = 0) -> _Stage:
+        return _Stage(self, name, pixels)
+
+    def count(self, name: str, n: float = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def set(self, name: str, value):
+        with self._lock:
+            self.counters[name] = value
+
+    def _enter(self):
+        if self.trace_memory:
+            # reset_peak 会清掉外层阶段的峰值，先把当前峰值记到外层
+            if self._peaks:
+                self._peaks[-1] = max(self._peaks[-1], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            self._peaks.append(0)
+
+    def _exit(self, name: str, wall: float, cpu: float, pixels: int):
+        with self._lock:
+            rec = self.stages.setdefault(name, {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0, "pixels": 0})
+            rec["calls"] += 1
+            rec["wall_s"] += wall
+            rec["cpu_s"] += cpu
+            rec["pixels"] += pixels
+        if resource is not None:
+            rec["peak_rss_bytes"] = _peak_rss_bytes()
+        if self.trace_memory:
+            peak = max(self._peaks.pop(), tracemalloc.get_traced_memory()[1])
+            rec["peak_bytes"] = max(rec.get("peak_bytes", 0), peak)
+            if self._peaks:
+                self._peaks[-1] = max(self._peaks[-1], peak)
+
+    def report(self) -> dict:
+        stages = {}
+        for name, rec in self.stages.items():
+            rec = dict(rec)
+            rec["wall_s"] = round(rec["wall_s"], 6)
+            rec["cpu_s"] = round(rec["cpu_s"], 6)
+            if rec["pixels"] and rec["wall_s"] > 0:
+                rec["mpx_per_s"] = round(rec["pixels"] / rec["wall_s"] / 1e6, 3)
+            stages[name] = rec
+        out = {"total_wall_s": round(time.perf_counter() - self._t0, 6), "stages": stages,
+               "counters": dict(self.counters)}
+        if resource is not None:
+            out["peak_rss_bytes"] = _peak_rss_bytes()
+        if self.trace_memory and tracemalloc.is_tracing():
+            out["traced_peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        return out
+
+    def write(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, ensure_ascii=False, indent=2)
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+class _NullMetrics:
+    enabled = False
+    _stage = _NullStage()
+
+    def stage(self, name: str, pixels: int = 0) -> _NullStage:
+        return self._stage
+
+    def count(self, name: str, n: float = 1):
+        pass
+
+    def set(self, name: str, value):
+        pass
+
+
+NULL_METRICS = _NullMetrics()
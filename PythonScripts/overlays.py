@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+输出叠加层：边缘描边、网格线
+全部为整帧向量化操作：描边耗时与厚度无关，网格线只触及网格所在的行列
+"""
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+# ---------- 形态学 ----------
+def _dilate_axis(mask: np.ndarray, before: int, after: int, axis: int) -> np.ndarray:
+    """
+    沿单轴的盒形膨胀：窗口 [i - before, i + after] 内有真值即为真
+    窗口 OR 用倍增法求得，只需 O(log 窗口) 次整帧布尔运算
+    """
+    def sl(start=None, stop=None):
+        idx = [slice(None)] * mask.ndim
+        idx[axis] = slice(start, stop)
+        return tuple(idx)
+
+    size = before + after + 1
+    n = mask.shape[axis]
+    f, length = mask, 1  # f[i] = mask[i : i + length] 的 OR
+    while length < size:
+        step = min(length, size - length)
+        g = f.copy()
+        g[sl(stop=n - step)] |= f[sl(step)]
+        f, length = g, length + step
+    out = np.zeros_like(mask)
+    if before < n:
+        out[sl(before)] = f[sl(stop=n - before)]
+    return out
+
+
+def dilate(mask: np.ndarray, size: int) -> np.ndarray:
+    """可分离的 size×size 方形膨胀"""
+    if size <= 1:
+        return mask.copy()
+    before, after = size // 2, size - 1 - size // 2
+    return _dilate_axis(_dilate_axis(mask, before, after, 0), before, after, 1)
+
+
+# ---------- 边界检测 ----------
+def _cell_keys(img: np.ndarray, labels: Optional[np.ndarray], cell: int) -> np.ndarray:
+    """每个格子取左上角采样，返回可直接比较的键（标签或打包后的颜色）"""
+    src = labels if labels is not None else img
+    s = src[::cell, ::cell]
+    if s.ndim == 3:
+        s = s.astype(np.int64)
+        s = (s[..., 0] << 16) | (s[..., 1] << 8) | s[..., 2]
+    return s
+
+
+def boundary_mask(img: np.ndarray, cell: int = 1, labels: Optional[np.ndarray] = None,
+                  jitter: int = 0, seed: Optional[int] = None) -> np.ndarray:
+    """
+    在格子空间中一次比较相邻格子，得到 1 像素宽的边界线（画在右/下侧格子的首行/首列）
+    jitter > 0 时每段边界线在 ±jitter 像素内随机偏移，由 seed 决定，结果可复现
+    """
+    h, w = img.shape[:2]
+    keys = _cell_keys(img, labels, cell)
+    mask = np.zeros((h, w), dtype=bool)
+    rng = np.random.default_rng(seed) if jitter > 0 else None
+
+    vb = keys[:, 1:] != keys[:, :-1]  # 格子 (i, j) 与 (i, j+1) 不同
+    hb = keys[1:, :] != keys[:-1, :]  # 格子 (i, j) 与 (i+1, j) 不同
+    if rng is None:
+        # 无偏移时边界线正好落在格子首列/首行上，用跨步切片直接写入
+        mask[:, cell::cell] = np.repeat(vb, cell, axis=0)[:h]
+        mask[cell::cell, :] |= np.repeat(hb, cell, axis=1)[:, :w]
+        return mask
+
+    span = np.arange(cell)
+    iy, jx = np.nonzero(vb)
+    xs = (jx + 1) * cell + rng.integers(-jitter, jitter + 1, len(jx))
+    ys = iy[:, None] * cell + span
+    mask[np.minimum(ys, h - 1), np.clip(xs, 0, w - 1)[:, None]] = True
+
+    iy, jx = np.nonzero(hb)
+    ys = (iy + 1) * cell + rng.integers(-jitter, jitter + 1, len(iy))
+    xs = jx[:, None] * cell + span
+    mask[np.clip(ys, 0, h - 1)[:, None], np.minimum(xs, w - 1)] = True
+    return mask
+
+
+# ---------- 描边 ----------
+def edge_outline(img: np.ndarray, thickness: int = 3, color: Tuple[int, int, int] = (30, 30, 30),
+                 cell: int = 1, labels: Optional[np.ndarray] = None,
+                 jitter: int = 0, seed: Optional[int] = None) -> np.ndarray:
+    """
+    沿颜色（或 labels）边界描边
+    cell: 像素格大小，在格子空间检测边界；1 表示逐像素比较
+    thickness: 描边线宽（像素），经可分离膨胀得到
+    """
+    if thickness <= 0:
+        return img.copy()
+    mask = dilate(boundary_mask(img, cell, labels, jitter, seed), thickness)
+    # 在 (h, w*3) 视图上按行写入，避免最后一维长度为 3 的逐元素广播
+    h, w = mask.shape
+    out = img.copy()
+    np.copyto(out.reshape(h, -1), np.tile(np.asarray(color, dtype=img.dtype), w),
+              where=np.repeat(mask, img.shape[2], axis=1))
+    return out
+
+
+# ---------- 网格线 ----------
+# 按通道写二维跨步视图：最后一维长度为 3 的广播赋值内层循环太短，慢数倍
+def _fill(view: np.ndarray, color):
+    if view.ndim == 3:
+        for ch in range(view.shape[2]):
+            view[..., ch] = color[ch]
+    else:
+        view[...] = color
+
+
+def _blend(view: np.ndarray, color, a8: int):
+    """原地混合：(px * (256 - a8) + color * a8) / 256，整数运算"""
+    for ch in range(view.shape[2]):
+        v = view[..., ch]
+        v[...] = (v.astype(np.uint16) * (256 - a8) + (int(color[ch]) * a8 + 128)) >> 8
+
+
+def grid_overlay(img: np.ndarray, cell: int, color=(255, 255, 255), alpha: float = 1.0,
+                 y0: int = 0) -> np.ndarray:
+    """
+    在每个格子的最后一列 / 最后一行画网格线（与原 ImageDraw 版本位置一致）
+    color: RGB 颜色；二维输入（调色板索引）时为标量
+    alpha: 不透明度，< 1 时与原图混合（需 RGB 输入），交叉点只混合一次
+    y0: 输入为整图中的一个行带时，该带首行在整图中的行号
+    """
+    out = np.array(img)
+    first = (cell - 1 - y0) % cell
+    if alpha >= 1.0:
+        _fill(out[:, cell - 1::cell], color)
+        _fill(out[first::cell], color)
+        return out
+    if alpha <= 0.0:
+        return out
+    a8 = int(round(alpha * 256))
+    rows = out[first::cell].copy()  # 行线从原值混合，交叉点不重复混合
+    _blend(out[:, cell - 1::cell], color, a8)
+    _blend(rows, color, a8)
+    out[first::cell] = rows
+    return out
@@ -35,115 +35,116 @@ def get_available_palettes() -> Dict[str, str]:
     }
     return palettes
 
+# 各调色板的原始颜色
+PALETTE_COLORS: Dict[str, List[Tuple[int, int, int]]] = {
+    'default': [
+        (0, 0, 0), (255, 255, 255), (255, 0, 0), (0, 255, 0),
+        (0, 0, 255), (255, 255, 0), (255, 0, 255), (0, 255, 255)
+    ],
+    
+    'gameboy': [
+        (15, 56, 15), (48, 98, 48), (139, 172, 15), (155, 188, 15)
+    ],
+    
+    'nes': [
+        (84, 84, 84), (0, 30, 116), (8, 16, 144), (48, 0, 136),
+        (68, 0, 100), (92, 0, 48), (136, 0, 0), (120, 16, 0),
+        (104, 40, 0), (88, 48, 0), (64, 64, 0), (0, 120, 0),
+        (8, 104, 0), (0, 88, 0), (0, 64, 88), (0, 0, 0)
+    ],
+    
+    'c64': [
+        (0, 0, 0), (255, 255, 255), (136, 0, 0), (170, 255, 238),
+        (204, 68, 204), (0, 204, 85), (170, 68, 0), (102, 102, 0),
+        (238, 119, 119), (221, 102, 0), (238, 170, 51), (0, 136, 0),
+        (170, 170, 170), (85, 85, 85), (119, 119, 255), (85, 85, 85)
+    ],
+    
+    'amiga': [
+        (0, 0, 0), (255, 255, 255), (255, 0, 0), (0, 255, 0),
+        (0, 0, 255), (255, 255, 0), (255, 0, 255), (0, 255, 255),
+        (255, 128, 0), (255, 0, 128), (128, 255, 0), (0, 255, 128),
+        (128, 0, 255), (0, 128, 255), (192, 192, 192), (128, 128, 128)
+    ],
+    
+    'atari': [
+        (0, 0, 0), (255, 255, 255), (255, 0, 0), (0, 255, 0),
+        (0, 0, 255), (255, 255, 0), (255, 0, 255), (0, 255, 255),
+        (128, 128, 128), (255, 128, 128), (128, 255, 128), (128, 128, 255)
+    ],
+    
+    'monochrome': [
+        (0, 0, 0), (255, 255, 255)
+    ],
+    
+    'sepia': [
+        (62, 39, 35), (147, 104, 67), (211, 161, 116),
+        (241, 217, 169), (255, 245, 208), (255, 255, 255)
+    ],
+    
+    'vaporwave': [
+        (255, 105, 180), (255, 20, 147), (138, 43, 226), (75, 0, 130),
+        (0, 191, 255), (135, 206, 250), (255, 255, 255), (192, 192, 192),
+        (255, 0, 255), (0, 255, 255), (255, 255, 0), (255, 0, 0)
+    ],
+    
+    'neon': [
+        (255, 0, 255), (0, 255, 255), (255, 255, 0), (255, 0, 0),
+        (0, 255, 0), (0, 0, 255), (255, 255, 255), (255, 165, 0)
+    ],
+    
+    'pastel': [
+        (255, 182, 193), (255, 218, 185), (255, 255, 186), (186, 255, 201),
+        (186, 225, 255), (255, 186, 255), (255, 229, 229), (229, 229, 255)
+    ],
+    
+    'earth': [
+        (139, 69, 19), (160, 82, 45), (205, 133, 63), (222, 184, 135),
+        (245, 222, 179), (210, 180, 140), (188, 143, 143), (165, 42, 42)
+    ],
+    
+    'ocean': [
+        (0, 0, 139), (0, 0, 255), (30, 144, 255), (64, 224, 208),
+        (127, 255, 212), (173, 216, 230), (240, 248, 255), (0, 191, 255)
+    ],
+    
+    'sunset': [
+        (255, 69, 0), (255, 99, 71), (255, 140, 0), (255, 165, 0),
+        (255, 215, 0), (255, 255, 0), (255, 182, 193), (255, 192, 203)
+    ],
+    
+    'forest': [
+        (0, 100, 0), (34, 139, 34), (50, 205, 50), (60, 179, 113),
+        (107, 142, 35), (124, 252, 0), (173, 255, 47), (240, 255, 240)
+    ],
+    
+    'desert': [
+        (210, 180, 140), (222, 184, 135), (245, 222, 179), (250, 240, 230),
+        (255, 228, 196), (255, 239, 213), (255, 248, 220), (255, 250, 250)
+    ],
+    
+    'winter': [
+        (176, 224, 230), (173, 216, 230), (240, 248, 255), (245, 255, 250),
+        (248, 248, 255), (250, 250, 250), (255, 255, 255), (192, 192, 192)
+    ],
+    
+    'spring': [
+        (0, 255, 127), (50, 205, 50), (60, 179, 113), (107, 142, 35),
+        (173, 255, 47), (255, 182, 193), (255, 192, 203), (255, 218, 185)
+    ],
+    
+    'autumn': [
+        (255, 69, 0), (255, 99, 71), (255, 140, 0), (255, 165, 0),
+        (205, 133, 63), (210, 180, 140), (139, 69, 19), (160, 82, 45)
+    ]
+}
+
 def get_palette_colors(palette_name: str, color_count: int = 256) -> List[Tuple[int, int, int]]:
     """获取指定调色板的颜色列表"""
-    palettes = {
-        'default': [
-            (0, 0, 0), (255, 255, 255), (255, 0, 0), (0, 255, 0),
-            (0, 0, 255), (255, 255, 0), (255, 0, 255), (0, 255, 255)
-        ],
-        
-        'gameboy': [
-            (15, 56, 15), (48, 98, 48), (139, 172, 15), (155, 188, 15)
-        ],
-        
-        'nes': [
-            (84, 84, 84), (0, 30, 116), (8, 16, 144), (48, 0, 136),
-            (68, 0, 100), (92, 0, 48), (136, 0, 0), (120, 16, 0),
-            (104, 40, 0), (88, 48, 0), (64, 64, 0), (0, 120, 0),
-            (8, 104, 0), (0, 88, 0), (0, 64, 88), (0, 0, 0)
-        ],
-        
-        'c64': [
-            (0, 0, 0), (255, 255, 255), (136, 0, 0), (170, 255, 238),
-            (204, 68, 204), (0, 204, 85), (170, 68, 0), (102, 102, 0),
-            (238, 119, 119), (221, 102, 0), (238, 170, 51), (0, 136, 0),
-            (170, 170, 170), (85, 85, 85), (119, 119, 255), (85, 85, 85)
-        ],
-        
-        'amiga': [
-            (0, 0, 0), (255, 255, 255), (255, 0, 0), (0, 255, 0),
-            (0, 0, 255), (255, 255, 0), (255, 0, 255), (0, 255, 255),
-            (255, 128, 0), (255, 0, 128), (128, 255, 0), (0, 255, 128),
-            (128, 0, 255), (0, 128, 255), (192, 192, 192), (128, 128, 128)
-        ],
-        
-        'atari': [
-            (0, 0, 0), (255, 255, 255), (255, 0, 0), (0, 255, 0),
-            (0, 0, 255), (255, 255, 0), (255, 0, 255), (0, 255, 255),
-            (128, 128, 128), (255, 128, 128), (128, 255, 128), (128, 128, 255)
-        ],
-        
-        'monochrome': [
-            (0, 0, 0), (255, 255, 255)
-        ],
-        
-        'sepia': [
-            (62, 39, 35), (147, 104, 67), (211, 161, 116),
-            (241, 217, 169), (255, 245, 208), (255, 255, 255)
-        ],
-        
-        'vaporwave': [
-            (255, 105, 180), (255, 20, 147), (138, 43, 226), (75, 0, 130),
-            (0, 191, 255), (135, 206, 250), (255, 255, 255), (192, 192, 192),
-            (255, 0, 255), (0, 255, 255), (255, 255, 0), (255, 0, 0)
-        ],
-        
-        'neon': [
-            (255, 0, 255), (0, 255, 255), (255, 255, 0), (255, 0, 0),
-            (0, 255, 0), (0, 0, 255), (255, 255, 255), (255, 165, 0)
-        ],
-        
-        'pastel': [
-            (255, 182, 193), (255, 218, 185), (255, 255, 186), (186, 255, 201),
-            (186, 225, 255), (255, 186, 255), (255, 229, 229), (229, 229, 255)
-        ],
-        
-        'earth': [
-            (139, 69, 19), (160, 82, 45), (205, 133, 63), (222, 184, 135),
-            (245, 222, 179), (210, 180, 140), (188, 143, 143), (165, 42, 42)
-        ],
-        
-        'ocean': [
-            (0, 0, 139), (0, 0, 255), (30, 144, 255), (64, 224, 208),
-            (127, 255, 212), (173, 216, 230), (240, 248, 255), (0, 191, 255)
-        ],
-        
-        'sunset': [
-            (255, 69, 0), (255, 99, 71), (255, 140, 0), (255, 165, 0),
-            (255, 215, 0), (255, 255, 0), (255, 182, 193), (255, 192, 203)
-        ],
-        
-        'forest': [
-            (0, 100, 0), (34, 139, 34), (50, 205, 50), (60, 179, 113),
-            (107, 142, 35), (124, 252, 0), (173, 255, 47), (240, 255, 240)
-        ],
-        
-        'desert': [
-            (210, 180, 140), (222, 184, 135), (245, 222, 179), (250, 240, 230),
-            (255, 228, 196), (255, 239, 213), (255, 248, 220), (255, 250, 250)
-        ],
-        
-        'winter': [
-            (176, 224, 230), (173, 216, 230), (240, 248, 255), (245, 255, 250),
-            (248, 248, 255), (250, 250, 250), (255, 255, 255), (192, 192, 192)
-        ],
-        
-        'spring': [
-            (0, 255, 127), (50, 205, 50), (60, 179, 113), (107, 142, 35),
-            (173, 255, 47), (255, 182, 193), (255, 192, 203), (255, 218, 185)
-        ],
-        
-        'autumn': [
-            (255, 69, 0), (255, 99, 71), (255, 140, 0), (255, 165, 0),
-            (205, 133, 63), (210, 180, 140), (139, 69, 19), (160, 82, 45)
-        ]
-    }
-    
-    if palette_name not in palettes:
+    if palette_name not in PALETTE_COLORS:
         return []
     
-    colors = palettes[palette_name]
+    colors = PALETTE_COLORS[palette_name]
     
     # 如果颜色数量超过需要的，进行均匀采样
     if len(colors) > color_count:
@@ -156,6 +157,12 @@ def get_palette_colors(palette_name: str, color_count: int = 256) -> List[Tuple[
     
     return colors
 
+def palette_colors(palette_name: str, max_colors: int = 256) -> List[Tuple[int, int, int]]:
+    """调色板的原始颜色（不插值补充），多于 max_colors 时均匀采样；未知名称抛出 ValueError"""
+    if palette_name not in PALETTE_COLORS:
+        raise ValueError(f"未知调色板: {palette_name}")
+    return get_palette_colors(palette_name, min(max_colors, len(PALETTE_COLORS[palette_name])))
+
 def interpolate_colors(colors, target_count):
     """通过插值增加颜色数量"""
     if len(colors) >= target_count:
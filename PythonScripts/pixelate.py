@@ -9,29 +9,62 @@ import argparse
 import json
 import time
 import numpy as np
+from dataclasses import replace
 from pathlib import Path
-from PIL import Image, ImageEnhance, ImageDraw
-from typing import Optional, Tuple
+from PIL import Image
+from typing import Optional, Tuple, Union
 from io import BytesIO
 from core import PixelArtGenerator, PixelArtConfig
+from adjust import ColorAdjust
+from cache import ResultCache
+from encoder import encode_png, save_png, png_save_params
+from streaming import StreamingPixelator
+from animation import AnimationPixelator
+from batch import run_batch
+from frameio import is_animation
+from progress import ProgressReporter
+from metrics import Metrics, NULL_METRICS
+from overlays import edge_outline, grid_overlay
+from rawio import read_raw_frame, raw_frame_from_bytes, write_raw_frame, encode_raw_frame
 from slic import create_slic_instance  # 保留 GUI 接口
 
 
 # ---------- 进度 ----------
-def report_progress(progress_file: Optional[str], percent: int, msg: str):
-    if not progress_file:
-        return
-    try:
-        with open(progress_file, "w", encoding="utf-8") as f:
-            json.dump({"progress": percent, "message": msg, "timestamp": time.time()}, f)
-    except Exception:
-        pass
+# 各阶段在总进度中的区间（核心回调按阶段内完成比例插值）
+PROGRESS_SPANS = {
+    "slic": (25, 80),
+    "grid": (80, 85),
+    "quantize": (85, 88),
+    "dither": (88, 90),
+    "stream_map": (15, 15),
+    "stream_render": (15, 90),
+    "stream_fit": (15, 50),
+    "stream_write": (50, 90),
+    "frames": (15, 95),
+    "batch": (5, 95),
+}
+
+
+def create_progress(args: argparse.Namespace) -> ProgressReporter:
+    progress = ProgressReporter(args.progress_file, jsonl=args.progress_jsonl, mmap_path=args.progress_mmap)
+    progress.set_spans(PROGRESS_SPANS)
+    return progress
 
 
 # ---------- 参数验证 ----------
 def validate_args(args: argparse.Namespace):
-    if not args.pipe_mode:  # 只有在非管道模式下才需要检查输入文件
-        if not Path(args.input).exists():
+    if args.input_dir:
+        if not Path(args.input_dir).is_dir():
+            raise ValueError(f"输入目录不存在: {args.input_dir}")
+        if not args.output_dir:
+            raise ValueError("目录批处理需要指定 --output-dir")
+        for flag, name in [(args.input, "--input"), (args.pipe_mode, "管道模式"), (args.streaming, "流式模式")]:
+            if flag:
+                raise ValueError(f"目录批处理不能与{name}同时使用")
+        if args.workers is not None and args.workers < 1:
+            raise ValueError("工作进程数必须大于0")
+    elif not args.pipe_mode:  # 只有在非管道模式下才需要检查输入文件
+        if not args.input or not Path(args.input).exists():
             raise ValueError(f"输入文件不存在: {args.input}")
     for v, low, high, name in [
         (args.pixel_size, 1, 64, "像素大小"),
@@ -41,9 +74,32 @@ def validate_args(args: argparse.Namespace):
         (args.saturation, 0, 2.0, "饱和度"),
         (args.edge_smoothing, 0, 1.0, "边缘平滑"),
         (args.dither_strength, 0, 1.0, "抖动强度"),
+        (args.grid_alpha, 0, 1.0, "网格线不透明度"),
+        (args.cartoon_edge_weight, 0, 1.0, "卡通边缘强度"),
+        (args.cartoon_levels, 2, 256, "卡通色阶数"),
+        (args.slic_iters, 1, 100, "SLIC迭代次数"),
+        (args.frame_duration_ms, 1, 65535, "帧时长"),
+        (args.frame_change_threshold, 0, 255, "帧变化阈值"),
     ]:
         if not (low <= v <= high):
             raise ValueError(f"{name}必须在{low}-{high}之间")
+    png_save_params(args.png_compression)  # 非法时抛出 ValueError
+    if args.streaming:
+        if args.pipe_mode:
+            raise ValueError("流式模式只支持文件输入输出")
+        if args.edge_outline:
+            raise ValueError("流式模式暂不支持边缘描边")
+        if args.cartoon_effect:
+            raise ValueError("流式模式暂不支持卡通效果")
+        if args.time_budget_ms is not None:
+            raise ValueError("流式模式不支持时间预算")
+    if args.time_budget_ms is not None and args.time_budget_ms <= 0:
+        raise ValueError("时间预算必须大于0")
+    if not args.pipe_mode and not args.input_dir and is_animation(args.input):
+        for flag, name in [(args.streaming, "流式模式"), (args.edge_outline, "边缘描边"),
+                           (args.show_grid, "网格线"), (args.time_budget_ms is not None, "时间预算")]:
+            if flag:
+                raise ValueError(f"动画模式暂不支持{name}")
 
 
 # ---------- 图像 IO ----------
@@ -62,9 +118,40 @@ def load_image(path: str) -> Image.Image:
         raise ValueError(f"加载图像失败: {e}")
 
 
-def save_image(img: Image.Image, path: str):
-    Path(path).parent.mkdir(parents=True, exist_ok=True)
-    img.save(path, format="PNG", optimize=True)
+def load_image_from_bytes(data: bytes) -> Image.Image:
+    """从内存中的编码数据加载图像（缓存模式下输入已整体读入）"""
+    try:
+        img = Image.open(BytesIO(data))
+        if img.mode != "RGB":
+            if img.mode == "RGBA":
+                bg = Image.new("RGB", img.size, (255, 255, 255))
+                bg.paste(img, mask=img.split()[3])
+                img = bg
+            else:
+                img = img.convert("RGB")
+        return img
+    except Exception as e:
+        raise ValueError(f"加载图像失败: {e}")
+
+
+def save_image(img: Union[Image.Image, np.ndarray], path: str, compression: str = "default"):
+    """保存为 PNG；不超过 256 色时写调色板 PNG"""
+    save_png(np.asarray(img), path, compression)
+
+
+def encode_image(img: Union[Image.Image, np.ndarray], compression: str = "default") -> bytes:
+    """编码为 PNG 字节（与 save_image 相同参数）"""
+    return encode_png(np.asarray(img), compression)
+
+
+def write_output_bytes(data: bytes, args: argparse.Namespace):
+    """将已编码的输出写到 stdout 或输出文件"""
+    if args.pipe_mode:
+        sys.stdout.buffer.write(data)
+        sys.stdout.buffer.flush()
+    else:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_bytes(data)
 
 
 # ---------- 管道模式图像 IO ----------
@@ -89,15 +176,11 @@ def load_image_from_stdin() -> Image.Image:
         raise ValueError(f"从stdin加载图像失败: {e}")
 
 
-def save_image_to_stdout(img: Image.Image):
+def save_image_to_stdout(img: Union[Image.Image, np.ndarray], compression: str = "default"):
     """将图像数据写入stdout"""
     try:
-        # 创建BytesIO对象
-        output_stream = BytesIO()
-        # 保存图像到流
-        img.save(output_stream, format="PNG", optimize=True)
-        # 获取字节数据
-        image_data = output_stream.getvalue()
+        # 编码为PNG字节
+        image_data = encode_image(img, compression)
         # 写入stdout
         sys.stdout.buffer.write(image_data)
         sys.stdout.buffer.flush()
@@ -107,121 +190,82 @@ def save_image_to_stdout(img: Image.Image):
 
 # ---------- 基础调整 ----------
 def apply_basic_adjustments(img: Image.Image, args: argparse.Namespace) -> Image.Image:
-    for enh_name, factor in [
-        ("Brightness", args.brightness),
-        ("Contrast", args.contrast),
-        ("Color", args.saturation),
-    ]:
-        if factor == 1.0:
-            continue
-        img = getattr(ImageEnhance, enh_name)(img).enhance(factor)
-    return img
+    """整图调整（与 ImageEnhance 依次调整的结果一致），见 adjust.ColorAdjust"""
+    adjust = ColorAdjust(args.brightness, args.contrast, args.saturation)
+    if adjust.identity:
+        return img
+    rgb = np.array(img.convert("RGB"))
+    if adjust.needs_mean:
+        adjust.fit(adjust.histogram(rgb))
+    return Image.fromarray(adjust.apply(rgb))
 
 
 # ---------- 新核心处理（无 OpenCV） ----------
-def process_with_new_core(img: Image.Image, args: argparse.Namespace) -> Image.Image:
-    cfg = PixelArtConfig(
+def build_config(args: argparse.Namespace) -> PixelArtConfig:
+    return PixelArtConfig(
         pixel_size=args.pixel_size,
         color_count=args.color_count,
         dithering_method="floyd_steinberg" if args.dithering else None,
         dithering_strength=args.dither_strength,
-        align_grid=True  # 强制栅格对齐以确保像素严格对齐
+        # 强制栅格对齐以确保像素严格对齐；slic 算法带时间预算时由 planner 在 SLIC / pyramid / 栅格间选择
+        align_grid=not (args.time_budget_ms is not None and args.algorithm == "slic"),
+        cartoon_edge_weight=args.cartoon_edge_weight if args.cartoon_effect else None,
+        cartoon_levels=args.cartoon_levels,
+        slic_iters=args.slic_iters,
+        time_budget_ms=args.time_budget_ms,
     )
-    gen = PixelArtGenerator(cfg)
-    rgb = np.array(img)
-    style_map = {"basic": "basic", "average": "quantized", "median": "quantized", "slic": "basic"}
+
+
+def process_array(rgb: np.ndarray, args: argparse.Namespace,
+                  progress: Optional[ProgressReporter] = None, metrics=NULL_METRICS,
+                  adjust: Optional[ColorAdjust] = None) -> np.ndarray:
+    cfg = build_config(args)
+    gen = PixelArtGenerator(cfg, progress, metrics, adjust, getattr(args, "calibration_file", None))
+    style_map = {"basic": "basic", "average": "average", "median": "median", "slic": "basic"}
     out_rgb = gen.generate(rgb, style=style_map.get(args.algorithm, "basic"))
-    result_img = Image.fromarray(out_rgb)
-    
+    n_pixels = out_rgb.shape[0] * out_rgb.shape[1]
+
     # 如果启用边缘黑色像素处理，则添加边缘描边
     if getattr(args, 'edge_outline', False):
         # 获取边缘描边参数
         thickness = getattr(args, 'edge_outline_thickness', 3)
         color_str = getattr(args, 'edge_outline_color', "30,30,30")
         color = tuple(map(int, color_str.split(',')))
-        out_rgb = add_edge_outline(out_rgb, thickness=thickness, color=color)
-        result_img = Image.fromarray(out_rgb)
-    
+        # 时间预算选了 SLIC / pyramid 时分割边界不落在格线上，逐像素检测边缘
+        plan = gen.last_plan
+        cell = args.pixel_size if plan is None or plan.mode == "grid" else 1
+        with metrics.stage("outline", pixels=n_pixels):
+            out_rgb = add_edge_outline(out_rgb, thickness=thickness, color=color, cell=cell,
+                                       jitter=getattr(args, 'edge_outline_jitter', 0),
+                                       seed=getattr(args, 'edge_outline_seed', 0))
+
     # 如果启用网格线，则在图像上绘制网格
     if getattr(args, 'show_grid', False):
-        result_img = draw_grid_on_image(result_img, args.pixel_size)
-    
-    return result_img
-
-
-def draw_grid_on_image(img: Image.Image, pixel_size: int) -> Image.Image:
-    """在图像上绘制网格线"""
-    # 创建一个可以在上面绘制的图像副本
-    grid_img = img.copy()
-    draw = ImageDraw.Draw(grid_img)
-    
-    # 获取图像尺寸
-    width, height = img.size
-    
-    # 在每个像素格子内绘制网格线
-    for y in range(0, height, pixel_size):
-        for x in range(0, width, pixel_size):
-            # 绘制格子的右边线
-            draw.line([(x + pixel_size - 1, y), (x + pixel_size - 1, min(y + pixel_size, height))], 
-                      fill=(255, 255, 255, 128), width=1)
-            # 绘制格子的下边线
-            draw.line([(x, y + pixel_size - 1), (min(x + pixel_size, width), y + pixel_size - 1)], 
-                      fill=(255, 255, 255, 128), width=1)
-    
-    return grid_img
-
-
-def add_edge_outline(img: np.ndarray, thickness: int = 3, color: Tuple[int, int, int] = (30, 30, 30)) -> np.ndarray:
+        with metrics.stage("grid_overlay", pixels=n_pixels):
+            out_rgb = grid_overlay(out_rgb, args.pixel_size, alpha=getattr(args, 'grid_alpha', 1.0))
+
+    return out_rgb
+
+
+def process_with_new_core(img: Image.Image, args: argparse.Namespace) -> Image.Image:
+    return Image.fromarray(process_array(np.array(img), args))
+
+
+def draw_grid_on_image(img: Image.Image, pixel_size: int, alpha: float = 1.0) -> Image.Image:
+    """在图像上绘制网格线（见 overlays.grid_overlay）"""
+    return Image.fromarray(grid_overlay(np.asarray(img), pixel_size, alpha=alpha))
+
+
+def add_edge_outline(img: np.ndarray, thickness: int = 3, color: Tuple[int, int, int] = (30, 30, 30),
+                     cell: int = 1, jitter: int = 0, seed: Optional[int] = 0) -> np.ndarray:
     """
-    一键描黑 + 硬边
+    一键描黑 + 硬边：沿颜色块边界描边（见 overlays.edge_outline）
     thickness: 描黑厚度（像素）
     color: 描黑颜色（默认深灰）
+    cell: 像素格大小，在格子空间中检测边界
+    jitter/seed: 边界线随机偏移幅度与种子，相同种子结果相同
     """
-    h, w = img.shape[:2]
-
-    # ① 改进的硬边掩膜（使用更细的网格以减少整块感）
-    step = 8  # 减小步长以获得更细致的掩膜
-    h_grid, w_grid = h // step, w // step
-    mask = np.zeros((h, w), dtype=np.uint8)
-    
-    # 添加亚像素偏移以减少过于整齐的网格感
-    for gy in range(h_grid):
-        for gx in range(w_grid):
-            y0, x0 = gy * step, gx * step
-            # 添加随机偏移（±1像素）以减少网格的机械感
-            y_offset = np.random.randint(-1, 2) if gy > 0 and gy < h_grid - 1 else 0
-            x_offset = np.random.randint(-1, 2) if gx > 0 and gx < w_grid - 1 else 0
-            
-            y1 = min(h, max(0, y0 + y_offset))
-            x1 = min(w, max(0, x0 + x_offset))
-            y2 = min(h, max(0, y0 + step + y_offset))
-            x2 = min(w, max(0, x0 + step + x_offset))
-            
-            mask[y1:y2, x1:x2] = 1  # 硬边掩膜
-
-    # ② 描黑（厚度 = thickness）
-    # 使用numpy操作替代cv2.dilate
-    outline = np.zeros_like(mask)
-    for i in range(thickness):
-        # 上下左右扩展
-        if i < h-1:
-            outline[i+1:, :] = np.maximum(outline[i+1:, :], mask[:-i-1, :])
-        if i < h-1:
-            outline[:-i-1, :] = np.maximum(outline[:-i-1, :], mask[i+1:, :])
-        if i < w-1:
-            outline[:, i+1:] = np.maximum(outline[:, i+1:], mask[:, :-i-1])
-        if i < w-1:
-            outline[:, :-i-1] = np.maximum(outline[:, :-i-1], mask[:, i+1:])
-    
-    # 只描边，不包括原始区域
-    outline = outline - mask
-    outline_rgb = np.zeros_like(img)
-    outline_rgb[outline > 0] = color
-
-    # ③ 硬边描黑（硬边 + 原图）
-    out = img.copy()
-    out[outline > 0] = outline_rgb[outline > 0]
-    return out.astype(np.uint8)
+    return edge_outline(img, thickness=thickness, color=color, cell=cell, jitter=jitter, seed=seed)
 
 
 # ---------- 保留 GUI 接口 ----------
@@ -230,12 +274,143 @@ def create_slic_instance(image_array: np.ndarray, width: int, height: int):
     return SLIC(image_array, width, height)
 
 
+# ---------- 流式模式 ----------
+def run_streaming(args: argparse.Namespace, progress: ProgressReporter, metrics=NULL_METRICS) -> dict:
+    style_map = {"basic": "basic", "average": "average", "median": "median", "slic": "basic"}
+    streamer = StreamingPixelator(
+        build_config(args),
+        style=style_map.get(args.algorithm, "basic"),
+        band_rows=args.stream_band_rows,
+        brightness=args.brightness,
+        contrast=args.contrast,
+        saturation=args.saturation,
+        show_grid=args.show_grid,
+        grid_alpha=args.grid_alpha,
+        tmp_dir=args.stream_tmp_dir,
+        progress=progress,
+    )
+    level = png_save_params(args.png_compression)["compress_level"]
+    with metrics.stage("streaming"):
+        stats = streamer.run(args.input, args.output, compress_level=level)
+    metrics.set("input_pixels", stats["width"] * stats["height"])
+    metrics.set("stream_bands", stats["bands"])
+    return stats
+
+
+# ---------- 动画模式 ----------
+def run_animation(args: argparse.Namespace, progress: ProgressReporter, metrics=NULL_METRICS) -> dict:
+    """GIF / APNG / 帧目录：逐帧处理，跨帧沿用调色板与分割状态；--algorithm slic 时每帧做热启动 SLIC"""
+    style_map = {"basic": "basic", "average": "average", "median": "median", "slic": "basic"}
+    cfg = replace(build_config(args), align_grid=args.algorithm != "slic")
+    animator = AnimationPixelator(
+        cfg,
+        style=style_map.get(args.algorithm, "basic"),
+        adjust=ColorAdjust(args.brightness, args.contrast, args.saturation),
+        change_threshold=args.frame_change_threshold,
+        metrics=metrics,
+        progress=progress,
+    )
+    level = png_save_params(args.png_compression)["compress_level"]
+    with metrics.stage("animation"):
+        stats = animator.run(args.input, args.output, args.frame_duration_ms, compress_level=level)
+    metrics.set("input_pixels", stats["width"] * stats["height"] * stats["frames"])
+    metrics.set("frames", stats["frames"])
+    metrics.set("cells_reused", stats["cells_reused"])
+    return stats
+
+
+# ---------- 目录批处理 ----------
+def run_batch_dir(args: argparse.Namespace, progress: ProgressReporter, start: float):
+    """每个文件一行 JSON 结果输出到 stdout；有文件失败时以退出码 1 结束"""
+    counts = run_batch(args, cache_options(args), progress=progress)
+    elapsed = time.time() - start
+    progress.report(100, f"批处理完成 (耗时: {elapsed:.2f}秒)", stage="done")
+    progress.close()
+    print(f"SUCCESS:{args.output_dir}")
+    print(f"TIME:{elapsed:.2f}")
+    print(f"BATCH:{json.dumps(counts)}")
+    if counts["failed"]:
+        sys.exit(1)
+
+
+# ---------- 结果缓存 ----------
+# 不影响输出像素的参数，不参与缓存键
+_CACHE_IGNORED_ARGS = {"input", "output", "pipe_mode", "progress_file", "cache_dir", "cache_max_mb",
+                       "stream_tmp_dir", "progress_jsonl", "progress_mmap", "metrics",
+                       "metrics_trace_memory", "calibration_file", "input_dir", "output_dir", "workers",
+                       "manifest"}
+
+
+def cache_options(args: argparse.Namespace) -> dict:
+    return {k: v for k, v in sorted(vars(args).items()) if k not in _CACHE_IGNORED_ARGS}
+
+
+def render(img: Union[Image.Image, np.ndarray], args: argparse.Namespace,
+           progress: ProgressReporter, metrics=NULL_METRICS) -> np.ndarray:
+    rgb = np.asarray(img)
+    metrics.set("input_pixels", rgb.shape[0] * rgb.shape[1])
+    progress.set_spans({}, pixels=rgb.shape[0] * rgb.shape[1])
+    progress.report(25, "图像准备完成", stage="prepare")
+
+    # 基础调整合并为一次变换，由生成器在格子空间（栅格对齐时）或原图上执行
+    adjust = ColorAdjust(args.brightness, args.contrast, args.saturation)
+    result = process_array(rgb, args, progress, metrics, adjust)
+    progress.report(90, "像素画生成完成", stage="render")
+    return result
+
+
+def decode_input_bytes(data: bytes, args: argparse.Namespace) -> Tuple[Union[Image.Image, np.ndarray], int]:
+    """返回 (图像, 原始帧通道数)；PNG 等编码输入的通道数记为 3"""
+    if args.pipe_mode and args.pipe_format == "raw":
+        return raw_frame_from_bytes(data)
+    return load_image_from_bytes(data), 3
+
+
+def encode_output(result: np.ndarray, args: argparse.Namespace, channels: int = 3) -> bytes:
+    if args.pipe_mode and args.pipe_format == "raw":
+        return encode_raw_frame(result, channels)
+    return encode_image(result, args.png_compression)
+
+
+def run_cached(args: argparse.Namespace, cache: ResultCache, progress: ProgressReporter,
+               metrics=NULL_METRICS):
+    """缓存模式：按输入字节 + 规范化配置查找，命中时跳过解码/处理/编码"""
+    with metrics.stage("read_input"):
+        if args.pipe_mode:
+            data = sys.stdin.buffer.read()
+        else:
+            data = Path(args.input).read_bytes()
+    progress.report(15, "图像加载完成", stage="load")
+
+    with metrics.stage("cache_lookup"):
+        key = cache.make_key(data, build_config(args), cache_options(args))
+        payload = cache.get(key)
+    if payload is None:
+        with metrics.stage("decode"):
+            img, channels = decode_input_bytes(data, args)
+            if isinstance(img, Image.Image):
+                img.load()
+        result = render(img, args, progress, metrics)
+        with metrics.stage("encode", pixels=result.shape[0] * result.shape[1]):
+            payload = encode_output(result, args, channels)
+        with metrics.stage("cache_store"):
+            cache.put(key, payload)
+    else:
+        progress.report(90, "命中缓存", stage="cache")
+    with metrics.stage("write_output"):
+        write_output_bytes(payload, args)
+    metrics.set("cache_hits", cache.hits)
+    metrics.set("cache_misses", cache.misses)
+
+
 # ---------- CLI ----------
 def main():
     parser = argparse.ArgumentParser(description="像素画生成工具")
     parser.add_argument("--input", help="输入图片路径")
     parser.add_argument("--output", help="输出图片路径")
     parser.add_argument("--pipe-mode", action="store_true", help="启用管道模式")
+    parser.add_argument("--pipe-format", choices=["png", "raw"], default="png",
+                        help="管道数据格式：png（默认）或 raw（帧头 + RGB/BGRA 原始像素）")
     parser.add_argument("--pixel-size", type=int, default=16, help="像素块大小 (4-64)")
     parser.add_argument("--color-count", type=int, default=32, help="颜色数量 (2-256)")
     parser.add_argument("--palette", default="default", help="调色板名称")
@@ -246,46 +421,103 @@ def main():
     parser.add_argument("--brightness", type=float, default=1.0, help="亮度 (0.1-2.0)")
     parser.add_argument("--saturation", type=float, default=1.0, help="饱和度 (0-2.0)")
     parser.add_argument("--progress-file", help="进度报告文件")
+    parser.add_argument("--progress-jsonl", action="store_true", help="在stderr上逐行输出JSON进度")
+    parser.add_argument("--progress-mmap", help="进度状态记录的内存映射文件（固定256字节）")
+    parser.add_argument("--png-compression", default="default",
+                        help="PNG压缩：fast/default/best 或 级别[:策略]，如 3:rle")
     parser.add_argument("--dither-strength", type=float, default=0.1, help="抖动强度 (0-1)")
     parser.add_argument("--cartoon-effect", action="store_true", help="卡通效果")
+    parser.add_argument("--cartoon-edge-weight", type=float, default=0.3, help="卡通效果边缘压暗强度 (0-1)")
+    parser.add_argument("--cartoon-levels", type=int, default=8, help="卡通效果每通道色阶数 (2-256)")
     parser.add_argument("--slic-iters", type=int, default=10, help="SLIC迭代次数")
+    parser.add_argument("--time-budget-ms", type=float,
+                        help="时间预算（毫秒）：按本机标定的开销模型自动选择算法、迭代次数、工作分辨率与抖动")
+    parser.add_argument("--calibration-file", help="开销模型标定缓存文件（默认 ~/.cache/pixelart/calibration.json）")
     parser.add_argument("--slic-weight", type=float, default=10.0, help="SLIC颜色权重")
     parser.add_argument("--show-grid", action="store_true", help="在图像上显示网格线")
+    parser.add_argument("--grid-alpha", type=float, default=1.0, help="网格线不透明度 (0-1)")
     parser.add_argument("--edge-outline", action="store_true", help="在图像上添加边缘黑色像素描边")
     parser.add_argument("--edge-outline-thickness", type=int, default=3, help="边缘描边厚度 (像素)")
     parser.add_argument("--edge-outline-color", default="30,30,30", help="边缘描边颜色 (R,G,B)")
+    parser.add_argument("--edge-outline-jitter", type=int, default=0, help="描边线随机偏移幅度 (像素)")
+    parser.add_argument("--edge-outline-seed", type=int, default=0, help="描边随机偏移的种子")
+    parser.add_argument("--streaming", action="store_true",
+                        help="流式模式：内存映射输入，按像素格行带处理并逐带写出（超大图）")
+    parser.add_argument("--stream-band-rows", type=int, default=512, help="流式模式每带的像素行数")
+    parser.add_argument("--stream-tmp-dir", help="流式模式临时映射文件目录")
+    parser.add_argument("--frame-duration-ms", type=int, default=100, help="动画模式：帧目录输入的每帧时长 (毫秒)")
+    parser.add_argument("--frame-change-threshold", type=int, default=3,
+                        help="动画模式：格子颜色变化不超过该值（0-255）时沿用上一帧")
+    parser.add_argument("--input-dir", help="目录批处理：输入目录（递归处理其中的图片）")
+    parser.add_argument("--output-dir", help="目录批处理：输出目录（保持相对路径，输出为 PNG）")
+    parser.add_argument("--workers", type=int, help="目录批处理：工作进程数（默认 CPU 核数）")
+    parser.add_argument("--manifest", help="目录批处理：清单文件（默认 输出目录/.pixelate_manifest.jsonl）")
+    parser.add_argument("--metrics", help="写出各阶段计时/计数器的 JSON 报告路径")
+    parser.add_argument("--metrics-trace-memory", action="store_true",
+                        help="用 tracemalloc 统计各阶段峰值分配（较慢）")
+    parser.add_argument("--cache-dir", help="结果缓存目录（指定即启用缓存）")
+    parser.add_argument("--cache-max-mb", type=int, default=512, help="结果缓存容量上限 (MB)")
 
     args = parser.parse_args()
     validate_args(args)
 
     start = time.time()
-    report_progress(args.progress_file, 5, "开始处理...")
+    progress = create_progress(args)
+    progress.report(5, "开始处理...", stage="start")
+    # 时间预算的方案记录在 metrics 中，需要输出 PLAN 行时也启用
+    use_metrics = args.metrics or args.time_budget_ms is not None
+    metrics = Metrics(trace_memory=args.metrics_trace_memory) if use_metrics else NULL_METRICS
+
+    if args.input_dir:
+        run_batch_dir(args, progress, start)
+        return
 
-    # 根据模式加载图像
-    if args.pipe_mode:
-        img = load_image_from_stdin()
-        report_progress(args.progress_file, 15, "图像加载完成")
+    cache = None  # 只有单图模式使用结果缓存；动画与流式模式忽略 --cache-dir
+    if not args.pipe_mode and is_animation(args.input):
+        run_animation(args, progress, metrics)
+    elif args.streaming:
+        run_streaming(args, progress, metrics)
+    elif args.cache_dir:
+        cache = ResultCache(args.cache_dir, args.cache_max_mb * 1024 * 1024)
+        run_cached(args, cache, progress, metrics)
     else:
-        img = load_image(args.input)
-        report_progress(args.progress_file, 15, "图像加载完成")
-    
-    img = apply_basic_adjustments(img, args)
-    report_progress(args.progress_file, 25, "基础调整完成")
-
-    result = process_with_new_core(img, args)
-    report_progress(args.progress_file, 90, "像素画生成完成")
+        # 根据模式加载图像
+        channels = 3
+        with metrics.stage("decode"):
+            if args.pipe_mode and args.pipe_format == "raw":
+                img, channels = read_raw_frame(sys.stdin.buffer)
+            elif args.pipe_mode:
+                img = load_image_from_stdin()
+            else:
+                img = load_image(args.input)
+            if isinstance(img, Image.Image):
+                img.load()
+        progress.report(15, "图像加载完成", stage="load")
+
+        result = render(img, args, progress, metrics)
+
+        # 根据模式保存图像
+        with metrics.stage("encode", pixels=result.shape[0] * result.shape[1]):
+            if args.pipe_mode and args.pipe_format == "raw":
+                write_raw_frame(sys.stdout.buffer, result, channels)
+                sys.stdout.buffer.flush()
+            elif args.pipe_mode:
+                save_image_to_stdout(result, args.png_compression)
+            else:
+                save_image(result, args.output, args.png_compression)
 
-    # 根据模式保存图像
-    if args.pipe_mode:
-        save_image_to_stdout(result)
-    else:
-        save_image(result, args.output)
-        
     elapsed = time.time() - start
-    report_progress(args.progress_file, 100, f"处理完成 (耗时: {elapsed:.2f}秒)")
+    progress.report(100, f"处理完成 (耗时: {elapsed:.2f}秒)", stage="done")
+    progress.close()
 
     print(f"SUCCESS:{'PIPE_MODE' if args.pipe_mode else args.output}")
     print(f"TIME:{elapsed:.2f}")
+    if metrics.enabled and "plan" in metrics.counters:
+        print(f"PLAN:{json.dumps(metrics.counters['plan'], ensure_ascii=False)}")
+    if cache is not None:
+        print(cache.stats_line())
+    if args.metrics:
+        metrics.write(args.metrics)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+时间预算规划（--time-budget-ms）
+用本机标定的各阶段开销模型预测每个候选方案的耗时，挑选预算内质量最高的一个：
+  slic（全分辨率超像素，迭代轮数从高到低）> pyramid（缩小 2/4/8 倍分割后放大）> grid（栅格块均值）
+抖动（dithered 风格）优先保留，放不下时再关闭。都放不下时取预测最快的方案。
+标定在合成图上实际运行各阶段，系数按主机指纹缓存在 JSON 文件中，同一主机只标定一次
+"""
+import json
+import os
+import platform
+import threading
+import time
+from dataclasses import dataclass, asdict, replace
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+CALIBRATION_VERSION = 3  # 2: SLIC 残差提前结束（实际轮数随图像变化）；3: 量化 / 调色板映射改在调色板上
+DEFAULT_CALIBRATION_PATH = Path.home() / ".cache" / "pixelart" / "calibration.json"
+_ITER_CHOICES = (10, 5, 3, 2, 1)
+_PYRAMID_SCALES = (2, 4, 8)
+# 受规划的风格（都以 _basic 为基础）及其在基础结果上追加的阶段
+_STYLE_STAGES = {
+    "basic": (),
+    "quantized": ("kmeans",),
+    "dithered": ("kmeans", "dither"),
+    "retro": ("palette_map",),
+    "monochrome": ("palette_map",),
+}
+
+
+@dataclass
+class Plan:
+    mode: str                         # slic / pyramid / grid
+    scale: int = 1                    # 工作分辨率缩小倍数
+    iters: int = 10                   # SLIC 迭代上限
+    dithering: Optional[str] = None   # 实际使用的抖动方式
+    predicted_s: float = 0.0
+    actual_s: Optional[float] = None
+    budget_s: Optional[float] = None
+
+    def to_dict(self) -> dict:
+        """报告用：时间换算为毫秒"""
+        d = asdict(self)
+        for key in ("predicted_s", "actual_s", "budget_s"):
+            s = d.pop(key)
+            d[key[:-2] + "_ms"] = None if s is None else round(s * 1000, 1)
+        return d
+
+
+# ---------- 开销模型 ----------
+class CostModel:
+    """
+    各阶段的单位开销（秒）：
+      lab / slic_render / grid / kmeans / dither / palette_map / resize：每像素
+      slic_seed：每个中心；slic_iter_center + slic_iter_window × 窗口像素：每个中心每轮
+      slic_iterations：标定时实际执行的轮数占上限的比例（提前结束时小于 1）
+    """
+
+    def __init__(self, coeffs: Dict[str, float]):
+        self.coeffs = coeffs
+
+    @staticmethod
+    def _centers(h: int, w: int, step: int) -> Tuple[int, int]:
+        n = len(range(step // 2, h, step)) * len(range(step // 2, w, step))
+        return n, min(2 * step, h) * min(2 * step, w)
+
+    def slic_s(self, h: int, w: int, step: int, iters: int) -> float:
+        c = self.coeffs
+        n, window = self._centers(h, w, step)
+        rounds = max(1.0, iters * c["slic_iterations"])
+        per_iter = n * (c["slic_iter_center"] + c["slic_iter_window"] * window)
+        return (c["lab"] + c["slic_render"]) * h * w + c["slic_seed"] * n + rounds * per_iter
+
+    def predict(self, plan: Plan, shape: Tuple[int, int], pixel_size: int, style: str) -> float:
+        c = self.coeffs
+        h, w = shape
+        if plan.mode == "grid":
+            t = c["grid"] * h * w
+        else:
+            hs, ws = max(1, h // plan.scale), max(1, w // plan.scale)
+            t = self.slic_s(hs, ws, max(2, pixel_size // plan.scale), plan.iters)
+            if plan.scale > 1:
+                t += c["resize"] * (h * w + hs * ws)
+                h, w = hs, ws  # 风格阶段在工作分辨率上执行
+        for stage in _STYLE_STAGES.get(style, ()):
+            if stage == "dither" and not plan.dithering:
+                continue
+            t += c[stage] * h * w
+        return t
+
+
+# ---------- 标定 ----------
+def _calibration_image(h: int = 240, w: int = 320) -> np.ndarray:
+    """低频色彩 + 色块 + 噪声的确定性合成图"""
+    rng = np.random.default_rng(0)
+    yy, xx = np.mgrid[0:h, 0:w].astype(np.float32)
+    img = np.stack([np.sin(xx / w * 7 + c) + np.cos(yy / h * 5 - c) for c in range(3)], axis=-1)
+    img = (img + 2) * 60
+    for _ in range(8):
+        y0, x0, r = rng.integers(0, h), rng.integers(0, w), rng.integers(10, 50)
+        img[(yy - y0) ** 2 + (xx - x0) ** 2 < r * r] = rng.integers(0, 256, 3)
+    img += rng.normal(0, 6, img.shape)
+    return np.clip(img, 0, 255).astype(np.uint8)
+
+
+def _stage_s(m, name: str) -> float:
+    return m.stages[name]["wall_s"] if name in m.stages else 0.0
+
+
+def calibrate() -> Dict[str, float]:
+    """在本机实际运行各阶段并换算为单位开销（约 1 秒）"""
+    from core import PixelArtGenerator, PixelArtConfig, Dithering
+    from metrics import Metrics
+
+    img = _calibration_image()
+    h, w = img.shape[:2]
+    px = h * w
+    coeffs: Dict[str, float] = {}
+
+    per_center = {}
+    for step in (8, 16):
+        m = Metrics()
+        PixelArtGenerator(PixelArtConfig(pixel_size=step, slic_iters=10), metrics=m).generate(img, "basic")
+        n, window = CostModel._centers(h, w, step)
+        rounds = max(1, m.counters.get("slic_iterations", 1))
+        per_center[step] = (_stage_s(m, "slic_iter") / rounds / n, window)
+        if step == 8:
+            coeffs["lab"] = _stage_s(m, "lab") / px
+            coeffs["slic_seed"] = _stage_s(m, "slic_seed") / n
+            coeffs["slic_render"] = (_stage_s(m, "slic_render") + _stage_s(m, "grid")) / px
+            coeffs["slic_iterations"] = rounds / 10
+    # 每中心每轮开销 = 固定部分 + 窗口像素 × 单价，由两种步长解出
+    (a, wa), (b, wb) = per_center[8], per_center[16]
+    k1 = max(0.0, (b - a) / (wb - wa))
+    coeffs["slic_iter_window"] = k1
+    coeffs["slic_iter_center"] = max(0.0, a - k1 * wa) if k1 > 0 else (a + b) / 2
+
+    m = Metrics()
+    gen = PixelArtGenerator(PixelArtConfig(pixel_size=8, color_count=16, align_grid=True), metrics=m)
+    gen.generate(img, "quantized")
+    gen.generate(img, "retro")
+    coeffs["grid"] = _stage_s(m, "grid") / 2 / px
+    coeffs["kmeans"] = _stage_s(m, "kmeans") / px
+    coeffs["palette_map"] = _stage_s(m, "palette_map") / px
+
+    small = img[:48, :64]
+    t0 = time.perf_counter()
+    Dithering().apply_dithering(small, "floyd_steinberg", 1)
+    coeffs["dither"] = (time.perf_counter() - t0) / (48 * 64)
+
+    t0 = time.perf_counter()
+    pil = Image.fromarray(img)
+    pil.resize((w // 2, h // 2), Image.Resampling.BOX).resize((w, h), Image.Resampling.NEAREST)
+    coeffs["resize"] = (time.perf_counter() - t0) / (px * 1.25)
+    return coeffs
+
+
+def host_fingerprint() -> str:
+    return "|".join([platform.node(), platform.machine(), platform.processor(), platform.python_version(),
+                     np.__version__, str(os.cpu_count()), f"v{CALIBRATION_VERSION}"])
+
+
+_models: Dict[Path, CostModel] = {}
+_models_lock = threading.Lock()
+
+
+def load_model(path: Optional[str] = None, recalibrate: bool = False) -> CostModel:
+    """
+    读取本机的标定结果，没有（或要求重新标定）时标定并写回缓存文件；
+    结果按文件在进程内缓存，并发的请求（generate_many 的各线程）只读取 / 标定一次
+    """
+    path = Path(path) if path else DEFAULT_CALIBRATION_PATH
+    with _models_lock:
+        if recalibrate or path not in _models:
+            _models[path] = _load_model(path, recalibrate)
+        return _models[path]
+
+
+def _load_model(path: Path, recalibrate: bool) -> CostModel:
+    host = host_fingerprint()
+    try:
+        with open(path, encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+    entry = cache.get(host)
+    if entry is None or recalibrate:
+        entry = {"coeffs": calibrate(), "calibrated_at": time.time()}
+        cache[host] = entry
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(cache, f, indent=2)
+            os.replace(tmp, path)
+        except OSError:
+            pass  # 缓存不可写时仍可使用本次标定结果
+    return CostModel(entry["coeffs"])
+
+
+# ---------- 规划 ----------
+def candidates(shape: Tuple[int, int], pixel_size: int, max_iters: int,
+               dithering: Optional[str], grid_only: bool = False) -> Iterator[Plan]:
+    """按质量从高到低列出候选方案；grid_only（配置已要求栅格对齐）时只在抖动上取舍"""
+    iters = [n for n in _ITER_CHOICES if n <= max_iters] or [max_iters]
+    for dith in ([dithering, None] if dithering else [None]):
+        if grid_only:
+            yield Plan("grid", 1, max_iters, dith)
+            continue
+        for n in iters:
+            yield Plan("slic", 1, n, dith)
+        for scale in _PYRAMID_SCALES:
+            # 像素大小须被缩小倍数整除，放大回原尺寸后格子仍为 pixel_size
+            if (pixel_size % scale == 0 and pixel_size // scale >= 2
+                    and min(shape) // scale >= pixel_size // scale):
+                for n in iters:
+                    yield Plan("pyramid", scale, n, dith)
+        yield Plan("grid", 1, max_iters, dith)
+
+
+def plannable(style: str) -> bool:
+    return style in _STYLE_STAGES
+
+
+def plan(shape: Tuple[int, int], cfg, style: str, budget_ms: float, model: CostModel) -> Plan:
+    """预算内质量最高的方案；都超出预算时取预测最快的"""
+    budget = budget_ms / 1000.0
+    dithering = cfg.dithering_method if style == "dithered" else None
+    best = None
+    for p in candidates(shape, cfg.pixel_size, cfg.slic_iters, dithering, cfg.align_grid):
+        p.predicted_s = model.predict(p, shape, cfg.pixel_size, style)
+        p.budget_s = budget
+        if p.predicted_s <= budget:
+            return p
+        if best is None or p.predicted_s < best.predicted_s:
+            best = p
+    return best
+
+
+def plan_config(cfg, p: Plan):
+    """方案对应的生成器配置（pyramid 时像素大小按缩小倍数换算，候选已保证整除）"""
+    return replace(cfg, align_grid=p.mode == "grid", slic_iters=p.iters, time_budget_ms=None,
+                   dithering_method=p.dithering,
+                   pixel_size=max(2, cfg.pixel_size // p.scale))
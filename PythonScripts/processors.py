@@ -5,7 +5,15 @@
 import io
 from PIL import Image
 import numpy as np
-from core import PixelArtGenerator, PixelArtConfig
+from core import PixelArtGenerator, PixelArtConfig, RenderHandle
+from blocks import block_pixelate
+from cartoon import cartoon
+from encoder import encode_png
+from cache import ResultCache, DEFAULT_MAX_BYTES
+
+# 缓存相关选项本身不参与缓存键
+_CACHE_OPTION_KEYS = {"cache_dir", "cache_max_bytes"}
+_caches = {}
 
 def _pil_to_rgb(pil_img: Image.Image) -> np.ndarray:
     return np.array(pil_img.convert("RGB"))
@@ -13,21 +21,67 @@ def _pil_to_rgb(pil_img: Image.Image) -> np.ndarray:
 def _rgb_to_pil(rgb: np.ndarray) -> Image.Image:
     return Image.fromarray(rgb, "RGB")
 
-def process_image_internal(image_bytes: bytes, options: dict) -> bytes:
-    img = Image.open(io.BytesIO(image_bytes))
-    rgb = _pil_to_rgb(img)
+def pixelate_average(image: Image.Image, block_size: int) -> Image.Image:
+    """区块平均像素化：每个 block_size×block_size 块取均值，输出与输入同尺寸"""
+    return _rgb_to_pil(block_pixelate(_pil_to_rgb(image), max(1, int(block_size))))
 
-    cfg = PixelArtConfig(
+def cartoon_effect(image: Image.Image, edge_weight: float = 0.3) -> Image.Image:
+    """卡通效果：Scharr 边缘压暗 + 色阶分离（见 cartoon.cartoon）"""
+    return _rgb_to_pil(cartoon(_pil_to_rgb(image), edge_weight))
+
+def _options_to_config(options: dict) -> PixelArtConfig:
+    return PixelArtConfig(
         pixel_size=options["block_size"],
         color_count=options["max_colors"],
         dithering_method="floyd_steinberg" if options.get("enable_dither") else None,
         dithering_strength=options.get("dither_strength", 0.1),
+        cartoon_edge_weight=options.get("cartoon_edge_weight", 0.3) if options.get("enable_cartoon") else None,
     )
+
+def _get_cache(options: dict):
+    cache_dir = options.get("cache_dir")
+    if not cache_dir:
+        return None
+    if cache_dir not in _caches:
+        _caches[cache_dir] = ResultCache(cache_dir, options.get("cache_max_bytes", DEFAULT_MAX_BYTES))
+    return _caches[cache_dir]
+
+def process_image_internal(image_bytes: bytes, options: dict) -> bytes:
+    cache = _get_cache(options)
+    if cache is None:
+        return _process_uncached(image_bytes, options)
+    cfg = _options_to_config(options)
+    key = cache.make_key(image_bytes, cfg, {k: v for k, v in options.items() if k not in _CACHE_OPTION_KEYS})
+    payload = cache.get(key)
+    if payload is None:
+        payload = _process_uncached(image_bytes, options)
+        cache.put(key, payload)
+    return payload
+
+_STYLE_MAP = {"basic": "basic", "average": "average", "median": "median", "slic": "basic"}
+
+def _process_uncached(image_bytes: bytes, options: dict) -> bytes:
+    img = Image.open(io.BytesIO(image_bytes))
+    rgb = _pil_to_rgb(img)
+
+    cfg = _options_to_config(options)
     gen = PixelArtGenerator(cfg)
-    style_map = {"basic": "basic", "average": "quantized", "median": "quantized", "slic": "basic"}
-    out_rgb = gen.generate(rgb, style=style_map.get(options.get("algorithm", "basic"), "basic"))
+    out = gen.generate_indexed(rgb, style=_STYLE_MAP.get(options.get("algorithm", "basic"), "basic"))
+
+    return encode_png(out, options.get("png_compression", "default"))
+
+def render_handle_internal(image_bytes: bytes, options: dict):
+    """同 process_image_internal（不走缓存），另外返回可供 repalette_internal 换调色板的渲染句柄"""
+    rgb = _pil_to_rgb(Image.open(io.BytesIO(image_bytes)))
+    gen = PixelArtGenerator(_options_to_config(options))
+    handle = gen.render(rgb, style=_STYLE_MAP.get(options.get("algorithm", "basic"), "basic"))
+    compression = options.get("png_compression", "default")
+    if handle.swap is not handle.base:
+        handle.encode(handle.swap, compression)  # 在渲染进程里预先编码 swap，换调色板时只替换 PLTE
+    return handle.encode(handle.base, compression), handle
 
-    out_pil = _rgb_to_pil(out_rgb)
-    buf = io.BytesIO()
-    out_pil.save(buf, format="PNG", optimize=True)
-    return buf.getvalue()
\ No newline at end of file
+def repalette_internal(handle: RenderHandle, palette_name: str, options: dict) -> bytes:
+    """把缓存的渲染句柄换到预设调色板并编码为 PNG（只换调色板时不重新压缩像素数据）"""
+    gen = PixelArtGenerator(_options_to_config(options))
+    out = gen.repalette(handle, palette_name, dither=bool(options.get("dither", False)))
+    return handle.encode(out, options.get("png_compression", "default"))
\ No newline at end of file
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+进度 / 遥测通道
+输出目标（可同时启用）：
+  - 旧版 --progress-file：整文件重写 JSON（兼容 GUI 轮询）
+  - --progress-jsonl：stderr 上逐行 JSON
+  - --progress-mmap：固定 256 字节内存映射状态记录（seqlock，见 MMAP_RECORD）
+各阶段按 (stage, done, total) 回调上报，非强制更新按 min_interval 限流
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+from typing import Dict, Optional, Tuple
+
+# seq(u64) timestamp(f64) progress(f32) mpx_per_s(f32) eta_s(f32) iteration(u32) iterations(u32)
+# stage(32s, UTF-8) message(96s, UTF-8)；写入前后 seq 各加一，奇数表示正在写
+MMAP_RECORD = struct.Struct("<Qdfffii32s96s")
+MMAP_SIZE = 256
+
+
+class _FileSink:
+    def __init__(self, path: str):
+        self.path = path
+
+    def write(self, rec: dict):
+        try:
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump({"progress": int(rec["progress"]), "message": rec["message"],
+                           "timestamp": rec["timestamp"]}, f)
+        except Exception:
+            pass
+
+    def close(self):
+        pass
+
+
+class _JsonLinesSink:
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, rec: dict):
+        try:
+            self.stream.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            self.stream.flush()
+        except Exception:
+            pass
+
+    def close(self):
+        pass
+
+
+class _MmapSink:
+    def __init__(self, path: str):
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            os.ftruncate(fd, MMAP_SIZE)
+            self.mm = mmap.mmap(fd, MMAP_SIZE)
+        finally:
+            os.close(fd)
+        self.seq = 0
+
+    def write(self, rec: dict):
+        def enc(s: str, n: int) -> bytes:
+            # 截断时丢弃不完整的多字节字符
+            return s.encode("utf-8")[:n].decode("utf-8", "ignore").encode("utf-8")
+
+        self.seq += 1
+        self.mm[0:8] = struct.pack("<Q", self.seq)
+        body = MMAP_RECORD.pack(
+            0, rec["timestamp"], rec["progress"], rec.get("mpx_per_s") or 0.0,
+            rec.get("eta_s") if rec.get("eta_s") is not None else -1.0,
+            rec.get("iteration") or 0, rec.get("iterations") or 0,
+            enc(rec["stage"], 32), enc(rec["message"], 96))
+        self.mm[8:MMAP_RECORD.size] = body[8:]
+        self.seq += 1
+        self.mm[0:8] = struct.pack("<Q", self.seq)
+
+    def close(self):
+        self.mm.close()
+
+
+class ProgressReporter:
+    def __init__(self, progress_file: Optional[str] = None, jsonl: bool = False,
+                 mmap_path: Optional[str] = None, min_interval: float = 0.1, stream=None):
+        self.sinks = []
+        if progress_file:
+            self.sinks.append(_FileSink(progress_file))
+        if jsonl:
+            self.sinks.append(_JsonLinesSink(stream or sys.stderr))
+        if mmap_path:
+            self.sinks.append(_MmapSink(mmap_path))
+        self.enabled = bool(self.sinks)
+        self.min_interval = min_interval
+        self.pixels = 0
+        self.spans: Dict[str, Tuple[float, float]] = {}
+        self.percent = 0.0
+        self._t0 = time.perf_counter()
+        self._last_emit = 0.0
+        self._last_event = self._t0
+        self._stage = ""
+        self._stage_t0 = self._t0
+
+    def set_spans(self, spans: Dict[str, Tuple[float, float]], pixels: int = 0):
+        """声明各阶段在总进度中所占区间，以及吞吐量计算用的像素数"""
+        self.spans.update(spans)
+        if pixels:
+            self.pixels = pixels
+
+    def report(self, percent: float, message: str, stage: Optional[str] = None):
+        """强制更新（阶段边界）"""
+        if not self.enabled:
+            return
+        self.percent = percent
+        self._last_event = time.perf_counter()
+        if stage is not None and stage != self._stage:
+            self._stage, self._stage_t0 = stage, self._last_event
+        self._emit(message)
+
+    def __call__(self, stage: str, done: int, total: int):
+        """阶段内细粒度更新，供核心算法回调；限流，禁用时仅一次属性判断"""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        new_stage = stage != self._stage
+        if new_stage:
+            # 回调在阶段内工作完成后才到达，阶段起点取上一次事件时间
+            self._stage, self._stage_t0 = stage, self._last_event
+        self._last_event = now
+        if not new_stage and done < total and now - self._last_emit < self.min_interval:
+            return
+        lo, hi = self.spans.get(stage, (self.percent, self.percent))
+        frac = done / total if total else 1.0
+        self.percent = lo + (hi - lo) * frac
+        mpx = None
+        elapsed_stage = now - self._stage_t0
+        if self.pixels and elapsed_stage > 0 and frac > 0:
+            mpx = self.pixels * frac / elapsed_stage / 1e6
+        self._emit(f"{stage} {done}/{total}", iteration=done, iterations=total, mpx_per_s=mpx)
+
+    def _emit(self, message: str, iteration: Optional[int] = None, iterations: Optional[int] = None,
+              mpx_per_s: Optional[float] = None):
+        now = time.perf_counter()
+        self._last_emit = now
+        elapsed = now - self._t0
+        eta = elapsed * (100.0 - self.percent) / self.percent if self.percent > 0 else None
+        rec = {
+            "stage": self._stage,
+            "progress": round(self.percent, 1),
+            "message": message,
+            "iteration": iteration,
+            "iterations": iterations,
+            "mpx_per_s": round(mpx_per_s, 3) if mpx_per_s is not None else None,
+            "elapsed_s": round(elapsed, 3),
+            "eta_s": round(eta, 3) if eta is not None else None,
+            "timestamp": time.time(),
+        }
+        for sink in self.sinks:
+            sink.write(rec)
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
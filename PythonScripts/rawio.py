@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+原始像素帧格式（管道模式 --pipe-format raw）
+帧 = 20 字节头 <magic, width, height, channels, stride> + height*stride 字节像素
+channels=3 为 RGB，channels=4 为 BGRA（与 WPF Bgra32 一致）
+"""
+import struct
+from typing import BinaryIO, Tuple
+
+import numpy as np
+
+RAW_MAGIC = b"NPXR"
+RAW_HEADER = struct.Struct("<4sIIII")
+
+
+def parse_raw_header(header: bytes) -> Tuple[int, int, int, int]:
+    if len(header) != RAW_HEADER.size:
+        raise ValueError("原始帧头不完整")
+    magic, width, height, channels, stride = RAW_HEADER.unpack(header)
+    if magic != RAW_MAGIC:
+        raise ValueError(f"原始帧标识错误: {magic!r}")
+    if channels not in (3, 4):
+        raise ValueError(f"不支持的通道数: {channels}")
+    if width == 0 or height == 0 or stride < width * channels:
+        raise ValueError(f"原始帧尺寸非法: {width}x{height}x{channels}, stride={stride}")
+    return width, height, channels, stride
+
+
+def _readinto_exact(stream: BinaryIO, buf: np.ndarray):
+    view = memoryview(buf).cast("B")
+    n = 0
+    while n < len(view):
+        r = stream.readinto(view[n:])
+        if not r:
+            raise ValueError(f"原始帧数据不完整: {n}/{len(view)} 字节")
+        n += r
+
+
+def rows_to_rgb(rows: np.ndarray, width: int, channels: int) -> np.ndarray:
+    """按 stride 排列的行 → h×w×3 RGB；RGB 输入为零拷贝视图"""
+    h = rows.shape[0]
+    pix = rows[:, :width * channels].reshape(h, width, channels)
+    if channels == 3:
+        return pix
+    rgb = pix[..., 2::-1]
+    alpha = pix[..., 3]
+    if alpha.min() == 255:
+        return rgb
+    # 与 PNG 输入一致：透明区域合成到白底
+    a = alpha[..., None].astype(np.float32) / 255.0
+    return (rgb * a + 255.0 * (1.0 - a) + 0.5).astype(np.uint8)
+
+
+def read_raw_frame(stream: BinaryIO) -> Tuple[np.ndarray, int]:
+    """从流中读取一帧，像素直接 readinto 到 NumPy 缓冲区；返回 (RGB, 输入通道数)"""
+    width, height, channels, stride = parse_raw_header(stream.read(RAW_HEADER.size))
+    buf = np.empty((height, stride), dtype=np.uint8)
+    _readinto_exact(stream, buf)
+    return rows_to_rgb(buf, width, channels), channels
+
+
+def raw_frame_from_bytes(data: bytes) -> Tuple[np.ndarray, int]:
+    """从内存中的帧解析（零拷贝，结果只读）"""
+    width, height, channels, stride = parse_raw_header(data[:RAW_HEADER.size])
+    rows = np.frombuffer(data, dtype=np.uint8, count=height * stride, offset=RAW_HEADER.size)
+    return rows_to_rgb(rows.reshape(height, stride), width, channels), channels
+
+
+def rgb_to_frame_pixels(rgb: np.ndarray, channels: int = 3) -> np.ndarray:
+    """h×w×3 RGB → 连续的帧像素（channels=4 时为不透明 BGRA）"""
+    if channels == 3:
+        return np.ascontiguousarray(rgb, dtype=np.uint8)
+    h, w = rgb.shape[:2]
+    out = np.empty((h, w, 4), dtype=np.uint8)
+    out[..., :3] = rgb[..., ::-1]
+    out[..., 3] = 255
+    return out
+
+
+def raw_header(width: int, height: int, channels: int) -> bytes:
+    return RAW_HEADER.pack(RAW_MAGIC, width, height, channels, width * channels)
+
+
+def write_raw_frame(stream: BinaryIO, rgb: np.ndarray, channels: int = 3):
+    pixels = rgb_to_frame_pixels(rgb, channels)
+    stream.write(raw_header(rgb.shape[1], rgb.shape[0], channels))
+    stream.write(memoryview(pixels).cast("B"))
+
+
+def encode_raw_frame(rgb: np.ndarray, channels: int = 3) -> bytes:
+    pixels = rgb_to_frame_pixels(rgb, channels)
+    return raw_header(rgb.shape[1], rgb.shape[0], channels) + pixels.tobytes()
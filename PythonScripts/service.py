@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地渲染服务（sidecar）：asyncio HTTP/1.1，监听 localhost 端口或 Unix 套接字，完全离线
+  POST /render?block_size=16&max_colors=32&...  请求体为图片字节，返回 PNG（选项同 processors.process_image_internal）；
+                                                  加 keep=true 时保留渲染结果，响应头 X-Render-Handle 为句柄
+  POST /repalette?handle=...&palette=nes[&dither=true]
+                                                  把保留的渲染结果换到预设调色板，返回 PNG（不排队，不重跑管线）
+  GET  /stats                                     队列深度、执行中任务数、计数器与延迟直方图（JSON）
+调度：
+  - 有界队列：队列满时立即返回 503 + Retry-After，不在内存中无限堆积
+  - 每客户端并发上限（X-Client-Id 头，缺省为对端地址）：超出返回 429
+  - 分发协程数等于工作进程数，任务只在有空闲进程时才交给进程池，排队中的任务可以廉价取消
+  - 客户端断开时取消其任务：排队中的直接丢弃；已在执行的无法中断，结果被丢弃
+保留的渲染句柄按最近使用淘汰（max_handles 个）。每个连接只处理一个请求（Connection: close）
+"""
+import argparse
+import asyncio
+import bisect
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+import processors
+
+DEFAULT_OPTIONS = {"block_size": 16, "max_colors": 32}
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+MAX_BODY_BYTES = 256 * 1024 * 1024
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 413: "Payload Too Large",
+            422: "Unprocessable Entity", 429: "Too Many Requests", 503: "Service Unavailable"}
+
+
+# ---------- 统计 ----------
+class LatencyHistogram:
+    """固定桶（毫秒）的累计直方图；最后一个计数为超过最大桶的部分"""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0
+        self.sum_ms = 0.0
+
+    def add(self, ms: float):
+        self.counts[bisect.bisect_left(self.buckets, ms)] += 1
+        self.total += 1
+        self.sum_ms += ms
+
+    def to_dict(self) -> dict:
+        return {"buckets_ms": list(self.buckets), "counts": list(self.counts), "count": self.total,
+                "mean_ms": round(self.sum_ms / self.total, 2) if self.total else 0.0}
+
+
+def _parse_options(query: str) -> dict:
+    """查询参数转为选项：true/false 为布尔，能解析为数字的转数字"""
+    options = dict(DEFAULT_OPTIONS)
+    for k, v in parse_qsl(query, keep_blank_values=True):
+        if v.lower() in ("true", "false"):
+            options[k] = v.lower() == "true"
+            continue
+        for cast in (int, float):
+            try:
+                options[k] = cast(v)
+                break
+            except ValueError:
+                continue
+        else:
+            options[k] = v
+    return options
+
+
+class _Job:
+    __slots__ = ("fn", "data", "options", "client", "future", "cancelled", "queued_at")
+
+    def __init__(self, fn: Callable, data: bytes, options: dict, client: str):
+        self.fn = fn
+        self.data = data
+        self.options = options
+        self.client = client
+        self.future = asyncio.get_running_loop().create_future()
+        self.cancelled = False
+        self.queued_at = time.perf_counter()
+
+
+def _init_worker():
+    """进程池初始化：限制内部线程数，进程数已与核数对应"""
+    from threadpoolctl import threadpool_limits
+    threadpool_limits(1)
+
+
+def _ready() -> int:
+    return os.getpid()
+
+
+# ---------- 服务 ----------
+class RenderService:
+    """
+    workers 个分发协程 + 有界队列；render、render_handle、repalette 与 executor 可替换
+    （测试中用线程池与可控的渲染函数）。
+    用法：await service.start(port=0) / start(unix_path=...)，结束时 await service.close()
+    """
+
+    def __init__(self, workers: Optional[int] = None, queue_size: int = 16, per_client: int = 4,
+                 render: Callable[[bytes, dict], bytes] = processors.process_image_internal,
+                 executor: Optional[Executor] = None, max_handles: int = 8,
+                 render_handle: Callable[[bytes, dict], tuple] = processors.render_handle_internal,
+                 repalette: Callable = processors.repalette_internal):
+        if queue_size < 1 or per_client < 1:
+            raise ValueError("队列长度与每客户端并发数必须大于0")
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.queue_size = queue_size
+        self.per_client = per_client
+        self.render = render
+        self.render_handle = render_handle
+        self.repalette = repalette
+        self.max_handles = max(0, max_handles)
+        self.handles: "OrderedDict[str, Tuple[object, dict]]" = OrderedDict()
+        self._own_executor = executor is None
+        self.executor = executor
+        self.queue: Optional[asyncio.Queue] = None
+        self.server: Optional[asyncio.AbstractServer] = None
+        self._dispatchers: List[asyncio.Task] = []
+        self.clients: Dict[str, int] = {}
+        self.in_flight = 0
+        self.counters = {"accepted": 0, "completed": 0, "failed": 0, "rejected_queue": 0,
+                         "rejected_client": 0, "cancelled": 0, "repalettes": 0}
+        self.queue_latency = LatencyHistogram()
+        self.render_latency = LatencyHistogram()
+        self.total_latency = LatencyHistogram()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0, unix_path: Optional[str] = None):
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+            # 在开始监听之前拉起全部工作进程：fork 出的子进程不会继承客户端连接，
+            # 否则父进程关闭的连接在子进程中仍然打开，客户端收不到 EOF
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(*(loop.run_in_executor(self.executor, _ready) for _ in range(self.workers)))
+        self.queue = asyncio.Queue(self.queue_size)
+        self._dispatchers = [asyncio.create_task(self._dispatch()) for _ in range(self.workers)]
+        if unix_path:
+            self.server = await asyncio.start_unix_server(self._handle, path=unix_path)
+        else:
+            self.server = await asyncio.start_server(self._handle, host, port)
+        return self
+
+    @property
+    def address(self):
+        return self.server.sockets[0].getsockname()
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        for task in self._dispatchers:
+            task.cancel()
+        await asyncio.gather(*self._dispatchers, return_exceptions=True)
+        if self._own_executor and self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.queue.qsize() if self.queue else 0,
+            "queue_capacity": self.queue_size,
+            "in_flight": self.in_flight,
+            "workers": self.workers,
+            "per_client_limit": self.per_client,
+            "clients": dict(self.clients),
+            "handles": len(self.handles),
+            "handle_capacity": self.max_handles,
+            **self.counters,
+            "latency": {"queue": self.queue_latency.to_dict(), "render": self.render_latency.to_dict(),
+                        "total": self.total_latency.to_dict()},
+        }
+
+    # ---------- 调度 ----------
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self.queue.get()
+            if job.cancelled:
+                continue
+            started = time.perf_counter()
+            self.queue_latency.add((started - job.queued_at) * 1000)
+            self.in_flight += 1
+            try:
+                result = await loop.run_in_executor(self.executor, job.fn, job.data, job.options)
+            except Exception as e:
+                if not job.cancelled:  # 执行中被取消的任务只计入 cancelled
+                    self.counters["failed"] += 1
+                if not job.future.done():
+                    job.future.set_exception(e)
+            else:
+                if not job.cancelled:
+                    self.counters["completed"] += 1
+                if not job.future.done():
+                    job.future.set_result(result)
+            finally:
+                self.in_flight -= 1
+                done = time.perf_counter()
+                self.render_latency.add((done - started) * 1000)
+                self.total_latency.add((done - job.queued_at) * 1000)
+
+    # ---------- HTTP ----------
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            status, body, ctype, extra = await self._serve(reader, writer)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            status = None
+        except ValueError as e:
+            status, body, ctype, extra = 400, str(e).encode(), "text/plain; charset=utf-8", {}
+        if status is not None:
+            head = [f"HTTP/1.1 {status} {_REASONS.get(status, '')}", f"Content-Type: {ctype}",
+                    f"Content-Length: {len(body)}", "Connection: close"]
+            head += [f"{k}: {v}" for k, v in extra.items()]
+            try:
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + body)
+                await writer.drain()
+            except ConnectionError:
+                pass
+        writer.close()
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        line = await reader.readuntil(b"\r\n")
+        try:
+            method, target, _ = line.decode("latin-1").split(" ", 2)
+        except ValueError:
+            raise ValueError("请求行格式错误")
+        headers = {}
+        while True:
+            h = await reader.readuntil(b"\r\n")
+            if h == b"\r\n":
+                break
+            k, _, v = h.decode("latin-1").partition(":")
+            headers[k.strip().lower()] = v.strip()
+        url = urlsplit(target)
+        if method == "GET" and url.path == "/stats":
+            return 200, json.dumps(self.stats()).encode(), "application/json", {}
+        if method == "POST" and url.path == "/repalette":
+            return await self._repalette(url.query)
+        if method != "POST" or url.path != "/render":
+            return 404, b"not found", "text/plain", {}
+        length = int(headers.get("content-length", "0"))
+        if length > MAX_BODY_BYTES:
+            return 413, b"payload too large", "text/plain", {}
+        data = await reader.readexactly(length)
+        peer = writer.get_extra_info("peername")
+        client = headers.get("x-client-id") or (str(peer[0]) if isinstance(peer, tuple) else "local")
+        return await self._render(reader, _parse_options(url.query), data, client)
+
+    async def _render(self, reader: asyncio.StreamReader, options: dict, data: bytes, client: str):
+        if self.clients.get(client, 0) >= self.per_client:
+            self.counters["rejected_client"] += 1
+            return 429, b"too many concurrent jobs for client", "text/plain", {"Retry-After": "1"}
+        keep = options.pop("keep", False) is True and self.max_handles > 0
+        job = _Job(self.render_handle if keep else self.render, data, options, client)
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.counters["rejected_queue"] += 1
+            return 503, b"queue full", "text/plain", {"Retry-After": "1"}
+        self.counters["accepted"] += 1
+        self.clients[client] = self.clients.get(client, 0) + 1
+        # 请求体已读完，连接上再读到 EOF 即客户端断开；之后多余的字节（结尾换行、流水线请求）丢弃，继续等待
+        disconnect = asyncio.ensure_future(reader.read(65536))
+        try:
+            while True:
+                await asyncio.wait({job.future, disconnect}, return_when=asyncio.FIRST_COMPLETED)
+                if job.future.done() or disconnect.exception() is not None or not disconnect.result():
+                    break
+                disconnect = asyncio.ensure_future(reader.read(65536))
+            if not job.future.done():
+                job.cancelled = True
+                self.counters["cancelled"] += 1
+                job.future.cancel()
+                return None, b"", "", {}
+            try:
+                result = job.future.result()
+            except Exception as e:
+                return 422, str(e).encode(), "text/plain; charset=utf-8", {}
+            if not keep:
+                return 200, result, "image/png", {}
+            png, handle = result
+            return 200, png, "image/png", {"X-Render-Handle": self._keep(handle, options)}
+        finally:
+            disconnect.cancel()
+            self.clients[client] -= 1
+            if not self.clients[client]:
+                del self.clients[client]
+
+    # ---------- 换调色板 ----------
+    def _keep(self, handle, options: dict) -> str:
+        key = uuid.uuid4().hex
+        self.handles[key] = (handle, options)
+        while len(self.handles) > self.max_handles:
+            self.handles.popitem(last=False)
+        return key
+
+    async def _repalette(self, query: str):
+        # 句柄与调色板名按原样取值，不做数字转换
+        params = dict(parse_qsl(query))
+        key = params.get("handle", "")
+        if key not in self.handles:
+            return 404, b"unknown render handle", "text/plain", {}
+        self.handles.move_to_end(key)
+        handle, options = self.handles[key]
+        options = dict(options, dither=params.get("dither", "").lower() == "true")
+        # 只作用于调色板（抖动时为格子），在事件循环的线程池中执行，不占渲染队列
+        loop = asyncio.get_running_loop()
+        png = await loop.run_in_executor(None, self.repalette, handle, params.get("palette", "original"), options)
+        self.counters["repalettes"] += 1
+        return 200, png, "image/png", {}
+
+
+# ---------- CLI ----------
+def main():
+    parser = argparse.ArgumentParser(description="像素画本地渲染服务")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址（默认仅本机）")
+    parser.add_argument("--port", type=int, default=8765, help="监听端口")
+    parser.add_argument("--unix-socket", help="改为监听 Unix 套接字路径")
+    parser.add_argument("--workers", type=int, help="工作进程数（默认 CPU 核数）")
+    parser.add_argument("--queue-size", type=int, default=16, help="等待队列长度，满时返回 503")
+    parser.add_argument("--per-client", type=int, default=4, help="每客户端最大并发任务数，超出返回 429")
+    parser.add_argument("--max-handles", type=int, default=8, help="保留的渲染句柄数（keep=true），按最近使用淘汰")
+    args = parser.parse_args()
+
+    async def serve():
+        service = await RenderService(args.workers, args.queue_size, args.per_client,
+                                      max_handles=args.max_handles).start(
+            args.host, args.port, args.unix_socket)
+        print(f"LISTENING:{args.unix_socket or '%s:%d' % service.address[:2]}", flush=True)
+        try:
+            await service.server.serve_forever()
+        finally:
+            await service.close()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
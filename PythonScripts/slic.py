@@ -4,12 +4,15 @@
 SLIC 超像素分割 - 纯 Python 实现
 保留原类接口，供 .NET GUI 直接实例化
 """
+from typing import Optional
+
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 from core import rgb_to_lab_numba as rgb_to_lab   # 使用纯 Python LAB
 
 
 def slic_superpixel_rgb(image_bgr: np.ndarray, step: int = 10, iters: int = 5, weight: float = 10.0) -> np.ndarray:
-    """纯 Python SLIC，输入 BGR，输出 BGR"""
+    """纯 Python SLIC，输入 BGR，输出 BGR（逐像素参考实现，作为 slic_superpixel_fast 的测试基准）"""
     h, w = image_bgr.shape[:2]
     lab = rgb_to_lab(image_bgr)
     centers = []
@@ -75,14 +78,280 @@ def slic_superpixel_rgb(image_bgr: np.ndarray, step: int = 10, iters: int = 5, w
     return out
 
 
+# ---------- 向量化实现 ----------
+_BATCH_PIXELS = 1 << 21  # 每批中心的窗口像素总数上限，限制临时内存
+
+
+def _gradient(lab: np.ndarray) -> np.ndarray:
+    """种子选取用的梯度图；与参考实现相同（含 ni-1 = -1 时的回绕），末行末列不可选"""
+    h, w = lab.shape[:2]
+    up, down = np.roll(lab, 1, axis=0), np.roll(lab, -1, axis=0)
+    left, right = np.roll(lab, 1, axis=1), np.roll(lab, -1, axis=1)
+    grad = np.abs(down - up).sum(axis=2) + np.abs(right - left).sum(axis=2)
+    grad[h - 1:, :] = np.inf  # 需要 ni + 1 < h、nj + 1 < w
+    grad[:, w - 1:] = np.inf
+    return grad
+
+
+def _seed_centers(lab: np.ndarray, step: int, grad: Optional[np.ndarray] = None) -> np.ndarray:
+    """种子点：网格点 3×3 邻域内梯度最小处"""
+    h, w = lab.shape[:2]
+    if grad is None:
+        grad = _gradient(lab)
+    gi, gj = np.meshgrid(np.arange(step // 2, h, step), np.arange(step // 2, w, step), indexing="ij")
+    gi, gj = gi.ravel(), gj.ravel()
+    offsets = [(di, dj) for di in (-1, 0, 1) for dj in (-1, 0, 1)]
+    cand = np.full((len(offsets), len(gi)), np.inf)
+    for n, (di, dj) in enumerate(offsets):
+        ni, nj = gi + di, gj + dj
+        ok = (ni >= 0) & (nj >= 0) & (ni < h) & (nj < w)
+        cand[n, ok] = grad[ni[ok], nj[ok]]
+    best = cand.argmin(axis=0)  # 并列时取第一个，与严格小于的顺序扫描一致
+    best[~np.isfinite(cand.min(axis=0))] = 4  # 邻域全无效时保持网格点本身
+    di = np.array([o[0] for o in offsets])[best]
+    dj = np.array([o[1] for o in offsets])[best]
+    return np.stack([gi + di, gj + dj], axis=1)
+
+
+def _radius(step: int, stride: int) -> int:
+    """窗口半径（格点数）：格点窗口 [li - r, li + r) 需覆盖像素区间 [c - step, c + step)，li = c // stride"""
+    return step if stride == 1 else -(-step // stride) + 1
+
+
+def _assign(lab_s: np.ndarray, cx: np.ndarray, cy: np.ndarray, cl: np.ndarray, step: int, weight: float,
+            stride: int, labels_p: np.ndarray, dists_p: np.ndarray):
+    """
+    分配步：lab_s 为按 stride 取样的格点（stride=1 即全分辨率），labels_p / dists_p 为四周各填充 r 的格点数组。
+    窗口与空间距离都按全分辨率坐标计算：格点 (i, j) 对应像素 (i·stride, j·stride)，
+    只取落在 [c - step, c + step) 内的格点
+    """
+    r = _radius(step, stride)
+    r2 = 2 * r
+    pad = ((r, r), (r, r))
+    lab_p = np.stack([np.pad(lab_s[..., c], pad, constant_values=np.nan) for c in range(3)])
+    windows = sliding_window_view(lab_p, (r2, r2), axis=(1, 2))  # 3×H'×W'×2r×2r
+    off = np.arange(-r, r) * stride
+    if stride == 1:
+        # 空间项只与窗口内偏移有关，整表复用
+        spatial = (np.sqrt((off ** 2)[:, None] + (off ** 2)[None, :]) / step) ** 2
+    li, lj = cx // stride, cy // stride
+    batch = max(1, _BATCH_PIXELS // (r2 * r2))
+
+    for b0 in range(0, len(cx), batch):
+        bx, by = li[b0:b0 + batch], lj[b0:b0 + batch]
+        win = windows[:, bx, by]  # 3×B×2r×2r（填充后窗口左上角即 (li, lj)）
+        d0 = win[0] - cl[b0:b0 + batch, 0, None, None]
+        d1 = win[1] - cl[b0:b0 + batch, 1, None, None]
+        d2 = win[2] - cl[b0:b0 + batch, 2, None, None]
+        dc = np.sqrt(d0 * d0 + d1 * d1 + d2 * d2)
+        dc /= weight
+        d = dc * dc
+        if stride == 1:
+            d += spatial
+        else:
+            dx = off[None, :] + (bx * stride - cx[b0:b0 + batch])[:, None]  # 格点到中心的像素偏移
+            dy = off[None, :] + (by * stride - cy[b0:b0 + batch])[:, None]
+            sp = (np.sqrt((dx ** 2)[:, :, None] + (dy ** 2)[:, None, :]) / step) ** 2
+            sp[((dx < -step) | (dx >= step))[:, :, None] | ((dy < -step) | (dy >= step))[:, None, :]] = np.inf
+            d += sp
+        # 重叠窗口之间有先后依赖（严格小于 + float32 存储），按中心顺序逐个写回
+        for i, (x, y) in enumerate(zip(bx.tolist(), by.tolist())):
+            dwin = dists_p[x:x + r2, y:y + r2]
+            better = d[i] < dwin
+            np.copyto(dwin, d[i], where=better, casting="same_kind")
+            np.copyto(labels_p[x:x + r2, y:y + r2], b0 + i, where=better)
+
+
+def _update(lab_s: np.ndarray, labels: np.ndarray, stride: int, n: int):
+    """更新步：按格点标签求各中心的颜色与像素坐标均值；空簇归零"""
+    flat = labels.ravel()
+    valid = flat >= 0
+    idx = flat[valid]
+    count = np.bincount(idx, minlength=n)
+    xs, ys = np.divmod(np.flatnonzero(valid), labels.shape[1])
+    sx = np.bincount(idx, weights=xs * stride, minlength=n)
+    sy = np.bincount(idx, weights=ys * stride, minlength=n)
+    sums = [np.bincount(idx, weights=lab_s[..., c].ravel()[valid], minlength=n) for c in range(3)]
+    has = count > 0
+    safe = np.maximum(count, 1)
+    cl = np.where(has[:, None], np.stack(sums, axis=1) / safe[:, None], 0.0)
+    cx = np.where(has, np.trunc(sx / safe), 0).astype(np.int64)
+    cy = np.where(has, np.trunc(sy / safe), 0).astype(np.int64)
+    return cx, cy, cl
+
+
+class _SlicState:
+    """
+    可续算的迭代状态：格点上四周各填充 r 的标签 / 距离数组、中心与已完成轮数。
+    exact 表示状态只由冷启动后连续迭代得到，继续迭代与一次性迭代更多轮的结果逐像素一致
+    """
+
+    def __init__(self, lab_s: np.ndarray, stride: int, step: int, weight: float, cx, cy, cl):
+        self.lab_s, self.stride, self.step, self.weight = lab_s, stride, step, weight
+        self.r = _radius(step, stride)
+        hs, ws = lab_s.shape[:2]
+        self.labels_p = np.full((hs + 2 * self.r, ws + 2 * self.r), -1, dtype=np.int32)
+        self.dists_p = np.full((hs + 2 * self.r, ws + 2 * self.r), np.inf, dtype=np.float32)
+        self.cx, self.cy, self.cl = cx, cy, cl
+        self.rounds = 0
+        self.still = False  # 中心完全不变：再迭代结果也不变
+        self.exact = True
+
+    @property
+    def labels(self) -> np.ndarray:
+        r = self.r
+        return self.labels_p[r:self.labels_p.shape[0] - r, r:self.labels_p.shape[1] - r]
+
+    def adopt(self, labels: np.ndarray):
+        """热启动：沿用已有标签图，按当前中心与 weight 重建各格点到所属中心的距离（而不是从 inf 开始）"""
+        r, lab_s = self.r, self.lab_s
+        self.labels[...] = labels
+        valid = labels >= 0
+        k = labels[valid]
+        xs, ys = np.nonzero(valid)
+        dc2 = sum((lab_s[..., c][valid] - self.cl[k, c]) ** 2 for c in range(3))
+        ds2 = (xs * self.stride - self.cx[k]) ** 2 + (ys * self.stride - self.cy[k]) ** 2
+        d = self.dists_p[r:self.dists_p.shape[0] - r, r:self.dists_p.shape[1] - r]
+        d[valid] = (np.sqrt(dc2) / self.weight) ** 2 + (np.sqrt(ds2) / self.step) ** 2
+        self.exact = False
+
+    def run(self, rounds: int, tol: float = 0.0) -> int:
+        """
+        交替执行分配 / 更新最多 rounds 轮，返回实际轮数。
+        中心完全不变时直接结束；tol > 0 时移动了的中心占比不超过 tol 即结束（之后不再 exact）
+        """
+        done = 0
+        while done < rounds and not self.still:
+            _assign(self.lab_s, self.cx, self.cy, self.cl, self.step, self.weight, self.stride,
+                    self.labels_p, self.dists_p)
+            cx, cy, cl = _update(self.lab_s, self.labels, self.stride, len(self.cx))
+            done += 1
+            moved = np.count_nonzero((cx != self.cx) | (cy != self.cy))
+            self.still = moved == 0 and np.array_equal(cl, self.cl)
+            self.cx, self.cy, self.cl = cx, cy, cl
+            if tol > 0 and moved <= tol * len(cx) and not self.still:
+                self.exact = False
+                break
+        self.rounds += done
+        return done
+
+
+def _render(image_bgr: np.ndarray, lab: np.ndarray, state: _SlicState):
+    """由迭代状态得到全分辨率标签并渲染，返回 (BGR 输出, 标签)；stride > 1 时先做一次全分辨率分配"""
+    h, w = image_bgr.shape[:2]
+    cx, cy, step = state.cx, state.cy, state.step
+    if state.stride == 1:
+        labels = state.labels
+    else:
+        labels_p = np.full((h + 2 * step, w + 2 * step), -1, dtype=np.int32)
+        dists_p = np.full((h + 2 * step, w + 2 * step), np.inf, dtype=np.float32)
+        _assign(lab, cx, cy, state.cl, step, state.weight, 1, labels_p, dists_p)
+        labels = labels_p[step:step + h, step:step + w]
+
+    out = image_bgr.copy()
+    mask = labels >= 0
+    k = labels[mask]
+    out[mask] = image_bgr[cx[k], cy[k]]
+    return out, labels
+
+
+def slic_superpixel_fast(image_bgr: np.ndarray, step: int = 10, iters: int = 5, weight: float = 10.0,
+                         stride: int = 1) -> np.ndarray:
+    """
+    向量化 SLIC。stride=1 时与 slic_superpixel_rgb 输出逐像素一致：
+    距离按中心分批整体计算（每个中心一个 2step×2step 窗口），中心更新与最终渲染用 bincount / 花式索引；
+    保留参考实现的语义：距离跨迭代保留（float32）、按中心顺序严格小于才改写、
+    空簇中心归零、坐标按 int() 截断。
+    stride > 1 为加速模式：迭代只在每隔 stride 像素的格点上分配 / 更新（每轮开销约降为 1/stride²），
+    最后再用最终中心做一次全分辨率分配，输出标签仍为全分辨率
+    """
+    stride = max(1, int(stride))
+    lab = rgb_to_lab(image_bgr)
+    pos = _seed_centers(lab, step)
+    cx, cy = pos[:, 0].copy(), pos[:, 1].copy()
+    state = _SlicState(lab[::stride, ::stride], stride, step, weight, cx, cy, lab[cx, cy].copy())
+    state.run(iters)
+    return _render(image_bgr, lab, state)[0]
+
+
+def slic_segment(lab: np.ndarray, step: int, iters: int, weight: float, prior: Optional[_SlicState] = None,
+                 tol: float = 0.0) -> _SlicState:
+    """
+    在 Lab 图上分割，返回迭代状态（labels / cx / cy / cl / rounds）。
+    prior 为同尺寸、同 step 的已有状态（如上一帧）时热启动：沿用其中心与标签图，
+    按新图像重建距离后续算，移动的中心占比不超过 tol 即结束；否则冷启动
+    """
+    if prior is not None and prior.stride == 1 and prior.step == step and prior.lab_s.shape == lab.shape:
+        state = _SlicState(lab, 1, step, weight, prior.cx, prior.cy, prior.cl)
+        state.adopt(prior.labels)
+        state.run(iters, tol)
+        return state
+    pos = _seed_centers(lab, step)
+    cx, cy = pos[:, 0].copy(), pos[:, 1].copy()
+    state = _SlicState(lab, 1, step, weight, cx, cy, lab[cx, cy].copy())
+    state.run(iters)
+    return state
+
+
 def create_slic_instance(image_array: np.ndarray, width: int, height: int):
     return SLIC(image_array, width, height)
 
 
-# ---------- 保留原类接口（供 .NET GUI ） ----------
+# ---------- 保留原类接口（供 .NET GUI ），同时作为会话缓存 ----------
 class SLIC:
+    """
+    一个实例对应一张图的分割会话：缓存 Lab 与梯度图，以及上次的迭代状态、标签图和输出。
+    step 不变时再次调用 pixel_deal（GUI 滑块只改 weight / iters / stride）从上次结果热启动：
+      - stride、weight 都不变且 iters 不小于已完成轮数：只补跑差额轮数，结果与冷启动逐像素一致
+        （差额为 0 直接返回缓存的输出）
+      - 其余情况：沿用上次的中心与标签图，按新参数重建距离后续算，
+        移动的中心占比不超过 WARM_TOL 即提前结束（iters 为上限）
+    """
+    WARM_TOL = 0.01
+
     def __init__(self, image_array: np.ndarray, width: int, height: int):
         self.image_bgr = image_array[:, :, :3]
+        self._lab: Optional[np.ndarray] = None
+        self._grad: Optional[np.ndarray] = None
+        self._state: Optional[_SlicState] = None
+        self._labels: Optional[np.ndarray] = None  # 上次输出对应的全分辨率标签
+        self._out: Optional[np.ndarray] = None
+        self.last_iterations = 0  # 最近一次调用实际执行的迭代轮数
+
+    @property
+    def lab(self) -> np.ndarray:
+        if self._lab is None:
+            self._lab = rgb_to_lab(self.image_bgr)
+        return self._lab
+
+    def seed(self, step: int):
+        """冷启动的初始中心 (cx, cy, cl)；梯度图只计算一次"""
+        if self._grad is None:
+            self._grad = _gradient(self.lab)
+        pos = _seed_centers(self.lab, step, self._grad)
+        cx, cy = pos[:, 0].copy(), pos[:, 1].copy()
+        return cx, cy, self.lab[cx, cy].copy()
+
+    def reset(self):
+        """丢弃上次的结果，下次调用重新播种"""
+        self._state = self._labels = self._out = None
 
     def pixel_deal(self, step: int, iters: int, stride: int, weight: float) -> np.ndarray:
-        return slic_superpixel_rgb(self.image_bgr, step=step, iters=iters, weight=weight)
\ No newline at end of file
+        stride = max(1, int(stride))
+        lab, prev = self.lab, self._state
+        if (prev is not None and prev.exact and (prev.step, prev.stride, prev.weight) == (step, stride, weight)
+                and iters >= prev.rounds):
+            state = prev
+            self.last_iterations = state.run(iters - state.rounds)
+            if self.last_iterations == 0:
+                return self._out.copy()
+        elif prev is not None and prev.step == step:
+            state = _SlicState(lab[::stride, ::stride], stride, step, weight, prev.cx, prev.cy, prev.cl)
+            state.adopt(self._labels[::stride, ::stride])
+            self.last_iterations = state.run(iters, self.WARM_TOL)
+        else:
+            state = _SlicState(lab[::stride, ::stride], stride, step, weight, *self.seed(step))
+            self.last_iterations = state.run(iters)
+        self._state = state
+        self._out, self._labels = _render(self.image_bgr, lab, state)
+        return self._out.copy()
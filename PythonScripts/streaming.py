@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+超大图流式处理（--streaming）
+输入以 np.memmap 访问，按像素格行带（band）处理并逐带写出 PNG，
+常驻内存只与带高 × 图宽有关，与图像高度无关。
+原始帧直接映射，8 位非隔行 PNG 逐带解码后写入磁盘映射；JPEG 等格式只能整体解码（打印警告）
+"""
+import os
+import sys
+import tempfile
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+from sklearn.cluster import MiniBatchKMeans
+
+from core import PixelArtConfig
+from adjust import ColorAdjust
+from blocks import REDUCERS, block_mean, expand_cells
+from encoder import PNGStreamReader, PNGStreamWriter
+from overlays import grid_overlay
+from rawio import RAW_HEADER, RAW_MAGIC, rows_to_rgb, parse_raw_header
+
+_KMEANS_BATCH = 4096
+
+
+# ---------- 输入 ----------
+def open_raw_memmap(path: str) -> Optional[Tuple[np.memmap, int, int]]:
+    """原始帧文件直接映射；返回 (h×stride 行映射, 宽, 通道数)，不是原始帧时返回 None"""
+    with open(path, "rb") as f:
+        header = f.read(RAW_HEADER.size)
+    if header[:4] != RAW_MAGIC:
+        return None
+    width, height, channels, stride = parse_raw_header(header)
+    rows = np.memmap(path, dtype=np.uint8, mode="r", offset=RAW_HEADER.size, shape=(height, stride))
+    return rows, width, channels
+
+
+def _band_to_rgb(img: Image.Image) -> np.ndarray:
+    if img.mode == "RGBA":
+        bg = Image.new("RGB", img.size, (255, 255, 255))
+        bg.paste(img, mask=img.split()[3])
+        img = bg
+    elif img.mode != "RGB":
+        img = img.convert("RGB")
+    return np.asarray(img)
+
+
+def spill_to_memmap(path: str, tmp_dir: str, band_rows: int) -> Tuple[np.memmap, int, int]:
+    """
+    编码格式的输入按带写入磁盘映射：PNG 逐带解码（见 encoder.PNGStreamReader），内存只与带大小有关；
+    其它格式（JPEG 等）只能整体解码一次再按带写入，峰值内存与整图成正比，打印警告
+    """
+    try:
+        reader = PNGStreamReader(path)
+    except ValueError as e:
+        print(f"警告: {path} 无法逐带解码（{e}），将整体解码，内存占用与图像大小成正比", file=sys.stderr)
+        return _spill_decoded(path, tmp_dir, band_rows)
+    with reader:
+        w, h = reader.width, reader.height
+        rows = np.memmap(os.path.join(tmp_dir, "input.rgb"), dtype=np.uint8, mode="w+", shape=(h, w * 3))
+        for y0 in range(0, h, band_rows):
+            band = reader.read_rows(band_rows)
+            rows[y0:y0 + band.height] = _band_to_rgb(band).reshape(band.height, w * 3)
+    rows.flush()
+    return rows, w, 3
+
+
+def _spill_decoded(path: str, tmp_dir: str, band_rows: int) -> Tuple[np.memmap, int, int]:
+    """整体解码一次后按带写入磁盘映射并立即释放"""
+    old_limit = Image.MAX_IMAGE_PIXELS
+    Image.MAX_IMAGE_PIXELS = None  # 流式模式本就面向超大图
+    try:
+        with Image.open(path) as img:
+            img.load()
+            w, h = img.size
+            rows = np.memmap(os.path.join(tmp_dir, "input.rgb"), dtype=np.uint8, mode="w+", shape=(h, w * 3))
+            for y0 in range(0, h, band_rows):
+                y1 = min(h, y0 + band_rows)
+                rows[y0:y1] = _band_to_rgb(img.crop((0, y0, w, y1))).reshape(y1 - y0, w * 3)
+    finally:
+        Image.MAX_IMAGE_PIXELS = old_limit
+    rows.flush()
+    return rows, w, 3
+
+
+# ---------- 逐带处理 ----------
+def _cell_means(band: np.ndarray, step: int) -> np.ndarray:
+    """与 SLICPixelArtCore 栅格对齐模式一致：零填充后整格求均值，截断为 uint8"""
+    return block_mean(band, step, zero_pad=True)
+
+
+def _cell_weights(n_rows: int, width: int, step: int, wg: int) -> np.ndarray:
+    """每个格子在原图中的有效像素数（边缘不完整格权重更小）"""
+    rows = np.minimum(step, n_rows - np.arange(0, n_rows, step))
+    cols = np.minimum(step, width - np.arange(0, wg * step, step))
+    return (rows[:, None] * cols[None, :]).ravel().astype(np.float64)
+
+
+class StreamingPixelator:
+    def __init__(self, cfg: PixelArtConfig, style: str = "basic", band_rows: int = 512,
+                 brightness: float = 1.0, contrast: float = 1.0, saturation: float = 1.0,
+                 show_grid: bool = False, grid_alpha: float = 1.0, tmp_dir: Optional[str] = None,
+                 progress: Optional[Callable[[str, int, int], None]] = None):
+        self.cfg = cfg
+        self.style = style
+        # average / median 为块统计 + 调色板；quantized 沿用零填充均值（与栅格对齐模式一致）
+        self.reduce = {"average": REDUCERS["mean"], "median": REDUCERS["median"]}.get(style, _cell_means)
+        step = cfg.pixel_size
+        self.band_rows = max(step, (band_rows // step) * step)  # 带高取像素格的整数倍
+        self.adjust = ColorAdjust(brightness, contrast, saturation)
+        self.show_grid = show_grid
+        self.grid_alpha = grid_alpha
+        self.tmp_dir = tmp_dir
+        self.progress = progress or (lambda stage, done, total: None)
+
+    def _bands(self, rows: np.ndarray, width: int, channels: int):
+        for y0 in range(0, rows.shape[0], self.band_rows):
+            y1 = min(rows.shape[0], y0 + self.band_rows)
+            yield y0, rows_to_rgb(np.asarray(rows[y0:y1]), width, channels)
+
+    def _draw_grid(self, band: np.ndarray, y0: int, value) -> np.ndarray:
+        # 调色板索引带只能整格写入，半透明网格线走 RGB 输出
+        alpha = 1.0 if band.ndim == 2 else self.grid_alpha
+        return grid_overlay(band, self.cfg.pixel_size, value, alpha, y0=y0)
+
+    def run(self, input_path: str, output_path: str, compress_level: int = 6) -> dict:
+        with tempfile.TemporaryDirectory(dir=self.tmp_dir) as tmp:
+            mapped = open_raw_memmap(input_path)
+            if mapped is None:
+                mapped = spill_to_memmap(input_path, tmp, self.band_rows)
+            rows, width, channels = mapped
+            height = rows.shape[0]
+            self.progress("stream_map", 1, 1)
+
+            if self.adjust.needs_mean:
+                # 基础调整：亮度/饱和度逐格进行，对比度需要全图灰度均值，预先单独扫描一遍
+                hist = np.zeros(256, dtype=np.int64)
+                for _, band in self._bands(rows, width, channels):
+                    hist += self.adjust.histogram(band)
+                self.adjust.fit(hist)
+
+            if self.style in ("quantized", "average", "median"):
+                self._run_quantized(rows, width, channels, height, output_path, compress_level, tmp)
+            else:
+                self._run_basic(rows, width, channels, height, output_path, compress_level)
+            del rows
+        n_bands = (height + self.band_rows - 1) // self.band_rows
+        return {"width": width, "height": height, "band_rows": self.band_rows, "bands": n_bands}
+
+    def _run_basic(self, rows, width, channels, height, output_path, compress_level):
+        step = self.cfg.pixel_size
+        with PNGStreamWriter(output_path, width, height, compress_level=compress_level) as writer:
+            for y0, band in self._bands(rows, width, channels):
+                cells = self.adjust.apply(_cell_means(band, step))  # 调整在格子空间进行
+                out = expand_cells(cells, step, band.shape[0], width)
+                if self.show_grid:
+                    out = self._draw_grid(out, y0, (255, 255, 255))
+                writer.write_rows(out)
+                self.progress("stream_render", y0 + band.shape[0], height)
+
+    def _run_quantized(self, rows, width, channels, height, output_path, compress_level, tmp):
+        step = self.cfg.pixel_size
+        hg, wg = (height + step - 1) // step, (width + step - 1) // step
+        n_clusters = min(self.cfg.color_count, hg * wg)
+        cells_map = np.memmap(os.path.join(tmp, "cells.rgb"), dtype=np.uint8, mode="w+", shape=(hg, wg, 3))
+        model = MiniBatchKMeans(n_clusters=n_clusters, batch_size=_KMEANS_BATCH, random_state=42)
+
+        # ① 第一遍：格子均值写入磁盘映射，同时增量拟合调色板
+        pend_x, pend_w, pend_n = [], [], 0
+        for y0, band in self._bands(rows, width, channels):
+            cells = self.adjust.apply(self.reduce(band, step))
+            g0 = y0 // step
+            cells_map[g0:g0 + cells.shape[0]] = cells
+            pend_x.append(cells.reshape(-1, 3).astype(np.float64))
+            pend_w.append(_cell_weights(band.shape[0], width, step, wg))
+            pend_n += pend_x[-1].shape[0]
+            if pend_n >= max(_KMEANS_BATCH, n_clusters):
+                model.partial_fit(np.concatenate(pend_x), sample_weight=np.concatenate(pend_w))
+                pend_x, pend_w, pend_n = [], [], 0
+            self.progress("stream_fit", y0 + band.shape[0], height)
+        if pend_n:
+            # 剩余的尾部格子也参与拟合：首次拟合之后 partial_fit 接受少于 n_clusters 的批
+            model.partial_fit(np.concatenate(pend_x), sample_weight=np.concatenate(pend_w))
+
+        palette = model.cluster_centers_.astype(np.uint8)
+        grid_index = None
+        if self.show_grid and self.grid_alpha >= 1.0 and len(palette) < 256:
+            grid_index = len(palette)
+            palette = np.vstack([palette, np.array([[255, 255, 255]], dtype=np.uint8)])
+
+        # ② 第二遍：格子映射到调色板索引并逐带写出
+        cells_per_band = self.band_rows // step
+        use_palette = not self.show_grid or grid_index is not None
+        with PNGStreamWriter(output_path, width, height, palette=palette if use_palette else None,
+                             compress_level=compress_level) as writer:
+            for g0 in range(0, hg, cells_per_band):
+                cells = np.asarray(cells_map[g0:g0 + cells_per_band])
+                idx = model.predict(cells.reshape(-1, 3).astype(np.float64)).astype(np.uint8)
+                idx = idx.reshape(cells.shape[:2])
+                y0 = g0 * step
+                n = min(self.band_rows, height - y0)
+                out = expand_cells(idx if use_palette else palette[idx], step, n, width)
+                if self.show_grid:
+                    out = self._draw_grid(out, y0, grid_index if use_palette else (255, 255, 255))
+                writer.write_rows(out)
+                self.progress("stream_write", y0 + n, height)
+        del cells_map
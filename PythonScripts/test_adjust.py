@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试合并的亮度/对比度/饱和度调整
+"""
+
+import sys
+import numpy as np
+from PIL import Image, ImageEnhance
+
+from adjust import ColorAdjust
+
+
+def _image(h=61, w=83, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 256, (h, w, 3), dtype=np.uint8)
+
+
+def test_matches_imageenhance():
+    """测试与 ImageEnhance 依次调整逐像素一致"""
+    img = _image()
+    for b, c, s in [(1.3, 1.0, 1.0), (1.0, 0.6, 1.0), (1.0, 1.0, 1.7), (0.7, 1.4, 0.0), (1.9, 2.5, 2.0)]:
+        ref = Image.fromarray(img)
+        for enh, factor in [(ImageEnhance.Brightness, b), (ImageEnhance.Contrast, c), (ImageEnhance.Color, s)]:
+            ref = enh(ref).enhance(factor)
+        adjust = ColorAdjust(b, c, s)
+        if adjust.needs_mean:
+            adjust.fit(adjust.histogram(img))
+        assert np.array_equal(adjust.apply(img.copy()), np.array(ref)), (b, c, s)
+    print("ImageEnhance 一致性测试通过")
+
+
+def test_in_place_and_identity():
+    """测试原地修改、只读输入复制、全为 1 时跳过"""
+    img = _image()
+    assert ColorAdjust().apply(img) is img
+    buf = img.copy()
+    assert ColorAdjust(1.2).apply(buf) is buf
+    ro = img.copy()
+    ro.flags.writeable = False
+    out = ColorAdjust(1.2).apply(ro)
+    assert out is not ro and np.array_equal(out, buf) and np.array_equal(ro, img)
+    print("原地修改测试通过")
+
+
+if __name__ == '__main__':
+    print("开始测试颜色调整...")
+    tests = [test_matches_imageenhance, test_in_place_and_identity]
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"测试 {test.__name__} 出错: {e}")
+    print(f"测试完成: {passed}/{len(tests)} 通过")
+    sys.exit(0 if passed == len(tests) else 1)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试动画帧序列像素化（帧差分、全局调色板、热启动 SLIC、逐帧读写）
+"""
+
+import os
+import sys
+import tempfile
+import numpy as np
+from PIL import Image
+
+from animation import AnimationPixelator
+from core import PixelArtConfig
+from frameio import FrameReader
+
+
+def _frames(n=5, h=48, w=64):
+    """渐变背景上移动的色块"""
+    yy, xx = np.mgrid[0:h, 0:w]
+    base = np.stack([xx * 255 // w, yy * 255 // h, np.full_like(xx, 128)], axis=-1).astype(np.uint8)
+    frames = []
+    for t in range(n):
+        f = base.copy()
+        f[16:32, 8 * t:8 * t + 16] = (250, 30, 30)
+        frames.append(f)
+    return frames
+
+
+def test_static_cells_reused():
+    """测试静止区域跨帧输出不变、只有变化的格子重新映射，调色板大小不超过 color_count"""
+    for align in (True, False):
+        anim = AnimationPixelator(PixelArtConfig(pixel_size=8, color_count=8, align_grid=align))
+        frames = _frames()
+        prev = None
+        for f in frames:
+            idx, pal = anim.process(f)
+            assert idx.shape == f.shape[:2] and len(pal) <= 8
+            if prev is not None:
+                assert np.array_equal(idx[:16], prev[:16]) and np.array_equal(idx[32:], prev[32:])
+            prev = idx
+        same, _ = anim.process(frames[-1])
+        assert same is prev
+        assert anim.cells_reused > 0
+    print("帧差分复用测试通过")
+
+
+def test_slic_warm_start():
+    """测试热启动帧的 SLIC 轮数不超过 WARM_ROUNDS，少于冷启动"""
+    anim = AnimationPixelator(PixelArtConfig(pixel_size=8, color_count=8, align_grid=False, slic_iters=10))
+    rounds = []
+    for f in _frames():
+        anim.process(f)
+        rounds.append(anim._slic.rounds)
+    assert all(r <= AnimationPixelator.WARM_ROUNDS for r in rounds[1:]) and rounds[0] > rounds[1]
+    print("SLIC 热启动测试通过")
+
+
+def test_round_trip_formats():
+    """测试 GIF / APNG / 帧目录逐帧写出后读回与处理结果一致，相同帧合并时长"""
+    frames = _frames(4)
+    frames.insert(2, frames[1])
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, "in")
+        os.makedirs(src)
+        for i, f in enumerate(frames):
+            Image.fromarray(f).save(os.path.join(src, f"{i:03d}.png"))
+        for name in ("out.gif", "out.png", "outdir"):
+            out = os.path.join(tmp, name)
+            stats = AnimationPixelator(PixelArtConfig(pixel_size=8, color_count=8, align_grid=True)).run(src, out, 40)
+            assert stats["frames"] == 5
+            anim = AnimationPixelator(PixelArtConfig(pixel_size=8, color_count=8, align_grid=True))
+            expected = [(lambda r: r[1][r[0]])(anim.process(f)) for f in frames]
+            decoded = list(FrameReader(out))
+            if name == "outdir":
+                assert len(decoded) == 5
+            else:
+                # 第 3 帧与第 2 帧相同，并入其显示时长
+                assert [d for _, d in decoded] == [40, 80, 40, 40]
+                expected = expected[:2] + expected[3:]
+            assert all(np.array_equal(rgb, exp) for (rgb, _), exp in zip(decoded, expected))
+    print("帧格式读写测试通过")
+
+
+if __name__ == '__main__':
+    print("开始测试动画帧序列...")
+    tests = [test_static_cells_reused, test_slic_warm_start, test_round_trip_formats]
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"测试 {test.__name__} 出错: {e}")
+    print(f"测试完成: {passed}/{len(tests)} 通过")
+    sys.exit(0 if passed == len(tests) else 1)
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试目录批处理（清单续跑、大图优先、逐文件 JSON 结果、多进程、共享内存交接）
+"""
+
+import io
+import json
+import os
+import sys
+import tempfile
+from argparse import Namespace
+import numpy as np
+from PIL import Image
+
+from batch import MANIFEST_NAME, SharedRing, render_many, run_batch
+
+
+def _args(src, dst, workers=1, **kw):
+    args = dict(input_dir=src, output_dir=dst, workers=workers, manifest=None, pixel_size=4, color_count=8,
+                palette="default", algorithm="basic", dithering=False, edge_smoothing=0.5, contrast=1.0,
+                brightness=1.0, saturation=1.0, png_compression="fast", dither_strength=0.1,
+                cartoon_effect=False, cartoon_edge_weight=0.3, cartoon_levels=8, slic_iters=10,
+                time_budget_ms=None, calibration_file=None, slic_weight=10.0, show_grid=False, grid_alpha=1.0,
+                edge_outline=False, edge_outline_thickness=3, edge_outline_color="30,30,30",
+                edge_outline_jitter=0, edge_outline_seed=0, pipe_mode=False)
+    args.update(kw)
+    return Namespace(**args)
+
+
+def _make_inputs(src):
+    rng = np.random.default_rng(0)
+    sizes = {"small.png": (16, 16), "sub/big.jpg": (64, 48), "mid.bmp": (32, 32)}
+    for name, (w, h) in sizes.items():
+        path = os.path.join(src, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        Image.fromarray(rng.integers(0, 256, (h, w, 3), dtype=np.uint8)).save(path)
+    with open(os.path.join(src, "notes.txt"), "w") as f:
+        f.write("忽略")
+
+
+def _run(args):
+    out = io.StringIO()
+    counts = run_batch(args, {"pixel_size": args.pixel_size}, out=out)
+    return counts, [json.loads(line) for line in out.getvalue().splitlines()]
+
+
+def test_largest_first_and_json_lines():
+    """测试按像素数从大到小处理，每个文件一行 JSON，输出保持相对路径"""
+    with tempfile.TemporaryDirectory() as tmp:
+        src, dst = os.path.join(tmp, "in"), os.path.join(tmp, "out")
+        _make_inputs(src)
+        counts, lines = _run(_args(src, dst))
+        assert counts == {"total": 3, "ok": 3, "skipped": 0, "failed": 0, "workers": 1}
+        assert [l["input"] for l in lines] == ["sub/big.jpg", "mid.bmp", "small.png"]
+        assert all(l["status"] == "ok" for l in lines)
+        with Image.open(os.path.join(dst, "sub", "big.png")) as img:
+            assert img.size == (64, 48)
+    print("大图优先与 JSON 结果测试通过")
+
+
+def test_manifest_resume():
+    """测试重跑时跳过未变化的文件；输入、输出或参数变化时重新处理"""
+    with tempfile.TemporaryDirectory() as tmp:
+        src, dst = os.path.join(tmp, "in"), os.path.join(tmp, "out")
+        _make_inputs(src)
+        _run(_args(src, dst))
+        counts, lines = _run(_args(src, dst))
+        assert counts["skipped"] == 3 and counts["ok"] == 0
+        assert all(l["status"] == "skipped" for l in lines)
+
+        Image.new("RGB", (20, 20), (9, 9, 9)).save(os.path.join(src, "small.png"))
+        os.remove(os.path.join(dst, "mid.png"))
+        counts, lines = _run(_args(src, dst))
+        assert counts["ok"] == 2 and counts["skipped"] == 1
+        assert {l["input"] for l in lines if l["status"] == "ok"} == {"small.png", "mid.bmp"}
+
+        counts, _ = _run(_args(src, dst, pixel_size=8))
+        assert counts["ok"] == 3
+        assert os.path.exists(os.path.join(dst, MANIFEST_NAME))
+
+        # 同名不同扩展名：各自输出，重跑全部跳过
+        Image.new("RGB", (8, 8), (200, 0, 0)).save(os.path.join(src, "small.jpg"))
+        counts, lines = _run(_args(src, dst, pixel_size=8))
+        assert counts["ok"] == 1 and counts["skipped"] == 3
+        assert [l["output"] for l in lines if l["status"] == "ok"] == ["small.jpg.png"]
+        assert os.path.exists(os.path.join(dst, "small.png"))
+        counts, _ = _run(_args(src, dst, pixel_size=8))
+        assert counts["skipped"] == 4 and counts["ok"] == 0
+
+        # 改名后仍重名的输出报告为错误，不互相覆盖
+        Image.new("RGB", (8, 8)).save(os.path.join(src, "small.jpg.png"))
+        counts, lines = _run(_args(src, dst, pixel_size=8))
+        assert counts["failed"] == 2
+        assert {l["input"] for l in lines if l["status"] == "error"} == {"small.jpg", "small.jpg.png"}
+    print("清单续跑测试通过")
+
+
+def test_worker_pool():
+    """测试多进程结果与单进程一致，失败的文件单独报告"""
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, "in")
+        _make_inputs(src)
+        with open(os.path.join(src, "broken.png"), "wb") as f:
+            f.write(b"not a png")
+        one, two = os.path.join(tmp, "one"), os.path.join(tmp, "two")
+        _run(_args(src, one))
+        counts, lines = _run(_args(src, two, workers=2))
+        assert counts["ok"] == 3 and counts["failed"] == 1 and counts["workers"] == 2
+        assert [l for l in lines if l["status"] == "error"][0]["input"] == "broken.png"
+        for name in ("small.png", "mid.png", "sub/big.png"):
+            a = np.asarray(Image.open(os.path.join(one, name)).convert("RGB"))
+            b = np.asarray(Image.open(os.path.join(two, name)).convert("RGB"))
+            assert np.array_equal(a, b)
+    print("进程池测试通过")
+
+
+def test_shared_memory_handoff():
+    """测试共享内存环形缓冲：稳态复用同一块，多进程结果与进程内渲染一致"""
+    rng = np.random.default_rng(1)
+    imgs = [rng.integers(0, 256, (24 + 8 * i, 40, 3), dtype=np.uint8) for i in range(5)]
+    with SharedRing(2) as ring:
+        first = ring.put(0, imgs[-1])
+        again = ring.put(0, imgs[0])
+        assert (again["in"], again["out"]) == (first["in"], first["out"])
+        assert ring.put(1, np.zeros((200, 200, 3), np.uint8))["in"] != first["in"]
+    args = _args(None, None)
+    expected = {i: r.copy() for i, r in render_many(imgs, args, workers=1)}
+    got = {i: r.copy() for i, r in render_many(imgs * 2, args, workers=2)}
+    assert sorted(got) == list(range(10))
+    assert all(np.array_equal(expected[i % 5], r) for i, r in got.items())
+    print("共享内存交接测试通过")
+
+
+if __name__ == '__main__':
+    print("开始测试目录批处理...")
+    tests = [test_largest_first_and_json_lines, test_manifest_resume, test_worker_pool, test_shared_memory_handoff]
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"测试 {test.__name__} 出错: {e}")
+    print(f"测试完成: {passed}/{len(tests)} 通过")
+    sys.exit(0 if passed == len(tests) else 1)
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试块均值 / 块中值像素化（--algorithm average / median）
+"""
+
+import sys
+import numpy as np
+from PIL import Image
+
+import processors
+from blocks import block_mean, block_median, expand_cells
+from core import PixelArtConfig, PixelArtGenerator
+from metrics import Metrics
+
+
+def _noise(h=37, w=53, seed=0):
+    return np.random.default_rng(seed).integers(0, 256, (h, w, 3), dtype=np.uint8)
+
+
+def test_block_stats_match_naive():
+    """测试块均值与逐通道下中值和逐格计算一致（含边缘不完整格与直方图中值）"""
+    for img, cell in [(_noise(), 8), (_noise(70, 100, 1), 33), (_noise(5, 7, 2), 8)]:
+        mean, median = block_mean(img, cell), block_median(img, cell)
+        for i in range(mean.shape[0]):
+            for j in range(mean.shape[1]):
+                blk = img[i * cell:(i + 1) * cell, j * cell:(j + 1) * cell].reshape(-1, 3)
+                assert np.array_equal(mean[i, j], blk.astype(np.int64).sum(axis=0) // len(blk))
+                assert np.array_equal(median[i, j], np.sort(blk, axis=0)[(len(blk) - 1) // 2])
+    print("块统计测试通过")
+
+
+def test_expand_cells():
+    """测试格子回填与逐格重复后裁剪一致（RGB 与二维索引）"""
+    cells = _noise(5, 7)
+    expected = np.repeat(np.repeat(cells, 8, axis=0), 8, axis=1)[:37, :53]
+    assert np.array_equal(expand_cells(cells, 8, 37, 53), expected)
+    assert np.array_equal(expand_cells(cells[..., 0], 8, 37, 53), expected[..., 0])
+    print("格子回填测试通过")
+
+
+def test_generator_styles():
+    """测试 average / median 风格不做分割、格内同色、颜色数不超过 color_count，processors.pixelate_average 保持尺寸"""
+    img = _noise(48, 64)
+    for style in ("average", "median"):
+        m = Metrics()
+        out = PixelArtGenerator(PixelArtConfig(pixel_size=8, color_count=4), metrics=m).generate(img, style=style)
+        assert out.shape == img.shape and out.dtype == np.uint8
+        assert "slic_iter" not in m.stages and f"block_{'mean' if style == 'average' else 'median'}" in m.stages
+        assert len(np.unique(out.reshape(-1, 3), axis=0)) <= 4
+        assert (out.reshape(6, 8, 8, 8, 3) == out[::8, ::8][:, None, :, None]).all()
+    result = processors.pixelate_average(Image.fromarray(img), 10)
+    assert result.size == (64, 48)
+    assert np.array_equal(np.array(result)[:10, :10], np.broadcast_to(block_mean(img, 10)[0, 0], (10, 10, 3)))
+    print("生成器块风格测试通过")
+
+
+if __name__ == '__main__':
+    print("开始测试块统计像素化...")
+    tests = [test_block_stats_match_naive, test_expand_cells, test_generator_styles]
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"测试 {test.__name__} 出错: {e}")
+    print(f"测试完成: {passed}/{len(tests)} 通过")
+    sys.exit(0 if passed == len(tests) else 1)
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试结果缓存
+"""
+
+import sys
+import os
+import io
+import subprocess
+import time
+import tempfile
+from PIL import Image
+
+from core import PixelArtConfig
+from cache import ResultCache
+import processors
+
+
+def _png_bytes(color='red', size=(64, 64)):
+    buf = io.BytesIO()
+    Image.new('RGB', size, color=color).save(buf, format='PNG')
+    return buf.getvalue()
+
+
+def test_key_depends_on_content_and_config():
+    """测试缓存键同时由内容和配置决定"""
+    with tempfile.TemporaryDirectory() as d:
+        cache = ResultCache(d)
+        cfg = PixelArtConfig(pixel_size=8)
+        k1 = cache.make_key(b"abc", cfg, {"algorithm": "basic"})
+        assert k1 == cache.make_key(b"abc", PixelArtConfig(pixel_size=8), {"algorithm": "basic"})
+        assert k1 != cache.make_key(b"abd", cfg, {"algorithm": "basic"})
+        assert k1 != cache.make_key(b"abc", PixelArtConfig(pixel_size=4), {"algorithm": "basic"})
+        assert k1 != cache.make_key(b"abc", cfg, {"algorithm": "slic"})
+    print("缓存键测试通过")
+
+
+def test_get_put_and_eviction():
+    """测试命中/未命中计数和 LRU 淘汰"""
+    with tempfile.TemporaryDirectory() as d:
+        cache = ResultCache(d, max_bytes=250)
+        assert cache.get("a" * 64) is None
+        cache.put("a" * 64, b"x" * 100)
+        time.sleep(0.01)
+        cache.put("b" * 64, b"y" * 100)
+        time.sleep(0.01)
+        assert cache.get("a" * 64) == b"x" * 100  # 刷新 a 的 LRU 时间
+        time.sleep(0.01)
+        cache.put("c" * 64, b"z" * 100)           # 超出容量，应淘汰 b
+        assert cache.get("b" * 64) is None
+        assert cache.get("c" * 64) == b"z" * 100
+        assert (cache.hits, cache.misses) == (2, 2)
+        leftovers = [f for _, _, fs in os.walk(d) for f in fs if f.startswith(".tmp-")]
+        assert not leftovers
+    print("缓存淘汰测试通过")
+
+
+def test_process_image_internal_cached():
+    """测试 process_image_internal 的缓存命中"""
+    with tempfile.TemporaryDirectory() as d:
+        options = {'block_size': 8, 'max_colors': 16, 'cache_dir': d}
+        first = processors.process_image_internal(_png_bytes(), options)
+        second = processors.process_image_internal(_png_bytes(), options)
+        assert first == second
+        cache = processors._get_cache(options)
+        assert (cache.hits, cache.misses) == (1, 1)
+    print("处理管道缓存测试通过")
+
+
+def test_cli_cache_only_for_single_image():
+    """测试命令行只在单图模式建缓存并输出 CACHE 行，流式模式忽略 --cache-dir"""
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pixelate.py")
+    with tempfile.TemporaryDirectory() as d:
+        src, cache_dir = os.path.join(d, "in.png"), os.path.join(d, "cache")
+        with open(src, "wb") as f:
+            f.write(_png_bytes())
+        for extra, cached in ((["--streaming"], False), ([], True)):
+            out = subprocess.run([sys.executable, script, "--input", src, "--output", os.path.join(d, "out.png"),
+                                  "--cache-dir", cache_dir] + extra, capture_output=True, text=True, check=True)
+            assert ("CACHE:" in out.stdout) == cached and os.path.isdir(cache_dir) == cached
+    print("命令行缓存范围测试通过")
+
+
+if __name__ == '__main__':
+    print("开始测试结果缓存...")
+    tests = [
+        test_key_depends_on_content_and_config,
+        test_get_put_and_eviction,
+        test_process_image_internal_cached,
+        test_cli_cache_only_for_single_image,
+    ]
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"测试 {test.__name__} 出错: {e}")
+    print(f"测试完成: {passed}/{len(tests)} 通过")
+    sys.exit(0 if passed == len(tests) else 1)
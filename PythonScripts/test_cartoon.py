@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试卡通效果（边缘压暗 + 色阶分离）
+"""
+
+import sys
+import numpy as np
+
+import cartoon as cartoon_mod
+from blocks import block_mean, expand_cells
+from cartoon import cartoon, posterize_lut
+from core import PixelArtConfig, PixelArtGenerator
+
+
+def _two_tone(h=40, w=60):
+    img = np.full((h, w, 3), 200, dtype=np.uint8)
+    img[:, w // 2:] = 100
+    return img
+
+
+def test_edges_and_posterize():
+    """测试平坦区域只做色阶分离、颜色边界两侧被压暗、edge_weight=0 时不压暗"""
+    img = _two_tone()
+    lut = posterize_lut(4)
+    out = cartoon(img, edge_weight=0.5, levels=4)
+    assert np.array_equal(out[:, :20], np.broadcast_to(lut[200], (40, 20, 3)))
+    assert (out[:, 29:31] < lut[img[:, 29:31]]).all()
+    assert np.array_equal(cartoon(img, edge_weight=0.0, levels=4), lut[img])
+    print("边缘与色阶测试通过")
+
+
+def test_tiles_consistent():
+    """测试按行块（含并行）计算与整帧一次计算结果一致"""
+    img = np.random.default_rng(0).integers(0, 256, (97, 41, 3), dtype=np.uint8)
+    old_rows, old_px = cartoon_mod._TILE_ROWS, cartoon_mod._PARALLEL_PIXELS
+    try:
+        cartoon_mod._TILE_ROWS = 1000
+        whole = cartoon(img, 0.4)
+        cartoon_mod._TILE_ROWS, cartoon_mod._PARALLEL_PIXELS = 13, 0
+        assert np.array_equal(cartoon(img, 0.4, workers=1), whole)
+        assert np.array_equal(cartoon(img, 0.4, workers=4), whole)
+    finally:
+        cartoon_mod._TILE_ROWS, cartoon_mod._PARALLEL_PIXELS = old_rows, old_px
+    print("行块一致性测试通过")
+
+
+def test_generator_cell_space():
+    """测试栅格对齐模式下卡通效果作用于格子颜色后回填"""
+    img = np.random.default_rng(1).integers(0, 256, (45, 60, 3), dtype=np.uint8)
+    cfg = PixelArtConfig(pixel_size=8, align_grid=True, cartoon_edge_weight=0.5, cartoon_levels=6)
+    out = PixelArtGenerator(cfg).generate(img, style="basic")
+    expected = expand_cells(cartoon(block_mean(img, 8, zero_pad=True), 0.5, 6), 8, 45, 60)
+    assert np.array_equal(out, expected)
+    print("格子空间卡通效果测试通过")
+
+
+if __name__ == '__main__':
+    print("开始测试卡通效果...")
+    tests = [test_edges_and_posterize, test_tiles_consistent, test_generator_cell_space]
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"测试 {test.__name__} 出错: {e}")
+    print(f"测试完成: {passed}/{len(tests)} 通过")
+    sys.exit(0 if passed == len(tests) else 1)
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试 PNG 输出编码
+"""
+
+import sys
+import io
+import os
+import tempfile
+import numpy as np
+from PIL import Image
+
+from encoder import PNGStreamReader, encode_png, png_save_params, to_indexed
+
+
+def _blocky(n_colors, seed=0):
+    rng = np.random.default_rng(seed)
+    pal = rng.integers(0, 256, (n_colors, 3)).astype(np.uint8)
+    cells = rng.integers(0, n_colors, (12, 16))
+    return pal[np.repeat(np.repeat(cells, 4, 0), 4, 1)]
+
+
+def test_indexed_roundtrip():
+    """测试少色图像输出调色板 PNG 且像素无损"""
+    rgb = _blocky(20)
+    for spec in ("fast", "default", "best", "2:rle"):
+        img = Image.open(io.BytesIO(encode_png(rgb, spec)))
+        assert img.mode == "P"
+        assert np.array_equal(np.array(img.convert("RGB")), rgb)
+    print("调色板 PNG 测试通过")
+
+
+def test_truecolor_fallback():
+    """测试超过 256 色时回退为 RGB PNG"""
+    rgb = np.random.default_rng(1).integers(0, 256, (32, 32, 3)).astype(np.uint8)
+    assert to_indexed(rgb) is None
+    img = Image.open(io.BytesIO(encode_png(rgb)))
+    assert img.mode == "RGB"
+    assert np.array_equal(np.array(img), rgb)
+    print("真彩色回退测试通过")
+
+
+def test_compression_spec():
+    """测试压缩参数解析"""
+    assert png_save_params("fast") == {"compress_level": 1}
+    assert png_save_params("4")["compress_level"] == 4
+    assert "compress_type" in png_save_params("9:filtered")
+    for bad in ("11", "x", "3:zip"):
+        try:
+            png_save_params(bad)
+        except ValueError:
+            continue
+        raise AssertionError(f"{bad} 未报错")
+    print("压缩参数测试通过")
+
+
+def test_stream_reader():
+    """测试逐带读入 PNG 与整体解码一致（各颜色类型、带高不整除图高），16 位 PNG 报错"""
+    rng = np.random.default_rng(2)
+    rgba = rng.integers(0, 256, (53, 41, 4), dtype=np.uint8)
+    images = [Image.fromarray(rgba), Image.fromarray(rgba[..., :3]), Image.fromarray(rgba[..., 0]),
+              Image.fromarray(rgba).convert("LA"), Image.fromarray(_blocky(20)).quantize(20)]
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "in.png")
+        for img in images:
+            img.save(path)
+            expected = np.array(Image.open(path))
+            with PNGStreamReader(path) as reader:
+                bands = [np.array(reader.read_rows(7)) for _ in range(0, reader.height, 7)]
+            assert np.array_equal(np.concatenate(bands), expected)
+        Image.fromarray(rgba[..., 0].astype(np.uint16) * 257).save(path)
+        try:
+            PNGStreamReader(path)
+            raise AssertionError("16 位 PNG 应报错")
+        except ValueError:
+            pass
+    print("逐带读入测试通过")
+
+
+if __name__ == '__main__':
+    print("开始测试 PNG 编码...")
+    tests = [test_indexed_roundtrip, test_truecolor_fallback, test_compression_spec, test_stream_reader]
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"测试 {test.__name__} 出错: {e}")
+    print(f"测试完成: {passed}/{len(tests)} 通过")
+    sys.exit(0 if passed == len(tests) else 1)
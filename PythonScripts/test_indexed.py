@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试索引色图像（构造与压缩、生成器的索引输出、调色板运算、直接编码）
+"""
+
+import io
+import sys
+import numpy as np
+from PIL import Image
+
+from core import ColorMapping, PixelArtConfig, PixelArtGenerator
+from encoder import encode_png
+from indexed import IndexedImage
+
+
+def _image(h=50, w=70):
+    rng = np.random.default_rng(5)
+    yy, xx = np.mgrid[0:h, 0:w]
+    img = np.stack([xx * 255 // w, yy * 255 // h, (xx + yy) % 256], axis=-1).astype(np.int32)
+    return np.clip(img + rng.integers(-20, 20, img.shape), 0, 255).astype(np.uint8)
+
+
+def test_construct_and_compact():
+    """测试 from_rgb / from_cells / from_labels 还原像素，compact 合并重复颜色并收窄索引类型"""
+    img = _image()
+    ind = IndexedImage.from_rgb(img)
+    assert np.array_equal(ind.to_rgb(), img) and ind.index.dtype == np.uint16
+    cells = img[::8, ::8]
+    ind = IndexedImage.from_cells(cells, 8, 50, 70)
+    assert ind.index.dtype == np.uint8 and ind.n_colors <= cells.shape[0] * cells.shape[1]
+    assert np.array_equal(ind.to_rgb(), np.repeat(np.repeat(cells, 8, 0), 8, 1)[:50, :70])
+    labels = np.arange(600, dtype=np.int32).reshape(20, 30)
+    colors = np.zeros((700, 3), dtype=np.uint8)
+    colors[::2] = 200  # 600 个标签只有 2 种颜色，另有 100 项未使用
+    ind = IndexedImage.from_labels(labels, colors)
+    small = ind.compact()
+    assert small.n_colors == 2 and small.index.dtype == np.uint8
+    assert np.array_equal(small.to_rgb(), ind.to_rgb())
+    print("构造与压缩测试通过")
+
+
+def test_generator_indexed_output():
+    """测试 generate_indexed 与 generate 像素一致，量化结果不超过颜色数，调色板映射取最近色"""
+    img = _image()
+    for align, style in [(True, "basic"), (False, "basic"), (True, "average"), (True, "retro"),
+                         (True, "quantized"), (True, "dithered")]:
+        cfg = PixelArtConfig(pixel_size=6, color_count=6, align_grid=align, slic_iters=3,
+                             dithering_method="floyd_steinberg")
+        ind = PixelArtGenerator(cfg).generate_indexed(img, style)
+        assert np.array_equal(ind.to_rgb(), PixelArtGenerator(cfg).generate(img, style)), (align, style)
+        if style in ("quantized", "average"):
+            assert len(np.unique(ind.palette[np.unique(ind.index)], axis=0)) <= 6
+    base = PixelArtGenerator(PixelArtConfig(pixel_size=6, align_grid=True)).generate_indexed(img, "basic")
+    retro = PixelArtGenerator(PixelArtConfig(pixel_size=6, align_grid=True)).generate_indexed(img, "retro")
+    pal = ColorMapping().create_retro_palette("gameboy").astype(np.int32)
+    d = ((base.palette.astype(np.int32)[:, None] - pal[None]) ** 2).sum(axis=2)
+    assert np.array_equal(retro.to_rgb(), pal[d.argmin(axis=1)][base.index])
+    print("生成器索引输出测试通过")
+
+
+def test_encode_indexed():
+    """测试索引色图像直接编码为调色板 PNG，解码后像素一致"""
+    img = _image()
+    ind = PixelArtGenerator(PixelArtConfig(pixel_size=5, align_grid=True)).generate_indexed(img)
+    data = encode_png(ind, "fast")
+    with Image.open(io.BytesIO(data)) as im:
+        assert im.mode == "P"
+        assert np.array_equal(np.asarray(im.convert("RGB")), ind.to_rgb())
+    assert data == encode_png(ind.to_rgb(), "fast")
+    print("索引色编码测试通过")
+
+
+if __name__ == '__main__':
+    print("开始测试索引色图像...")
+    tests = [test_construct_and_compact, test_generator_indexed_output, test_encode_indexed]
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"测试 {test.__name__} 出错: {e!r}")
+    print(f"测试完成: {passed}/{len(tests)} 通过")
+    sys.exit(0 if passed == len(tests) else 1)
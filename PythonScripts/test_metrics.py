@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试阶段计时与计数器
+"""
+
+import sys
+import os
+import json
+import tempfile
+import numpy as np
+
+from core import PixelArtConfig, PixelArtGenerator
+from metrics import Metrics, NULL_METRICS
+
+
+def test_generator_stages_recorded():
+    """测试生成器各阶段被计时并写出 JSON 报告"""
+    img = (np.random.default_rng(0).random((48, 64, 3)) * 255).astype(np.uint8)
+    m = Metrics(trace_memory=True)
+    PixelArtGenerator(PixelArtConfig(pixel_size=8, color_count=4), metrics=m).generate(
+        img, style="quantized")
+    report = m.report()
+    for name in ("lab", "slic_seed", "slic_iter", "grid", "kmeans"):
+        assert name in report["stages"], name
+        assert report["stages"][name]["wall_s"] >= 0
+    assert report["stages"]["grid"]["pixels"] == 48 * 64
+    assert report["counters"]["slic_iterations"] >= 1
+    assert report["stages"]["slic_iter"]["peak_bytes"] > 0
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "m.json")
+        m.write(path)
+        with open(path, encoding="utf-8") as f:
+            assert json.load(f)["stages"].keys() == report["stages"].keys()
+    print("阶段计时测试通过")
+
+
+def test_nested_peak_propagates():
+    """测试嵌套阶段的峰值分配会计入外层阶段"""
+    m = Metrics(trace_memory=True)
+    with m.stage("outer"):
+        with m.stage("inner"):
+            buf = bytearray(8 * 1024 * 1024)
+            del buf
+    assert m.stages["outer"]["peak_bytes"] >= m.stages["inner"]["peak_bytes"] >= 8 * 1024 * 1024
+    print("嵌套峰值测试通过")
+
+
+def test_null_metrics():
+    """测试未启用时的空实现"""
+    with NULL_METRICS.stage("x", pixels=10):
+        NULL_METRICS.count("n")
+        NULL_METRICS.set("k", 1)
+    assert not NULL_METRICS.enabled
+    print("空计时器测试通过")
+
+
+if __name__ == '__main__':
+    print("开始测试阶段计时...")
+    tests = [test_generator_stages_recorded, test_nested_peak_propagates, test_null_metrics]
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"测试 {test.__name__} 出错: {e}")
+    print(f"测试完成: {passed}/{len(tests)} 通过")
+    sys.exit(0 if passed == len(tests) else 1)
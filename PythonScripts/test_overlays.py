@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试输出叠加层（描边、网格线）
+"""
+
+import sys
+import numpy as np
+from PIL import Image, ImageDraw
+
+from overlays import boundary_mask, dilate, edge_outline, grid_overlay
+
+
+def _cells(seed=0, cell=4):
+    rng = np.random.default_rng(seed)
+    pal = rng.integers(0, 256, (6, 3)).astype(np.uint8)
+    grid = rng.integers(0, 6, (10, 13))
+    return pal[np.repeat(np.repeat(grid, cell, 0), cell, 1)][:37, :50]
+
+
+def test_boundary_matches_pixel_diff():
+    """测试格子空间边界与逐像素比较得到的边界一致"""
+    img = _cells()
+    assert np.array_equal(boundary_mask(img, cell=4), boundary_mask(img, cell=1))
+    flat = np.full((20, 20, 3), 7, dtype=np.uint8)
+    assert np.array_equal(edge_outline(flat, thickness=5, cell=4), flat)
+    print("边界检测测试通过")
+
+
+def test_dilate_width():
+    """测试膨胀后线宽等于厚度"""
+    m = np.zeros((9, 30), dtype=bool)
+    m[:, 10] = True
+    for size in (1, 2, 3, 6):
+        assert dilate(m, size)[4].sum() == size
+    print("膨胀线宽测试通过")
+
+
+def test_outline_deterministic():
+    """测试相同种子结果一致、不同种子偏移不同"""
+    img = _cells(1)
+    a = edge_outline(img, thickness=2, cell=4, jitter=1, seed=3)
+    b = edge_outline(img, thickness=2, cell=4, jitter=1, seed=3)
+    c = edge_outline(img, thickness=2, cell=4, jitter=1, seed=4)
+    assert np.array_equal(a, b) and not np.array_equal(a, c)
+    print("描边确定性测试通过")
+
+
+def test_grid_matches_imagedraw():
+    """测试不透明网格线与原 ImageDraw 逐格画线结果一致，按行带绘制与整图一致"""
+    img = _cells(2)
+    h, w = img.shape[:2]
+    ref = Image.fromarray(img)
+    draw = ImageDraw.Draw(ref)
+    for y in range(0, h, 4):
+        for x in range(0, w, 4):
+            draw.line([(x + 3, y), (x + 3, min(y + 4, h))], fill=(255, 255, 255), width=1)
+            draw.line([(x, y + 3), (min(x + 4, w), y + 3)], fill=(255, 255, 255), width=1)
+    out = grid_overlay(img, 4)
+    assert np.array_equal(out, np.array(ref))
+    bands = np.concatenate([grid_overlay(img[y:y + 10], 4, y0=y) for y in range(0, h, 10)])
+    assert np.array_equal(bands, out)
+    print("网格线测试通过")
+
+
+def test_grid_alpha():
+    """测试半透明网格线交叉点只混合一次"""
+    img = np.zeros((8, 8, 3), dtype=np.uint8)
+    out = grid_overlay(img, 4, color=(200, 100, 0), alpha=0.5)
+    assert tuple(out[3, 3]) == (100, 50, 0) and tuple(out[3, 0]) == (100, 50, 0)
+    assert tuple(out[0, 3]) == (100, 50, 0) and tuple(out[0, 0]) == (0, 0, 0)
+    assert np.array_equal(grid_overlay(img, 4, alpha=0.0), img)
+    print("半透明网格线测试通过")
+
+
+if __name__ == '__main__':
+    print("开始测试输出叠加层...")
+    tests = [test_boundary_matches_pixel_diff, test_dilate_width, test_outline_deterministic,
+             test_grid_matches_imagedraw, test_grid_alpha]
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"测试 {test.__name__} 出错: {e}")
+    print(f"测试完成: {passed}/{len(tests)} 通过")
+    sys.exit(0 if passed == len(tests) else 1)
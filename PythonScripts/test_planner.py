@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试时间预算规划（--time-budget-ms）
+"""
+
+import json
+import os
+import sys
+import tempfile
+from argparse import Namespace
+import numpy as np
+
+import planner
+from core import PixelArtConfig, PixelArtGenerator
+from metrics import Metrics
+from pixelate import add_edge_outline, process_array
+
+# 固定系数的开销模型，规划结果不依赖本机速度
+_COEFFS = {"lab": 1e-7, "slic_render": 1e-8, "grid": 1e-8, "kmeans": 1e-7, "dither": 1e-7,
+           "palette_map": 1e-7, "resize": 1e-8, "slic_seed": 1e-4, "slic_iter_center": 1e-5,
+           "slic_iter_window": 1e-8, "slic_iterations": 1.0}
+
+
+def test_calibration_cached_per_host():
+    """测试标定结果按主机指纹写入缓存文件，再次读取时不重新标定"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "sub", "calibration.json")
+        model = planner.load_model(path)
+        with open(path, encoding="utf-8") as f:
+            cache = json.load(f)
+        assert set(cache) == {planner.host_fingerprint()}
+        assert set(_COEFFS) <= set(model.coeffs) and all(v >= 0 for v in model.coeffs.values())
+        calibrate, planner.calibrate = planner.calibrate, None  # 命中缓存时不应调用
+        planner._models.clear()  # 跳过进程内缓存，从文件读取
+        try:
+            assert planner.load_model(path).coeffs == model.coeffs
+        finally:
+            planner.calibrate = calibrate
+    print("标定缓存测试通过")
+
+
+def test_plan_choice():
+    """测试预算越紧方案越便宜：宽裕时全分辨率 SLIC，其次降迭代 / pyramid，极紧时栅格"""
+    model = planner.CostModel(_COEFFS)
+    cfg = PixelArtConfig(pixel_size=16, dithering_method="floyd_steinberg")
+    shape = (2000, 3000)
+    loose = planner.plan(shape, cfg, "dithered", 1e6, model)
+    assert (loose.mode, loose.iters, loose.dithering) == ("slic", 10, "floyd_steinberg")
+    costs = [planner.plan(shape, cfg, "dithered", ms, model) for ms in (1e6, 5000, 3000, 1500, 800, 1)]
+    assert [p.predicted_s for p in costs] == sorted((p.predicted_s for p in costs), reverse=True)
+    assert any(p.mode == "pyramid" for p in costs)
+    tight = costs[-1]
+    assert tight.mode == "grid" and tight.dithering is None and tight.predicted_s > 0.001
+    # 配置已要求栅格对齐时只在抖动上取舍
+    grid_cfg = PixelArtConfig(pixel_size=16, align_grid=True)
+    assert planner.plan(shape, grid_cfg, "basic", 1e6, model).mode == "grid"
+    # pyramid 只取能整除像素大小的倍数，放大后格子仍为 pixel_size
+    scales = {p.scale for p in planner.candidates(shape, 10, 10, None) if p.mode == "pyramid"}
+    assert scales and all(10 % s == 0 for s in scales)
+    print("方案选择测试通过")
+
+
+def test_generator_reports_plan():
+    """测试生成器按方案输出原尺寸结果，并记录预测 / 实际耗时"""
+    img = np.random.default_rng(0).integers(0, 256, (64, 96, 3), dtype=np.uint8)
+    load_model = planner.load_model
+    planner.load_model = lambda path=None, recalibrate=False: planner.CostModel(_COEFFS)
+    try:
+        for budget, mode in ((1e6, "slic"), (0.001, "grid")):
+            m = Metrics()
+            cfg = PixelArtConfig(pixel_size=8, color_count=8, time_budget_ms=budget)
+            gen = PixelArtGenerator(cfg, metrics=m)
+            out = gen.generate(img, "quantized")
+            assert out.shape == img.shape and out.dtype == np.uint8
+            assert gen.last_plan.mode == mode and gen.last_plan.actual_s > 0
+            assert m.counters["plan"]["mode"] == mode and m.counters["plan"]["predicted_ms"] is not None
+        pyramid = planner.Plan("pyramid", scale=2, iters=3)
+        cfg = planner.plan_config(PixelArtConfig(pixel_size=8, time_budget_ms=10), pyramid)
+        assert (cfg.pixel_size, cfg.slic_iters, cfg.align_grid, cfg.time_budget_ms) == (4, 3, False, None)
+        # SLIC 方案的分割边界不在格线上：描边逐像素检测
+        args = Namespace(pixel_size=8, color_count=8, dithering=False, dither_strength=0.1, algorithm="slic",
+                         time_budget_ms=1e6, cartoon_effect=False, cartoon_edge_weight=0.3, cartoon_levels=8,
+                         slic_iters=10, calibration_file=None, edge_outline=False, show_grid=False)
+        plain = process_array(img, args)
+        args.edge_outline = True
+        assert np.array_equal(process_array(img, args), add_edge_outline(plain, cell=1))
+    finally:
+        planner.load_model = load_model
+    print("生成器方案记录测试通过")
+
+
+if __name__ == '__main__':
+    print("开始测试时间预算规划...")
+    tests = [test_calibration_cached_per_host, test_plan_choice, test_generator_reports_plan]
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"测试 {test.__name__} 出错: {e}")
+    print(f"测试完成: {passed}/{len(tests)} 通过")
+    sys.exit(0 if passed == len(tests) else 1)
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试进度 / 遥测通道
+"""
+
+import sys
+import io
+import os
+import json
+import tempfile
+
+from progress import ProgressReporter, MMAP_RECORD
+
+
+def test_jsonl_rate_limit_and_spans():
+    """测试阶段区间插值与限流：阶段切换和阶段结束必发，中间更新被合并"""
+    stream = io.StringIO()
+    rep = ProgressReporter(jsonl=True, stream=stream, min_interval=60.0)
+    rep.set_spans({"slic": (20, 80)}, pixels=1_000_000)
+    rep.report(10, "start", stage="load")
+    for i in range(1, 11):
+        rep("slic", i, 10)
+    recs = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [r["iteration"] for r in recs[1:]] == [1, 10]
+    assert recs[1]["progress"] == 26.0 and recs[-1]["progress"] == 80.0
+    assert recs[-1]["mpx_per_s"] is not None and recs[-1]["eta_s"] is not None
+    print("JSON 行进度测试通过")
+
+
+def test_mmap_record():
+    """测试内存映射状态记录（seq 为偶数表示写入完成）"""
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "status.mm")
+        rep = ProgressReporter(mmap_path=path)
+        rep.report(42, "处理中" * 40, stage="slic")
+        rep.close()
+        with open(path, "rb") as f:
+            seq, ts, pct, mpx, eta, it, its, stage, msg = MMAP_RECORD.unpack(f.read(MMAP_RECORD.size))
+        assert seq % 2 == 0 and seq > 0
+        assert pct == 42.0
+        assert stage.rstrip(b"\0") == b"slic"
+        msg.rstrip(b"\0").decode("utf-8")  # 截断后仍是合法 UTF-8
+    print("内存映射进度测试通过")
+
+
+def test_disabled_is_noop():
+    """测试未启用任何输出时不做任何事"""
+    rep = ProgressReporter()
+    assert not rep.enabled
+    rep("slic", 1, 10)
+    rep.report(50, "x")
+    assert rep.percent == 0.0
+    print("禁用进度测试通过")
+
+
+if __name__ == '__main__':
+    print("开始测试进度通道...")
+    tests = [test_jsonl_rate_limit_and_spans, test_mmap_record, test_disabled_is_noop]
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"测试 {test.__name__} 出错: {e}")
+    print(f"测试完成: {passed}/{len(tests)} 通过")
+    sys.exit(0 if passed == len(tests) else 1)
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试原始像素帧格式
+"""
+
+import sys
+import io
+import numpy as np
+
+from rawio import RAW_HEADER, RAW_MAGIC, read_raw_frame, raw_frame_from_bytes, encode_raw_frame
+
+
+def test_roundtrip_rgb_and_bgra():
+    """测试 RGB / BGRA 帧往返"""
+    rgb = (np.arange(5 * 7 * 3) % 256).astype(np.uint8).reshape(5, 7, 3)
+    for channels in (3, 4):
+        frame = encode_raw_frame(rgb, channels)
+        out, ch = read_raw_frame(io.BytesIO(frame))
+        assert ch == channels
+        assert np.array_equal(out, rgb)
+        out, ch = raw_frame_from_bytes(frame)
+        assert np.array_equal(out, rgb)
+    print("原始帧往返测试通过")
+
+
+def test_padded_stride_and_alpha():
+    """测试行填充 stride 与透明像素白底合成"""
+    w, h, stride = 2, 2, 12
+    rows = np.zeros((h, stride), dtype=np.uint8)
+    rows[:, :8] = [0, 0, 255, 255, 0, 0, 255, 0] * 1  # 不透明红 + 全透明
+    frame = RAW_HEADER.pack(RAW_MAGIC, w, h, 4, stride) + rows.tobytes()
+    out, _ = raw_frame_from_bytes(frame)
+    assert out[0, 0].tolist() == [255, 0, 0]
+    assert out[0, 1].tolist() == [255, 255, 255]
+    print("stride/透明度测试通过")
+
+
+def test_truncated_frame_rejected():
+    """测试数据不完整时报错"""
+    frame = encode_raw_frame(np.zeros((4, 4, 3), dtype=np.uint8))
+    try:
+        read_raw_frame(io.BytesIO(frame[:-5]))
+    except ValueError:
+        print("不完整帧测试通过")
+        return
+    raise AssertionError("不完整帧未报错")
+
+
+if __name__ == '__main__':
+    print("开始测试原始帧格式...")
+    tests = [test_roundtrip_rgb_and_bgra, test_padded_stride_and_alpha, test_truncated_frame_rejected]
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"测试 {test.__name__} 出错: {e}")
+    print(f"测试完成: {passed}/{len(tests)} 通过")
+    sys.exit(0 if passed == len(tests) else 1)
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试缓存渲染结果的换调色板（映射表、PLTE 替换编码、格子空间抖动、服务接口、12MP 耗时）
+"""
+
+import asyncio
+import io
+import json
+import sys
+import time
+import numpy as np
+from PIL import Image
+
+from core import ColorMapping, PixelArtConfig, PixelArtGenerator
+from encoder import encode_png, replace_palette
+from palettes import palette_colors
+from service import RenderService
+from test_service import _png, _request
+
+
+def _decode(png):
+    return np.asarray(Image.open(io.BytesIO(png)).convert("RGB"))
+
+
+def _img(h=96, w=128, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 256, (h, w, 3), dtype=np.uint8)
+
+
+def test_repalette_matches_full_mapping():
+    """测试换调色板等于对渲染结果逐像素取最近色，索引图共享，映射表按调色板缓存"""
+    gen = PixelArtGenerator(PixelArtConfig(pixel_size=8, color_count=16, align_grid=True))
+    handle = gen.render(_img(), "quantized")
+    rgb = handle.base.to_rgb()
+    pal = np.array(palette_colors("nes", 16), dtype=np.uint8)
+    out = gen.repalette(handle, "nes")
+    expected = pal[ColorMapping().nearest(rgb.reshape(-1, 3), pal)].reshape(rgb.shape)
+    assert np.array_equal(out.to_rgb(), expected)
+    assert out.index is handle.base.index and "nes" in handle.luts
+    assert gen.repalette(handle, "original") is handle.base
+    try:
+        gen.repalette(handle, "no_such_palette")
+        raise AssertionError("未知调色板应报错")
+    except ValueError:
+        pass
+    print("映射结果测试通过")
+
+
+def test_palette_splice_encoding():
+    """测试只替换 PLTE 块的编码与完整编码解码一致（含少色时的低位深 PNG）"""
+    for n in (4, 16, 48):
+        gen = PixelArtGenerator(PixelArtConfig(pixel_size=4, color_count=n, align_grid=True))
+        handle = gen.render(_img(seed=n), "quantized")
+        for name in ("gameboy", "c64", "monochrome"):
+            out = gen.repalette(handle, name)
+            assert np.array_equal(_decode(handle.encode(out)), _decode(encode_png(out)))
+    png = encode_png(handle.base)
+    try:
+        replace_palette(png, np.zeros((handle.base.n_colors + 1, 3), np.uint8))
+        raise AssertionError("调色板项数超过 PLTE 应报错")
+    except ValueError:
+        pass
+    print("PLTE 替换编码测试通过")
+
+
+def test_dithered_repalette():
+    """测试格子空间有序抖动：每格一色且只用目标调色板；非格子结果抖动时报错"""
+    cfg = PixelArtConfig(pixel_size=4, color_count=32, dithering_strength=0.5)
+    gen = PixelArtGenerator(cfg)
+    handle = gen.render(_img(), "average")
+    out = gen.repalette(handle, "gameboy", dither=True)
+    rgb = out.to_rgb()
+    pal = {tuple(c) for c in palette_colors("gameboy")}
+    assert {tuple(c) for c in rgb.reshape(-1, 3)} <= pal
+    assert np.array_equal(rgb, np.repeat(np.repeat(rgb[::4, ::4], 4, 0), 4, 1)[:96, :128])
+    assert not np.array_equal(rgb, gen.repalette(handle, "gameboy").to_rgb())
+    slic = gen.render(_img(), "basic")
+    try:
+        gen.repalette(slic, "gameboy", dither=True)
+        raise AssertionError("非格子结果抖动应报错")
+    except ValueError:
+        pass
+    print("抖动换调色板测试通过")
+
+
+def test_repalette_latency_12mp():
+    """测试 12MP 量化与多色 basic 结果换调色板并编码在 50ms 以内（预热 swap 编码后）"""
+    gen = PixelArtGenerator(PixelArtConfig(pixel_size=16, color_count=32, align_grid=True))
+    cells = _img(188, 250, seed=1)
+    img = np.repeat(np.repeat(cells, 16, 0), 16, 1)[:3000, :4000]
+    handle = gen.render(img, "quantized")
+    handle.encode(handle.base)
+    best = float("inf")
+    for name in ("nes", "amiga", "c64"):
+        t0 = time.perf_counter()
+        png = handle.encode(gen.repalette(handle, name))
+        best = min(best, time.perf_counter() - t0)
+    assert best < 0.05, f"换调色板耗时 {best * 1000:.1f}ms"
+    assert Image.open(io.BytesIO(png)).size == (4000, 3000)
+    # 未量化的 basic 结果超过 256 色：换调色板走量化后的 swap，同样只替换 PLTE
+    gen = PixelArtGenerator(PixelArtConfig(pixel_size=16, color_count=32, align_grid=True))
+    handle = gen.render(_img(3000, 4000, seed=2), "basic")
+    assert handle.base.n_colors > 256 and handle.swap.n_colors == 32
+    handle.encode(handle.swap)
+    t0 = time.perf_counter()
+    out = gen.repalette(handle, "nes")
+    png = handle.encode(out)
+    elapsed = time.perf_counter() - t0
+    assert elapsed < 0.05, f"多色结果换调色板耗时 {elapsed * 1000:.1f}ms"
+    assert out.index is handle.swap.index and np.array_equal(_decode(png), out.to_rgb())
+    assert gen.repalette(handle, "original") is handle.base
+    print(f"12MP 换调色板耗时测试通过 ({best * 1000:.1f}ms / {elapsed * 1000:.1f}ms)")
+
+
+def test_service_repalette():
+    """测试服务 keep=true 返回句柄，/repalette 换调色板，未知句柄 404、未知调色板 400、句柄按 LRU 淘汰"""
+    data = _png(h=64, w=64)
+
+    async def _render_keep(addr):
+        reader, writer = await asyncio.open_connection(*addr[:2])
+        writer.write(b"POST /render?block_size=4&max_colors=8&algorithm=average&keep=true HTTP/1.1\r\n"
+                     + f"Content-Length: {len(data)}\r\n\r\n".encode() + data)
+        await writer.drain()
+        raw = await reader.read()
+        writer.close()
+        head, _, body = raw.partition(b"\r\n\r\n")
+        headers = dict(l.split(": ", 1) for l in head.decode().split("\r\n")[1:])
+        return headers["X-Render-Handle"], body
+
+    async def run():
+        service = await RenderService(workers=1, max_handles=1).start(port=0)
+        try:
+            addr = service.address
+            key, png = await _render_keep(addr)
+            status, body = await _request(addr, "POST", f"/repalette?handle={key}&palette=gameboy")
+            assert status == 200
+            pal = {tuple(c) for c in palette_colors("gameboy")}
+            assert {tuple(c) for c in _decode(body).reshape(-1, 3)} <= pal
+            status, body = await _request(addr, "POST", f"/repalette?handle={key}&palette=original")
+            assert status == 200 and np.array_equal(_decode(body), _decode(png))
+            status, _ = await _request(addr, "POST", f"/repalette?handle={key}&palette=gameboy&dither=true")
+            assert status == 200
+            assert (await _request(addr, "POST", f"/repalette?handle={key}&palette=bogus"))[0] == 400
+            assert (await _request(addr, "POST", "/repalette?handle=missing&palette=nes"))[0] == 404
+            await _render_keep(addr)
+            assert (await _request(addr, "POST", f"/repalette?handle={key}&palette=nes"))[0] == 404
+            stats = json.loads((await _request(addr, "GET", "/stats"))[1])
+            assert stats["handles"] == 1 and stats["repalettes"] == 3
+        finally:
+            await service.close()
+
+    asyncio.run(run())
+    print("服务换调色板测试通过")
+
+
+if __name__ == '__main__':
+    print("开始测试换调色板...")
+    tests = [test_repalette_matches_full_mapping, test_palette_splice_encoding, test_dithered_repalette,
+             test_repalette_latency_12mp, test_service_repalette]
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"测试 {test.__name__} 出错: {e!r}")
+    print(f"测试完成: {passed}/{len(tests)} 通过")
+    sys.exit(0 if passed == len(tests) else 1)
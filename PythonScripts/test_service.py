@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试本地渲染服务（渲染结果、有界队列与每客户端限流、断开取消、统计接口）
+"""
+
+import asyncio
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from PIL import Image
+
+from processors import process_image_internal
+from service import RenderService
+
+
+async def _request(addr, method, path, body=b"", client=None, unix=False):
+    if unix:
+        reader, writer = await asyncio.open_unix_connection(addr)
+    else:
+        reader, writer = await asyncio.open_connection(*addr[:2])
+    head = [f"{method} {path} HTTP/1.1", "Host: localhost", f"Content-Length: {len(body)}"]
+    if client:
+        head.append(f"X-Client-Id: {client}")
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + body)
+    await writer.drain()
+    raw = await reader.read()
+    writer.close()
+    head, _, payload = raw.partition(b"\r\n\r\n")
+    return int(head.split(b" ")[1]), payload
+
+
+def _png(seed=0, h=32, w=48):
+    buf = io.BytesIO()
+    Image.fromarray(np.random.default_rng(seed).integers(0, 256, (h, w, 3), dtype=np.uint8)).save(buf, "PNG")
+    return buf.getvalue()
+
+
+def test_render_matches_direct_call():
+    """测试进程池渲染与直接调用 process_image_internal 字节一致（TCP 与 Unix 套接字）"""
+    data = _png()
+    expected = process_image_internal(data, {"block_size": 4, "max_colors": 8, "enable_dither": True})
+
+    async def run():
+        service = await RenderService(workers=1).start(port=0)
+        try:
+            status, body = await _request(service.address, "POST",
+                                          "/render?block_size=4&max_colors=8&enable_dither=true", data)
+            assert status == 200 and body == expected
+            status, body = await _request(service.address, "POST", "/render", b"not an image")
+            assert status == 422
+        finally:
+            await service.close()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "svc.sock")
+            service = await RenderService(workers=1).start(unix_path=path)
+            try:
+                status, body = await _request(path, "POST", "/render?block_size=4&max_colors=8&enable_dither=true",
+                                              data, unix=True)
+                assert status == 200 and body == expected
+            finally:
+                await service.close()
+
+    asyncio.run(run())
+    print("渲染结果测试通过")
+
+
+def test_backpressure_and_client_limit():
+    """测试队列满返回 503、单客户端超限返回 429，统计接口反映队列深度与执行中任务"""
+    gate = threading.Event()
+
+    def render(data, options):
+        gate.wait(5)
+        return data
+
+    async def run():
+        pool = ThreadPoolExecutor(1)
+        service = await RenderService(workers=1, queue_size=1, per_client=1, render=render,
+                                      executor=pool).start(port=0)
+        try:
+            addr = service.address
+            first = asyncio.create_task(_request(addr, "POST", "/render", b"a", client="a"))
+            while service.in_flight == 0:
+                await asyncio.sleep(0.01)
+            second = asyncio.create_task(_request(addr, "POST", "/render", b"b", client="b"))
+            while service.queue.qsize() == 0:
+                await asyncio.sleep(0.01)
+            assert (await _request(addr, "POST", "/render", b"c", client="c"))[0] == 503
+            assert (await _request(addr, "POST", "/render", b"a2", client="a"))[0] == 429
+            status, body = await _request(addr, "GET", "/stats")
+            stats = json.loads(body)
+            assert status == 200 and stats["queue_depth"] == 1 and stats["in_flight"] == 1
+            assert stats["rejected_queue"] == 1 and stats["rejected_client"] == 1
+            gate.set()
+            assert await first == (200, b"a") and await second == (200, b"b")
+            stats = service.stats()
+            assert stats["completed"] == 2 and stats["latency"]["total"]["count"] == 2
+            assert sum(stats["latency"]["queue"]["counts"]) == 2 and not stats["clients"]
+        finally:
+            gate.set()
+            await service.close()
+            pool.shutdown()
+
+    asyncio.run(run())
+    print("背压与限流测试通过")
+
+
+def test_disconnect_cancels_queued_job():
+    """测试排队中的任务在客户端断开后被取消，不再执行"""
+    gate = threading.Event()
+    rendered = []
+
+    def render(data, options):
+        gate.wait(5)
+        rendered.append(data)
+        return data
+
+    async def run():
+        pool = ThreadPoolExecutor(1)
+        service = await RenderService(workers=1, queue_size=4, render=render, executor=pool).start(port=0)
+        try:
+            addr = service.address
+            first = asyncio.create_task(_request(addr, "POST", "/render", b"keep", client="a"))
+            while service.in_flight == 0:
+                await asyncio.sleep(0.01)
+            reader, writer = await asyncio.open_connection(*addr[:2])
+            writer.write(b"POST /render HTTP/1.1\r\nContent-Length: 4\r\n\r\ndrop")
+            await writer.drain()
+            while service.queue.qsize() == 0:
+                await asyncio.sleep(0.01)
+            writer.close()
+            while service.counters["cancelled"] == 0:
+                await asyncio.sleep(0.01)
+            gate.set()
+            assert await first == (200, b"keep")
+            while service.queue.qsize():
+                await asyncio.sleep(0.01)
+            await asyncio.sleep(0.05)
+            assert rendered == [b"keep"] and service.counters["completed"] == 1
+
+            # 请求体后多余的换行不算断开；执行中断开的任务只计入 cancelled
+            gate.clear()
+            reader, writer = await asyncio.open_connection(*addr[:2])
+            writer.write(b"POST /render HTTP/1.1\r\nContent-Length: 4\r\n\r\ntail\r\n")
+            await writer.drain()
+            while service.in_flight == 0:
+                await asyncio.sleep(0.01)
+            await asyncio.sleep(0.05)
+            assert service.counters["cancelled"] == 1
+            gate.set()
+            assert (await reader.read()).endswith(b"\r\n\r\ntail")
+            writer.close()
+            gate.clear()
+            reader, writer = await asyncio.open_connection(*addr[:2])
+            writer.write(b"POST /render HTTP/1.1\r\nContent-Length: 3\r\n\r\nrun")
+            await writer.drain()
+            while service.in_flight == 0:
+                await asyncio.sleep(0.01)
+            writer.close()
+            while service.counters["cancelled"] == 1:
+                await asyncio.sleep(0.01)
+            gate.set()
+            while service.in_flight:
+                await asyncio.sleep(0.01)
+            assert service.counters["completed"] == 2 and service.counters["cancelled"] == 2
+        finally:
+            gate.set()
+            await service.close()
+            pool.shutdown()
+
+    asyncio.run(run())
+    print("断开取消测试通过")
+
+
+if __name__ == '__main__':
+    print("开始测试本地渲染服务...")
+    tests = [test_render_matches_direct_call, test_backpressure_and_client_limit, test_disconnect_cancels_queued_job]
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"测试 {test.__name__} 出错: {e!r}")
+    print(f"测试完成: {passed}/{len(tests)} 通过")
+    sys.exit(0 if passed == len(tests) else 1)
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试向量化 SLIC 与逐像素参考实现（slic_superpixel_rgb）输出一致，以及核心 SLIC 的热启动
+"""
+
+import sys
+import numpy as np
+from PIL import Image, ImageDraw
+
+from slic import SLIC, slic_superpixel_rgb, slic_superpixel_fast
+from core import PixelArtConfig, SLICPixelArtCore
+
+
+def _shapes(w=60, h=45):
+    img = Image.new('RGB', (w, h), color='red')
+    draw = ImageDraw.Draw(img)
+    draw.rectangle([10, 8, 40, 30], fill='blue')
+    draw.ellipse([20, 15, 35, 28], fill='green')
+    return np.array(img)
+
+
+def _noise(w=53, h=37, seed=0):
+    return np.random.default_rng(seed).integers(0, 256, (h, w, 3), dtype=np.uint8)
+
+
+def test_matches_reference():
+    """测试多组参数下与参考实现逐像素一致（含平坦区域的距离并列、边界裁剪窗口）"""
+    for img in (_shapes(), _noise()):
+        for step, iters, weight in [(10, 3, 10.0), (7, 2, 20.0), (4, 1, 5.0)]:
+            ref = slic_superpixel_rgb(img, step=step, iters=iters, weight=weight)
+            out = slic_superpixel_fast(img, step=step, iters=iters, weight=weight)
+            assert np.array_equal(out, ref), (img.shape, step, iters, weight)
+    print("参考实现一致性测试通过")
+
+
+def test_pixel_deal_interface():
+    """测试 SLIC.pixel_deal 接口：RGBA 输入取前三通道，输出形状与类型不变，stride=1 与参考实现一致"""
+    rgba = np.dstack([_shapes(), np.full((45, 60), 255, dtype=np.uint8)])
+    out = SLIC(rgba, 60, 45).pixel_deal(step=10, iters=2, stride=1, weight=10.0)
+    assert out.shape == (45, 60, 3) and out.dtype == np.uint8
+    assert np.array_equal(out, slic_superpixel_rgb(rgba[:, :, :3], step=10, iters=2, weight=10.0))
+    print("pixel_deal 接口测试通过")
+
+
+def test_stride_mode():
+    """测试 stride 加速模式：输出全分辨率、每个像素都被分配、颜色取自图中像素，结果接近精确模式"""
+    img = _shapes(120, 90)
+    exact = slic_superpixel_fast(img, step=12, iters=3, weight=10.0)
+    for stride in (2, 3, 5):
+        out = slic_superpixel_fast(img, step=12, iters=3, weight=10.0, stride=stride)
+        assert out.shape == img.shape
+        colors = {tuple(c) for c in img.reshape(-1, 3)}
+        assert all(tuple(c) in colors for c in np.unique(out.reshape(-1, 3), axis=0))
+        assert (out != exact).any(axis=2).mean() < 0.1, stride
+    print("stride 加速模式测试通过")
+
+
+def test_session_warm_start():
+    """测试 SLIC 会话：补跑轮数与冷启动一致、相同参数直接返回缓存、改 weight 热启动不超过 iters、reset 后重新播种"""
+    img = _shapes(120, 90)
+    s = SLIC(img, 120, 90)
+    assert np.array_equal(s.pixel_deal(step=12, iters=2, stride=1, weight=10.0),
+                          slic_superpixel_fast(img, step=12, iters=2, weight=10.0))
+    out = s.pixel_deal(step=12, iters=4, stride=1, weight=10.0)
+    assert s.last_iterations <= 2
+    assert np.array_equal(out, slic_superpixel_fast(img, step=12, iters=4, weight=10.0))
+    assert np.array_equal(s.pixel_deal(step=12, iters=4, stride=1, weight=10.0), out)
+    assert s.last_iterations == 0
+
+    warm = s.pixel_deal(step=12, iters=4, stride=2, weight=20.0)
+    assert warm.shape == img.shape and 1 <= s.last_iterations <= 4
+    assert (warm != slic_superpixel_fast(img, step=12, iters=4, weight=20.0)).any(axis=2).mean() < 0.1
+
+    s.reset()
+    assert np.array_equal(s.pixel_deal(step=12, iters=3, stride=1, weight=20.0),
+                          slic_superpixel_fast(img, step=12, iters=3, weight=20.0))
+    print("SLIC 会话热启动测试通过")
+
+
+def test_core_warm_start():
+    """测试核心 SLIC 按残差提前结束，小幅调亮 / 裁剪后从旧标签图或中心热启动 1-2 轮即收敛"""
+    yy, xx = np.mgrid[0:120, 0:160]
+    img = np.stack([xx * 255 // 160, yy * 255 // 120, (xx + yy) % 64 * 4], axis=-1).astype(np.uint8)
+    img[30:90, 40:110] = (200, 40, 40)
+    cfg = PixelArtConfig(pixel_size=12, slic_iters=10, slic_tol=0.5)
+    cold = SLICPixelArtCore(cfg)
+    cold.slic_superpixel(img)
+    assert cold.iterations == 10 or cold.residual <= 0.5
+    brighter = np.clip(img.astype(np.int16) + 6, 0, 255).astype(np.uint8)
+    warm = SLICPixelArtCore(cfg)
+    for image, kwargs in [(brighter, {"init_labels": cold.labels}),
+                          (img[4:, 6:], {"init_labels": cold.labels[4:, 6:]}),
+                          (brighter, {"init_centers": cold.centers}),
+                          (img, {"init_centers": cold.centers[:, :2]})]:
+        out = warm.slic_superpixel(image, **kwargs)
+        assert out.shape == image.shape and warm.labels.shape == image.shape[:2]
+        assert warm.iterations <= 2 and warm.residual <= 0.5, (warm.iterations, warm.residual)
+    try:
+        warm.slic_superpixel(img, init_labels=cold.labels[1:])
+        raise AssertionError("标签图尺寸不符应报错")
+    except ValueError:
+        pass
+    print("核心 SLIC 热启动测试通过")
+
+
+if __name__ == '__main__':
+    print("开始测试 SLIC 引擎...")
+    tests = [test_matches_reference, test_pixel_deal_interface, test_stride_mode, test_session_warm_start,
+             test_core_warm_start]
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"测试 {test.__name__} 出错: {e}")
+    print(f"测试完成: {passed}/{len(tests)} 通过")
+    sys.exit(0 if passed == len(tests) else 1)
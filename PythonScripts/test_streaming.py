@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试流式处理模式
+"""
+
+import contextlib
+import io
+import sys
+import os
+import tempfile
+import numpy as np
+from PIL import Image
+
+from adjust import ColorAdjust
+from core import PixelArtConfig, PixelArtGenerator
+from rawio import encode_raw_frame
+from streaming import StreamingPixelator
+
+
+def _gradient(h=203, w=157):
+    yy, xx = np.mgrid[0:h, 0:w]
+    return np.dstack([(xx * 1.5) % 256, (yy * 1.2) % 256, (xx + yy) % 256]).astype(np.uint8)
+
+
+def test_basic_matches_in_memory():
+    """测试流式基础模式与内存中栅格对齐结果逐像素一致（PNG、原始帧与 JPEG 输入）"""
+    img = _gradient()
+    cfg = PixelArtConfig(pixel_size=8, align_grid=True)
+    expected = PixelArtGenerator(cfg).generate(img, style="basic")
+    with tempfile.TemporaryDirectory() as d:
+        Image.fromarray(img).save(os.path.join(d, "in.png"))
+        with open(os.path.join(d, "in.raw"), "wb") as f:
+            f.write(encode_raw_frame(img, 4))
+        for name in ("in.png", "in.raw"):
+            out_path = os.path.join(d, "out.png")
+            stats = StreamingPixelator(cfg, band_rows=40).run(os.path.join(d, name), out_path)
+            assert stats["bands"] == 6
+            assert np.array_equal(np.array(Image.open(out_path)), expected)
+        # JPEG 不能逐带解码：整体解码，结果不变，并给出警告
+        Image.fromarray(img).save(os.path.join(d, "in.jpg"), quality=95)
+        expected = PixelArtGenerator(cfg).generate(np.array(Image.open(os.path.join(d, "in.jpg"))), style="basic")
+        err = io.StringIO()
+        with contextlib.redirect_stderr(err):
+            StreamingPixelator(cfg, band_rows=40).run(os.path.join(d, "in.jpg"), out_path)
+        assert "警告" in err.getvalue()
+        assert np.array_equal(np.array(Image.open(out_path)), expected)
+    print("流式基础模式测试通过")
+
+
+def test_adjusted_matches_in_memory():
+    """测试带亮度/对比度/饱和度时，流式与内存中格子空间调整结果一致"""
+    img = _gradient()
+    cfg = PixelArtConfig(pixel_size=8, align_grid=True)
+    expected = PixelArtGenerator(cfg, adjust=ColorAdjust(1.2, 0.8, 1.5)).generate(img, style="basic")
+    with tempfile.TemporaryDirectory() as d:
+        Image.fromarray(img).save(os.path.join(d, "in.png"))
+        out_path = os.path.join(d, "out.png")
+        StreamingPixelator(cfg, band_rows=40, brightness=1.2, contrast=0.8,
+                           saturation=1.5).run(os.path.join(d, "in.png"), out_path)
+        assert np.array_equal(np.array(Image.open(out_path)), expected)
+    print("流式调整测试通过")
+
+
+def test_quantized_palette_output():
+    """测试流式量化模式输出调色板 PNG 且颜色数受限"""
+    img = _gradient()
+    cfg = PixelArtConfig(pixel_size=4, color_count=8, align_grid=True)
+    with tempfile.TemporaryDirectory() as d:
+        Image.fromarray(img).save(os.path.join(d, "in.png"))
+        out_path = os.path.join(d, "out.png")
+        StreamingPixelator(cfg, style="quantized", band_rows=32).run(os.path.join(d, "in.png"), out_path)
+        out = Image.open(out_path)
+        assert out.mode == "P" and out.size == (img.shape[1], img.shape[0])
+        assert len(np.unique(np.array(out.convert("RGB")).reshape(-1, 3), axis=0)) <= 8
+    print("流式量化模式测试通过")
+
+
+if __name__ == '__main__':
+    print("开始测试流式处理...")
+    tests = [test_basic_matches_in_memory, test_adjusted_matches_in_memory, test_quantized_palette_output]
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"测试 {test.__name__} 出错: {e}")
+    print(f"测试完成: {passed}/{len(tests)} 通过")
+    sys.exit(0 if passed == len(tests) else 1)
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试生成器的线程安全（generate_many 与顺序生成一致、共享实例不残留请求状态、指标计数不丢失）
+"""
+
+import sys
+import threading
+import numpy as np
+
+from adjust import ColorAdjust
+from core import PixelArtConfig, PixelArtGenerator
+from metrics import Metrics
+
+
+def _images():
+    rng = np.random.default_rng(3)
+    return [rng.integers(0, 256, (h, w, 3), dtype=np.uint8) for h, w in [(40, 56), (64, 48), (33, 71), (48, 48)]]
+
+
+def test_generate_many_matches_sequential():
+    """测试各风格下 generate_many 与逐张单独生成的结果一致（含逐图统计的对比度调整）"""
+    images = _images()
+    for align, style in [(True, "basic"), (False, "basic"), (True, "average"), (True, "quantized")]:
+        cfg = PixelArtConfig(pixel_size=8, color_count=8, align_grid=align, slic_iters=3)
+        expected = [PixelArtGenerator(cfg, adjust=ColorAdjust(1.1, 1.4, 1.2)).generate(im, style) for im in images]
+        gen = PixelArtGenerator(cfg, adjust=ColorAdjust(1.1, 1.4, 1.2))
+        got = gen.generate_many(images, style, max_workers=4)
+        assert all(np.array_equal(a, b) for a, b in zip(expected, got)), (align, style)
+        assert gen.adjust.mean is None  # 共享的调整对象未被写入
+    print("generate_many 一致性测试通过")
+
+
+def test_shared_generator_no_stale_state():
+    """测试同一实例连续处理不同尺寸的图：每次重新分割，不沿用上一张的标签"""
+    images = _images()
+    cfg = PixelArtConfig(pixel_size=8, color_count=8, slic_iters=3)
+    gen = PixelArtGenerator(cfg)
+    for im in images:
+        assert np.array_equal(gen.generate(im), PixelArtGenerator(cfg).generate(im))
+    assert gen.slic.labels is None
+    print("共享实例无残留状态测试通过")
+
+
+def test_metrics_thread_safe():
+    """测试多线程共用 Metrics 时计数与阶段调用次数不丢失"""
+    m = Metrics()
+
+    def work():
+        for _ in range(2000):
+            m.count("n")
+            with m.stage("s"):
+                pass
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert m.counters["n"] == 8000 and m.stages["s"]["calls"] == 8000
+    print("指标线程安全测试通过")
+
+
+if __name__ == '__main__':
+    print("开始测试生成器线程安全...")
+    tests = [test_generate_many_matches_sequential, test_shared_generator_no_stale_state, test_metrics_thread_safe]
+    passed = 0
+    for test in tests:
+        try:
+            test()
+            passed += 1
+        except Exception as e:
+            print(f"测试 {test.__name__} 出错: {e!r}")
+    print(f"测试完成: {passed}/{len(tests)} 通过")
+    sys.exit(0 if passed == len(tests) else 1)